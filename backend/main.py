@@ -21,8 +21,10 @@ logger = logging.getLogger(__name__)
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
 
 from lib.ml_inference import WastePredictor
+from lib.prediction_cache import PredictionCache
 from lib.graph_matching import GraphMatcher
-from lib.buyer_database import BuyerDatabase
+from lib.candidates import default_candidates
+from lib.buyer_snapshots import BuyerSnapshotManager
 
 app = FastAPI(title="Graph Matching API", version="1.0.0")
 
@@ -37,13 +39,43 @@ app.add_middleware(
 
 # Initialize services
 try:
-    predictor = WastePredictor()
-    buyer_db = BuyerDatabase(r".\data\waste_buyers_india_updated_cities.csv")
-    matcher = GraphMatcher(buyer_db)
+    # Repeated facility inputs reuse predictions; PREDICTION_UNITS_DIGITS
+    # buckets units_per_month to that many significant digits.
+    # PREDICTION_CASCADE=gated only runs the waste type classifiers the
+    # industry/process gate allows; safety runs every classifier and reports
+    # what the gate would miss (see /api/prediction-cascade). Unset: off
+    units_digits = os.getenv("PREDICTION_UNITS_DIGITS")
+    predictor = WastePredictor(
+        cache=PredictionCache(units_digits=int(units_digits) if units_digits else None),
+        cascade_mode=os.getenv("PREDICTION_CASCADE") or None
+    )
+    # With BUYER_SHARED_ROOT set, workers attach read-only to the newest
+    # snapshot generation published there (scripts/publish_buyer_snapshot.py)
+    # and the CSV stays the import source; unset, each worker loads the source
+    # BUYER_SOURCE may point at a SQLite registry (scripts/import_buyers_sqlite.py)
+    buyer_snapshots = BuyerSnapshotManager(
+        os.getenv("BUYER_SOURCE", r".\data\waste_buyers_india_updated_cities.csv"),
+        shared_root=os.getenv("BUYER_SHARED_ROOT") or None
+    )
+    # MATCH_CANDIDATES=default scores only nearby / index-matching buyers
+    # (lib/candidates.default_candidates); unset keeps the exact full scan
+    match_candidates = default_candidates() if os.getenv("MATCH_CANDIDATES") == "default" else None
+    matcher = GraphMatcher(buyer_snapshots.current, cache_results=True, candidates=match_candidates)
     logger.info("Services initialized successfully")
 except Exception as e:
     logger.error(f"Error initializing services: {e}")
 
+def current_buyer_services():
+    """
+    Buyer database and matcher for one request. The matcher is rebuilt
+    when a reloaded buyer snapshot has been swapped in.
+    """
+    global matcher
+    db = buyer_snapshots.current
+    if matcher.buyer_db is not db:
+        matcher = GraphMatcher(db, cache_results=True, candidates=match_candidates)
+    return db, matcher
+
 # Initialize email handler
 try:
     email_handler = EmailAutomationHandler()
@@ -150,16 +182,16 @@ async def find_matches(data: OperationalData):
         facility_input = data.model_dump()
         waste_profile = predictor.predict(facility_input)
         
-        # Get buyers from database
-        buyers = buyer_db.search_by_location(data.location)
+        # Buyer database and matcher (one snapshot for the whole request)
+        buyer_db, request_matcher = current_buyer_services()
         
-        # Get facility location coordinates from first buyer in that city (or use defaults)
+        # Facility coordinates from the gazetteer (or use defaults)
         facility_lat, facility_lng = 0, 0
-        for buyer in buyers:
-            if buyer.get('city', '').lower() == data.location.lower():
-                facility_lat = buyer.get('lat', 0)
-                facility_lng = buyer.get('lng', 0)
-                break
+        place = buyer_db.gazetteer.locate(data.location)
+        if place is not None:
+            facility_lat, facility_lng = place['lat'], place['lng']
+        else:
+            logger.warning(f"Unknown facility location {data.location!r}, using (0, 0)")
         
         # Add location to waste profile with proper coordinates
         waste_profile['location'] = {
@@ -170,7 +202,7 @@ async def find_matches(data: OperationalData):
         waste_profile['facility_industry'] = data.industry
         
         # Find optimal matches (method builds graph internally)
-        matches = matcher.find_optimal_matches(waste_profile)
+        matches = request_matcher.find_optimal_matches(waste_profile)
         
         logger.info(f"Found {len(matches)} matches")
         return {"success": True, "matches": matches}
@@ -233,6 +265,22 @@ async def save_matches(matches: List[MatchResult]):
         logger.error(f"Error in save_matches: {str(e)}", exc_info=True)
         raise HTTPException(status_code=400, detail=str(e))
 
+@app.get("/api/prediction-cache")
+async def prediction_cache_stats():
+    """
+    Hit / miss counters of the waste prediction cache
+    """
+    return {"model_version": predictor.model_version, "cache": predictor.cache.stats()}
+
+@app.get("/api/prediction-cascade")
+async def prediction_cascade_stats():
+    """
+    Classifier calls saved by the waste type cascade, and the types it
+    missed (counted in safety mode)
+    """
+    stats = predictor.cascade.stats() if predictor.cascade is not None else None
+    return {"mode": predictor.cascade_mode, "cascade": stats}
+
 @app.get("/api/submissions")
 async def get_submissions():
     """
@@ -255,28 +303,12 @@ async def get_submissions():
 @app.post("/api/add-buyer")
 async def add_buyer(buyer_data: dict):
     """
-    Add a new buyer to the CSV database
+    Add a new buyer to the buyer registry (CSV or SQLite)
     """
     try:
-        import csv
-        import pandas as pd
-        
-        csv_path = r".\data\waste_buyers_india_updated_cities.csv"
-        
-        # Read existing CSV to get the last buyer_id
-        df = pd.read_csv(csv_path)
-        
-        # Generate new buyer_id
-        if len(df) > 0:
-            last_id = df['buyer_id'].iloc[-1]  # e.g., "B103"
-            id_number = int(last_id[1:]) + 1  # Extract number and increment
-            new_buyer_id = f"B{id_number:03d}"  # Format with zero-padding
-        else:
-            new_buyer_id = "B001"
-        
-        # Prepare new row with all required fields
+        # Prepare new row with all required fields (buyer_id assigned on add)
         new_row = {
-            'buyer_id': new_buyer_id,
+            'buyer_id': None,
             'company_name': buyer_data.get('company_name', ''),
             'company_type': buyer_data.get('company_type', ''),
             'accepted_waste_types': buyer_data.get('accepted_waste_types', ''),
@@ -294,9 +326,10 @@ async def add_buyer(buyer_data: dict):
             'contact_name': buyer_data.get('contact_name', '')
         }
         
-        # Append to CSV
-        new_df = pd.DataFrame([new_row])
-        new_df.to_csv(csv_path, mode='a', header=False, index=False)
+        # Append to CSV and the running buyer database (updates cached matches)
+        current_buyer_services()
+        record = buyer_snapshots.add_buyer(new_row)
+        new_buyer_id = record['buyer_id']
         
         logger.info(f"Successfully added new buyer: {new_buyer_id}")
         
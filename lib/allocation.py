@@ -0,0 +1,177 @@
+import numpy as np
+from typing import Dict
+
+# Flow amounts below this are treated as zero (tons)
+EPSILON = 1e-9
+
+
+def candidate_edges(offsets: np.ndarray, buyer_index: np.ndarray, scores: np.ndarray,
+                    capacity: np.ndarray, total_supply: float) -> np.ndarray:
+    """
+    Prune each stream's edges to its best buyers
+
+    For every stream keep the highest-scoring edges until their buyers'
+    capacity covers the total supply of all streams. Any flow sent to a
+    dropped buyer could be moved to spare capacity among the kept ones
+    without lowering the score, so the optimum is unchanged.
+    """
+
+    # A single buyer never needs more than the total supply
+    capacity = np.minimum(capacity, total_supply)
+
+    kept = []
+    for i in range(len(offsets) - 1):
+        start, end = offsets[i], offsets[i + 1]
+        row = scores[start:end]
+        k = min(64, len(row))
+
+        while True:
+            if k < len(row):
+                top = np.argpartition(-row, k - 1)[:k]
+            else:
+                top = np.arange(len(row))
+            top = top[np.lexsort((top, -row[top]))]
+
+            covered = np.cumsum(capacity[buyer_index[start + top]]) >= total_supply
+            if covered.any():
+                kept.append(start + top[:np.argmax(covered) + 1])
+                break
+            if k == len(row):
+                kept.append(start + top)
+                break
+            k = min(k * 4, len(row))
+
+    if not kept:
+        return np.zeros(0, dtype=np.int64)
+    return np.concatenate(kept).astype(np.int64)
+
+
+def allocate_capacity(offsets: np.ndarray, buyer_index: np.ndarray, scores: np.ndarray,
+                      supply: np.ndarray, capacity: np.ndarray) -> Dict:
+    """
+    Capacity-constrained transportation problem over a CSR match graph
+
+    Ships as much of each stream's supply (tons) as buyer capacities allow,
+    and among those shipments maximizes the total score-weighted tonnage.
+    Solved as min-cost max-flow with successive shortest paths on the
+    pruned candidate edges (see _successive_shortest_paths).
+
+    Returns:
+        dict with 'edges' (edge positions) and 'tons' (flow on each edge)
+        for every edge carrying flow, plus 'unallocated' tons per stream
+    """
+
+    supply = np.asarray(supply, dtype=np.float64)
+    capacity = np.nan_to_num(np.asarray(capacity, dtype=np.float64), nan=np.inf)
+    capacity = np.maximum(capacity, 0)
+    num_streams = len(supply)
+
+    edges = candidate_edges(offsets, buyer_index, scores, capacity, supply.sum())
+    stream_of = np.searchsorted(offsets, edges, side='right') - 1
+    buyers, local_buyer = np.unique(buyer_index[edges], return_inverse=True)
+
+    # Dense (streams x candidate buyers) score matrix, -inf where no edge
+    weights = np.full((num_streams, len(buyers)), -np.inf)
+    weights[stream_of, local_buyer] = scores[edges]
+
+    flow = _successive_shortest_paths(weights, supply.copy(), capacity[buyers])
+
+    shipped_flow = flow[stream_of, local_buyer]
+    carrying = shipped_flow > EPSILON
+
+    return {
+        'edges': edges[carrying],
+        'tons': shipped_flow[carrying],
+        'unallocated': np.maximum(supply - flow.sum(axis=1), 0)
+    }
+
+
+def _successive_shortest_paths(weights: np.ndarray, remaining: np.ndarray,
+                               residual: np.ndarray) -> np.ndarray:
+    """
+    Min-cost max-flow specialised to few streams and many buyers
+
+    Every augmenting path runs source -> stream -> (buyer -> stream)* ->
+    buyer -> sink, where a buyer -> stream hop undoes existing flow. Paths
+    are searched over stream nodes only: hop costs between streams and exit
+    costs to the sink are minima over buyers, computed with NumPy. Buyers
+    tied for the cheapest exit are filled in the same augmentation.
+
+    Returns the (streams x buyers) flow matrix in tons.
+    """
+
+    num_streams, num_buyers = weights.shape
+    flow = np.zeros((num_streams, num_buyers))
+    residual = residual.copy()
+    cost = -weights
+
+    while True:
+        active = remaining > EPSILON
+        if not active.any():
+            return flow
+
+        # Hop i -> b -> j: send along (i, b), cancel flow on (j, b)
+        hop_cost = np.full((num_streams, num_streams), np.inf)
+        hop_buyer = np.zeros((num_streams, num_streams), dtype=np.int64)
+        for j in range(num_streams):
+            cols = np.flatnonzero(flow[j] > EPSILON)
+            if len(cols) == 0:
+                continue
+            through = cost[:, cols] - cost[j, cols]
+            best = np.argmin(through, axis=1)
+            hop_cost[:, j] = through[np.arange(num_streams), best]
+            hop_buyer[:, j] = cols[best]
+        np.fill_diagonal(hop_cost, np.inf)
+
+        # Bellman-Ford over streams (no negative cycles by SSP invariant)
+        dist = np.where(active, 0.0, np.inf)
+        pred = np.full(num_streams, -1)
+        for _ in range(num_streams):
+            via = dist[:, None] + hop_cost
+            best_from = np.argmin(via, axis=0)
+            candidate = via[best_from, np.arange(num_streams)]
+            improved = candidate < dist - 1e-12
+            if not improved.any():
+                break
+            dist[improved] = candidate[improved]
+            pred[improved] = best_from[improved]
+
+        # Cheapest exit to the sink through a buyer with spare capacity
+        exit_cost = np.where(residual > EPSILON, cost, np.inf)
+        exit_best = exit_cost.min(axis=1) if num_buyers else np.full(num_streams, np.inf)
+        total = dist + exit_best
+        last = int(np.argmin(total))
+        if not np.isfinite(total[last]):
+            return flow
+
+        # Walk back to the starting stream, collecting hop buyers
+        path = [last]
+        while pred[path[-1]] >= 0:
+            path.append(int(pred[path[-1]]))
+        path.reverse()
+        hops = [
+            (i, int(hop_buyer[i, j]), j)
+            for i, j in zip(path[:-1], path[1:])
+        ]
+
+        exits = np.flatnonzero(exit_cost[last] == exit_best[last])
+        push = min(
+            remaining[path[0]],
+            min((flow[j, b] for _, b, j in hops), default=np.inf),
+            residual[exits].sum()
+        )
+
+        remaining[path[0]] -= push
+        for i, b, j in hops:
+            flow[i, b] += push
+            flow[j, b] -= push
+
+        # Fill tied exit buyers in order
+        left = push
+        for b in exits:
+            amount = min(left, residual[b])
+            flow[last, b] += amount
+            residual[b] -= amount
+            left -= amount
+            if left <= EPSILON:
+                break
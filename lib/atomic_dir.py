@@ -0,0 +1,30 @@
+import os
+import shutil
+from typing import Callable
+
+
+def atomic_replace_dir(path: str, write: Callable[[str], None]):
+    """
+    Replace directory path with one filled by write(tmp_path)
+
+    write runs on an empty private directory next to path, which is then
+    renamed into place, so readers never see a half-written directory.
+    The previous directory is moved aside first and removed afterwards.
+    If write fails, path is left as it was.
+    """
+
+    tmp_path = f'{path}.tmp{os.getpid()}'
+    shutil.rmtree(tmp_path, ignore_errors=True)
+    os.makedirs(tmp_path)
+    try:
+        write(tmp_path)
+    except BaseException:
+        shutil.rmtree(tmp_path, ignore_errors=True)
+        raise
+
+    old_path = f'{path}.old{os.getpid()}'
+    shutil.rmtree(old_path, ignore_errors=True)
+    if os.path.exists(path):
+        os.rename(path, old_path)
+    os.rename(tmp_path, path)
+    shutil.rmtree(old_path, ignore_errors=True)
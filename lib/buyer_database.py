@@ -1,104 +1,380 @@
+import os
+import threading
+import time
 import pandas as pd
 import numpy as np
+from typing import Dict
+from lib.buyer_table import (
+    BuyerTable, build_inverted_index, parse_pricing, certification_bits, certification_mask, PRICE_COLUMNS
+)
+from lib.buyer_store import BuyerStore, is_sqlite_path, registry_version
+from lib.spatial_index import GridIndex
+from lib.buyer_shards import BuyerShards
+from lib.buyer_query import BuyerQueryPlanner, QueryPlan
+from lib.gazetteer import Gazetteer, load_gazetteer
 filename = "data/waste_buyers_india_updated_cities.csv"
+
+
+def source_signature(path):
+    """
+    Change marker of a buyer source: (mtime_ns, size) of a CSV, or the
+    write counter of a SQLite registry (0 until it is created)
+    """
+    if is_sqlite_path(path):
+        return 'sqlite', registry_version(path) if os.path.exists(path) else 0
+    stat = os.stat(path)
+    return stat.st_mtime_ns, stat.st_size
+
+
 class BuyerDatabase:
-    def __init__(self, filename):
-        self.df = pd.read_csv(filename)
-        self._process_data()
+    def __init__(self, filename, gazetteer: Gazetteer = None):
+        """
+        filename: buyer CSV, a SQLite registry (.db/.sqlite, see BuyerStore),
+                  or a snapshot directory written by compile_snapshot()
+                  (memory-mapped, no CSV parsing)
+        gazetteer: place name -> coordinates lookup (default: the shared
+                   load_gazetteer() instance)
+        """
+        self.gazetteer = gazetteer or load_gazetteer()
+        self._listeners = []
+        self._lock = threading.Lock()  # Serializes add_buyer
+        
+        # (frame, type_index, category_index), replaced as a whole by
+        # add_buyer; the caches below are keyed by the tuple (or table)
+        # they were built from, so readers never mix two versions
+        self._buyers = None
+        self._frame = None          # (buyers, frame rebuilt from a loaded snapshot)
+        self._snapshot = None       # (buyers, BuyerTable)
+        self._spatial_index = None  # (BuyerTable, GridIndex)
+        self._shards = None
+        
+        self.store = None
+        self.snapshot_path = None
+        if os.path.isdir(filename):
+            self._load_snapshot(filename)
+        elif is_sqlite_path(filename):
+            self.store = BuyerStore(filename)
+            self._process_data(self.store.load_frame())
+        else:
+            self._process_data(pd.read_csv(filename))
+    
+    @property
+    def df(self) -> pd.DataFrame:
+        """Buyer frame; rebuilt from the snapshot on first use when loaded from one"""
+        return self._frame_of(self._buyers)
+    
+    @property
+    def type_index(self) -> Dict[str, np.ndarray]:
+        return self._buyers[1]
+    
+    @property
+    def category_index(self) -> Dict[str, np.ndarray]:
+        return self._buyers[2]
+    
+    def _frame_of(self, buyers) -> pd.DataFrame:
+        if buyers[0] is not None:
+            return buyers[0]
+        cached = self._frame
+        if cached is None or cached[0] is not buyers:
+            cached = self._frame = (buyers, self._snapshot_of(buyers).to_frame())
+        return cached[1]
+    
+    def _load_snapshot(self, path):
+        """Memory-map a compiled snapshot; the frame is only built if needed"""
+        
+        table = BuyerTable.load(path)
+        self.snapshot_path = path
+        self._buyers = (None, table.type_index, table.category_index)
+        self._snapshot = (self._buyers, table)
+        
+        metadata = table.metadata
+        self.pricing_errors = list(metadata.get('pricing_errors', []))
+        self.certification_errors = list(metadata.get('certification_errors', []))
+        self.source_signature = tuple(metadata.get('source_signature', ()))
+        
+        source = metadata.get('source')
+        if source and os.path.exists(source) and source_signature(source) != self.source_signature:
+            print(f"⚠️ Buyer snapshot {path} is older than {source}; recompile it")
+    
+    @staticmethod
+    def compile_snapshot(csv_path, snapshot_path) -> 'BuyerDatabase':
+        """
+        Compile the buyer CSV into a versioned binary snapshot directory
+        that BuyerDatabase(snapshot_path) memory-maps at startup
+        """
+        
+        signature = source_signature(csv_path)
+        db = BuyerDatabase(csv_path)
+        db.snapshot.save(snapshot_path, metadata={
+            'source': os.path.abspath(csv_path),
+            'source_signature': list(signature),
+            'compiled_at': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'pricing_errors': db.pricing_errors,
+            'certification_errors': db.certification_errors
+        })
+        db.source_signature = signature
+        return db
+    
+    def add_listener(self, callback):
+        """Register callback(buyer, position), called after each add_buyer"""
+        self._listeners.append(callback)
     
-    def _process_data(self):
+    def _process_data(self, df: pd.DataFrame):
         """Process and validate buyer data"""
         
         # Split comma-separated values
-        self.df['accepted_waste_types'] = self.df['accepted_waste_types'].apply(
+        df['accepted_waste_types'] = df['accepted_waste_types'].apply(
             lambda x: [w.strip() for w in str(x).split(',')]
         )
-        self.df['accepted_categories'] = self.df['accepted_categories'].apply(
+        df['accepted_categories'] = df['accepted_categories'].apply(
             lambda x: [c.strip() for c in str(x).split(',')]
         )
-        self.df['certifications'] = self.df['certifications'].apply(
+        df['certifications'] = df['certifications'].apply(
             lambda x: [c.strip() for c in str(x).split(',')]
         )
+        
+        # Parse pricing_model once into numeric columns
+        pricing = pd.DataFrame(
+            [parse_pricing(p) for p in df['pricing_model']], index=df.index
+        )
+        df[PRICE_COLUMNS] = pricing[PRICE_COLUMNS]
+        
+        unparsed = df.loc[~pricing['price_parsed'], ['buyer_id', 'pricing_model']]
+        self.pricing_errors = unparsed.to_dict('records')
+        if self.pricing_errors:
+            print(f"⚠️ {len(self.pricing_errors)} buyers have unrecognized pricing_model, using fallback price:")
+            for row in self.pricing_errors:
+                print(f"   {row['buyer_id']}: {row['pricing_model']!r}")
+        
+        # Normalize certifications once into authorization bitmasks
+        spelling_bits = {
+            cert: certification_bits(cert)
+            for cert in set().union(*df['certifications']) if cert and cert != 'nan'
+        } if len(df) else {}
+        df['certification_mask'] = [
+            certification_mask(certs) for certs in df['certifications']
+        ]
+        self.certification_errors = [
+            {'buyer_id': buyer_id, 'certification': cert}
+            for buyer_id, certs in zip(df['buyer_id'], df['certifications'])
+            for cert in certs if spelling_bits.get(cert, -1) == 0
+        ]
+        if self.certification_errors:
+            unknown = sorted({row['certification'] for row in self.certification_errors})
+            print(f"⚠️ {len(self.certification_errors)} certifications match no recognized authorization: {unknown}")
+        
+        self._build_indexes(df)
+    
+    def _build_indexes(self, df: pd.DataFrame):
+        """Build inverted indexes from waste type / category to buyer rows"""
+        
+        self._buyers = (
+            df,
+            build_inverted_index(df['accepted_waste_types']),
+            build_inverted_index(df['accepted_categories'])
+        )
+    
+    @property
+    def snapshot(self) -> BuyerTable:
+        """
+        Immutable columnar BuyerTable of all buyers, shared by matchers
+        without copying. Replaced (not modified) when buyers are added.
+        """
+        return self._snapshot_of(self._buyers)
+    
+    def _snapshot_of(self, buyers) -> BuyerTable:
+        # A table built while add_buyer swapped in newer buyers is cached
+        # under the old tuple, so the next call rebuilds it
+        cached = self._snapshot
+        if cached is None or cached[0] is not buyers:
+            df, type_index, category_index = buyers
+            cached = self._snapshot = (
+                buyers, BuyerTable.from_frame(df, type_index=type_index, category_index=category_index)
+            )
+        return cached[1]
+    
+    @property
+    def spatial_index(self) -> GridIndex:
+        """Lat/lng grid over buyer rows, rebuilt lazily after buyers are added"""
+        return self.spatial_index_for(self.snapshot)
+    
+    def spatial_index_for(self, table: BuyerTable) -> GridIndex:
+        """Lat/lng grid over the rows of table (a snapshot taken earlier)"""
+        
+        cached = self._spatial_index
+        if cached is None or cached[0] is not table:
+            cached = self._spatial_index = (table, GridIndex(table.lat, table.lng))
+        return cached[1]
+    
+    @property
+    def shards(self) -> BuyerShards:
+        """Geographic grid-cell shards of the current snapshot (see BuyerShards)"""
+        
+        table = self.snapshot
+        shards = self._shards
+        if shards is None or shards.table is not table:
+            shards = self._shards = BuyerShards(table)
+        return shards
+    
+    def nearest_buyers(self, lat, lng, k=10):
+        """Return the k buyers closest to (lat, lng), nearest first, with distance_km"""
+        
+        table = self.snapshot
+        rows, distances = self.spatial_index_for(table).nearest(lat, lng, k)
+        buyers = table.records_at(rows)
+        for buyer, distance in zip(buyers, distances):
+            buyer['distance_km'] = round(float(distance), 1)
+        return buyers
+    
+    def add_buyer(self, buyer: Dict) -> Dict:
+        """
+        Add a buyer to the in-memory table and keep the indexes current.
+        List fields may be given as lists or comma-separated strings.
+        Listeners (e.g. a caching GraphMatcher) are notified with the
+        record and its row position. Returns the stored record.
+        
+        With a SQLite registry the buyer is inserted there first, in its
+        own transaction, and gets its buyer_id from the database.
+        """
+        
+        with self._lock:
+            record = dict(buyer)
+            if self.store is not None:
+                record['buyer_id'] = self.store.insert_buyer(record)
+            for field in ['lat', 'lng', 'min_monthly_volume_tons', 'max_monthly_volume_tons']:
+                if field in record:
+                    record[field] = pd.to_numeric(record[field], errors='coerce')
+            for field in ['accepted_waste_types', 'accepted_categories', 'certifications']:
+                value = record.get(field, '')
+                if not isinstance(value, list):
+                    value = str(value).split(',')
+                record[field] = [v.strip() for v in value]
+            
+            pricing = parse_pricing(record.get('pricing_model'))
+            record.update({column: pricing[column] for column in PRICE_COLUMNS})
+            if not pricing['price_parsed']:
+                self.pricing_errors.append(
+                    {'buyer_id': record.get('buyer_id'), 'pricing_model': record.get('pricing_model')}
+                )
+            
+            record['certification_mask'] = certification_mask(record['certifications'])
+            for cert in record['certifications']:
+                if cert and cert != 'nan' and certification_bits(cert) == 0:
+                    self.certification_errors.append({'buyer_id': record.get('buyer_id'), 'certification': cert})
+            
+            buyers = self._buyers
+            frame = self._frame_of(buyers)
+            row = len(frame)
+            df = pd.concat([frame, pd.DataFrame([record])], ignore_index=True)
+            
+            # New index dicts, so an existing snapshot keeps its own
+            type_index = dict(buyers[1])
+            category_index = dict(buyers[2])
+            for index, values in [(type_index, record['accepted_waste_types']),
+                                  (category_index, record['accepted_categories'])]:
+                for value in dict.fromkeys(values):
+                    index[value] = np.append(index.get(value, np.zeros(0, dtype=np.int64)), row)
+            
+            # One assignment: readers see either the old buyers or the new
+            # ones, and caches built from the old tuple are not reused
+            self._buyers = (df, type_index, category_index)
+            
+            # Same form as get_all_buyers() returns it
+            stored = df.iloc[[row]].to_dict('records')[0]
+            for callback in self._listeners:
+                callback(stored, row)
+        
+        return stored
+    
+    def candidate_rows(self, waste_type: str, category: str = None) -> np.ndarray:
+        """Rows of buyers accepting the waste type or its category (index lookup)"""
+        
+        _, type_index, category_index = self._buyers
+        empty = np.zeros(0, dtype=np.int64)
+        return np.union1d(
+            type_index.get(waste_type, empty),
+            category_index.get(category, empty) if category else empty
+        )
     
     def get_all_buyers(self):
         """Return all buyers as list of dicts"""
-        return self.df.to_dict('records')
+        buyers = self._buyers
+        if buyers[0] is None:
+            return list(self._snapshot_of(buyers).records)
+        return buyers[0].to_dict('records')
     
     def search_by_location(self, location, max_distance_km=500):
         """
         Search for buyers by location (city name or coordinates).
-        Returns buyers in the specified city, or nearby buyers within max_distance_km.
-        Uses haversine distance calculation for geographic proximity.
-        """
-        # City to coordinates mapping for common Indian cities
-        city_coordinates = {
-            'delhi': (28.61, 77.21),
-            'mumbai': (19.08, 72.88),
-            'bangalore': (12.97, 77.59),
-            'hyderabad': (17.39, 78.49),
-            'pune': (18.52, 73.86),
-            'ahmedabad': (23.02, 72.57),
-            'kolkata': (22.57, 88.36),
-            'chennai': (13.08, 80.27),
-            'jaipur': (26.91, 75.78),
-            'lucknow': (26.85, 80.95)
-        }
-        
+        Returns buyers in the specified city, or nearby buyers within max_distance_km
+        of the place the gazetteer resolves location to.
+        """
         # Try exact city match first (case-insensitive)
+        table = self.snapshot
         location_lower = location.lower()
-        exact_match = self.df[self.df['city'].str.lower() == location_lower]
+        exact_match = table.rows_where('city', lambda city: city.lower() == location_lower)
         
         if len(exact_match) > 0:
-            return exact_match.to_dict('records')
+            return table.records_at(exact_match)
         
-        # If no exact match, try to find nearby cities using coordinates
-        if location_lower in city_coordinates:
-            target_lat, target_lng = city_coordinates[location_lower]
+        # If no exact match, try to find nearby buyers using the gazetteer's coordinates
+        place = self.gazetteer.locate(location)
+        if place is not None:
+            target_lat, target_lng = place['lat'], place['lng']
             
-            # Calculate distance to all buyers
-            distances = self.df.apply(
-                lambda row: self._haversine_distance(
-                    target_lat, target_lng,
-                    row['lat'], row['lng']
-                ),
-                axis=1
-            )
+            # Buyers within max_distance_km (spatial index lookup)
+            rows = self.spatial_index_for(table).within_radius(target_lat, target_lng, max_distance_km)
             
-            # Filter by max_distance_km
-            nearby = self.df[distances <= max_distance_km]
-            
-            if len(nearby) > 0:
-                return nearby.to_dict('records')
+            if len(rows) > 0:
+                return table.records_at(rows)
         
         # If still no results, return all buyers as last resort
-        return self.df.to_dict('records')
-    
-    def search_buyers(self, waste_type=None, category=None, location=None, max_distance_km=None):
-        """Search for matching buyers"""
-        
-        filtered = self.df.copy()
-        
-        if waste_type:
-            filtered = filtered[
-                filtered['accepted_waste_types'].apply(lambda x: waste_type in x)
-            ]
-        
-        if category:
-            filtered = filtered[
-                filtered['accepted_categories'].apply(lambda x: category in x)
-            ]
-        
-        if location and max_distance_km:
-            distances = filtered.apply(
-                lambda row: self._haversine_distance(
-                    location['lat'], location['lng'],
-                    row['lat'], row['lng']
-                ),
-                axis=1
-            )
-            filtered = filtered[distances <= max_distance_km]
+        return self.get_all_buyers()
+    
+    def search_buyers(self, waste_type=None, category=None, location=None, max_distance_km=None,
+                      quality_grade=None, min_volume_tons=None, max_volume_tons=None,
+                      hazmat_certified=None):
+        """
+        Search for matching buyers
+        
+        quality_grade: waste grade on offer; keeps buyers whose min_quality_grade it meets
+        min_volume_tons / max_volume_tons: monthly volume window the buyer's range must overlap
+        hazmat_certified: True / False to keep only buyers with / without hazmat certification
+        
+        Filters are planned by BuyerQueryPlanner (see explain_search).
+        """
+        
+        filters = dict(
+            waste_type=waste_type, category=category, location=location,
+            max_distance_km=max_distance_km, quality_grade=quality_grade,
+            min_volume_tons=min_volume_tons, max_volume_tons=max_volume_tons,
+            hazmat_certified=hazmat_certified
+        )
+        planner = BuyerQueryPlanner(self)
+        plan = planner.plan(**filters)
+        if plan.steps[0]['kind'] == 'scan' and len(plan.steps) == 1:
+            return self.get_all_buyers()
+        return planner.table.records_at(planner.execute(plan))
+    
+    def search_rows(self, **filters) -> np.ndarray:
+        """
+        Buyer positions matching search_buyers filters, ascending (e.g. as
+        candidate_rows for GraphMatcher.find_optimal_matches)
+        """
+        
+        planner = BuyerQueryPlanner(self)
+        return planner.execute(planner.plan(**filters))
+    
+    def explain_search(self, **filters) -> QueryPlan:
+        """
+        Run search_buyers' plan for filters and return it with row counts
+        per step; print() it for a readable table
+        """
         
-        return filtered.to_dict('records')
+        planner = BuyerQueryPlanner(self)
+        plan = planner.plan(**filters)
+        planner.execute(plan)
+        return plan
     
     @staticmethod
     def _haversine_distance(lat1, lon1, lat2, lon2):
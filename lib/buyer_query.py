@@ -0,0 +1,151 @@
+import numpy as np
+from typing import Dict, List
+from lib.buyer_table import QUALITY_HIERARCHY
+from lib.spatial_index import haversine_km
+
+# Buyers sampled to estimate how selective a column filter is
+SELECTIVITY_SAMPLE = 4096
+
+
+class QueryPlan:
+    """
+    Ordered steps of one buyer search
+
+    Each step is a dict with the filter, the access method, the planner's
+    row estimate and, once executed, the rows left after the step.
+    """
+
+    def __init__(self, total: int):
+        self.total = total
+        self.steps: List[Dict] = []
+
+    def __str__(self) -> str:
+        lines = [f"{'step':<4} {'filter':<36} {'method':<16} {'estimate':>9} {'rows':>9}"]
+        for i, step in enumerate(self.steps, 1):
+            rows = '-' if step.get('rows') is None else step['rows']
+            lines.append(f"{i:<4} {step['filter']:<36} {step['method']:<16} {step['estimate']:>9} {rows:>9}")
+        return '\n'.join(lines)
+
+
+class BuyerQueryPlanner:
+    """
+    Turns search_buyers filters into index lookups and boolean masks
+
+    The driving step is the cheapest source of candidate rows: an inverted
+    index lookup (waste type / category, exact size known up front) or a
+    spatial grid query (size bounded by its cell counts), or a scan of all
+    buyers when neither applies. The remaining filters run on the surviving
+    rows only, most selective first: index filters as bitset tests (or
+    sorted intersections when the candidate set is larger), the radius as
+    a haversine mask, and column filters as vectorized comparisons. Rows
+    stay an int array of positions throughout; nothing is copied until
+    the caller turns the final rows into records.
+    """
+
+    def __init__(self, buyer_db):
+        self.buyer_db = buyer_db
+        self.table = buyer_db.snapshot
+
+    @property
+    def spatial_index(self):
+        """Grid index over the planner's table (not a newer snapshot)"""
+        return self.buyer_db.spatial_index_for(self.table)
+
+    def plan(self, waste_type=None, category=None, location=None, max_distance_km=None,
+             quality_grade=None, min_volume_tons=None, max_volume_tons=None,
+             hazmat_certified=None) -> QueryPlan:
+        table = self.table
+        plan = QueryPlan(table.size)
+        sources, masks = [], []
+
+        for name, column, index, item in [
+            ('waste_type', 'accepted_waste_types', table.type_index, waste_type),
+            ('category', 'accepted_categories', table.category_index, category)
+        ]:
+            if item:
+                rows = index.get(item, np.zeros(0, dtype=np.int64))
+                sources.append({
+                    'filter': f"{name}={item}", 'kind': 'index',
+                    'estimate': len(rows), 'index_rows': rows, 'column': column, 'item': item
+                })
+
+        if location and max_distance_km:
+            lat, lng = location['lat'], location['lng']
+            sources.append({
+                'filter': f"within {max_distance_km} km", 'kind': 'radius',
+                'estimate': self.spatial_index.candidate_count(lat, lng, max_distance_km),
+                'circle': (lat, lng, max_distance_km),
+                'predicate': lambda rows: haversine_km(lat, lng, table.lat[rows], table.lng[rows]) <= max_distance_km
+            })
+
+        if quality_grade:
+            level = QUALITY_HIERARCHY.get(quality_grade, 2)
+            masks.append({
+                'filter': f"accepts {quality_grade}",
+                'predicate': lambda rows: table.required_level[rows] <= level
+            })
+
+        if min_volume_tons is not None or max_volume_tons is not None:
+            low = -np.inf if min_volume_tons is None else min_volume_tons
+            high = np.inf if max_volume_tons is None else max_volume_tons
+            masks.append({
+                'filter': f"volume {min_volume_tons}-{max_volume_tons} t/month",
+                'predicate': lambda rows: (table.min_volume[rows] <= high) & (table.max_volume[rows] >= low)
+            })
+
+        if hazmat_certified is not None:
+            masks.append({
+                'filter': f"hazmat_certified={bool(hazmat_certified)}",
+                'predicate': lambda rows: table.hazmat_certified[rows] == bool(hazmat_certified)
+            })
+
+        # Column filters: estimate from an evenly spaced sample of buyers
+        sample = np.unique(np.linspace(0, table.size - 1, min(table.size, SELECTIVITY_SAMPLE)).astype(np.int64))
+        for step in masks:
+            step['kind'] = 'mask'
+            passing = np.count_nonzero(step['predicate'](sample)) if len(sample) else 0
+            step['estimate'] = int(round(table.size * passing / max(len(sample), 1)))
+
+        # Drive with the smallest source, or a scan if there is none
+        if sources:
+            driver = min(sources, key=lambda step: step['estimate'])
+            sources.remove(driver)
+            driver['method'] = 'index lookup' if driver['kind'] == 'index' else 'grid query'
+        else:
+            driver = {'filter': 'all buyers', 'kind': 'scan', 'method': 'scan', 'estimate': table.size}
+        plan.steps.append(driver)
+
+        for step in sorted(sources + masks, key=lambda step: step['estimate']):
+            step['method'] = {'index': 'bitset test', 'radius': 'haversine mask'}.get(step['kind'], 'column mask')
+            plan.steps.append(step)
+
+        return plan
+
+    def execute(self, plan: QueryPlan) -> np.ndarray:
+        """Run the plan's steps in order; returns ascending buyer positions"""
+
+        rows = None
+        for step in plan.steps:
+            if rows is not None and len(rows) == 0:
+                step['rows'] = 0
+                continue
+
+            if rows is None:
+                if step['kind'] == 'index':
+                    rows = np.asarray(step['index_rows'], dtype=np.int64)
+                elif step['kind'] == 'radius':
+                    rows = self.spatial_index.within_radius(*step['circle'])
+                else:
+                    rows = np.arange(self.table.size)
+            elif step['kind'] == 'index':
+                if len(rows) <= step['estimate']:
+                    rows = rows[self.table.has_item(step['column'], step['item'], rows)]
+                else:
+                    step['method'] = 'intersect'
+                    rows = np.intersect1d(rows, step['index_rows'])
+            else:
+                rows = rows[step['predicate'](rows)]
+
+            step['rows'] = len(rows)
+
+        return rows
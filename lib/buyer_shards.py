@@ -0,0 +1,116 @@
+import numpy as np
+from typing import Dict
+from lib.buyer_table import BuyerTable
+from lib.spatial_index import haversine_km
+
+EARTH_RADIUS_KM = 6371
+
+
+class BuyerShards:
+    """
+    Geographic partition of a BuyerTable into lat/lng grid-cell shards
+
+    Shard members are stored cell by cell (CSR layout: rows, offsets).
+    Each shard keeps what a best-case score needs without touching its
+    buyers: the bounding box of its members, the lowest required quality
+    level, whether any member is hazmat certified, and the OR of the
+    members' accepted type / category bitsets. Buyers without
+    coordinates share one extra shard with an unbounded box.
+    """
+
+    def __init__(self, table: BuyerTable, cell_deg: float = 2.0):
+        self.table = table
+        self.cell_deg = cell_deg
+
+        lat, lng = table.lat, table.lng
+        located = np.isfinite(lat) & np.isfinite(lng)
+        num_cols = int(np.ceil(360 / cell_deg))
+        keys = np.full(table.size, -1, dtype=np.int64)
+        keys[located] = (
+            np.floor((lat[located] + 90) / cell_deg).astype(np.int64) * num_cols
+            + np.floor((lng[located] + 180) / cell_deg).astype(np.int64) % num_cols
+        )
+
+        order = np.argsort(keys, kind='stable')
+        self.rows = order
+        self.cell_keys, starts = np.unique(keys[order], return_index=True)
+        self.offsets = np.append(starts, table.size).astype(np.int64)
+        self.count = len(self.cell_keys)
+
+        if self.count == 0:
+            empty = np.zeros(0)
+            self.lat_lo = self.lat_hi = self.lng_lo = self.lng_hi = empty
+            self.min_required_level = np.zeros(0, dtype=np.int8)
+            self.any_hazmat = np.zeros(0, dtype=bool)
+            self._bits = {}
+            return
+
+        starts = self.offsets[:-1]
+        member_lat, member_lng = lat[order], lng[order]
+        with np.errstate(invalid='ignore'):
+            self.lat_lo = np.minimum.reduceat(member_lat, starts)
+            self.lat_hi = np.maximum.reduceat(member_lat, starts)
+            self.lng_lo = np.minimum.reduceat(member_lng, starts)
+            self.lng_hi = np.maximum.reduceat(member_lng, starts)
+
+        # The unlocated shard (key -1) has no usable box
+        unlocated = self.cell_keys < 0
+        self.lat_lo[unlocated] = np.nan
+
+        self.min_required_level = np.minimum.reduceat(table.required_level[order], starts)
+        self.any_hazmat = np.logical_or.reduceat(table.hazmat_certified[order], starts)
+
+        # Shard-level OR of the members' multi-hot rows
+        self._bits = {
+            name: np.bitwise_or.reduceat(np.asarray(table._bits[name])[order], starts, axis=0)
+            for name in ['accepted_waste_types', 'accepted_categories'] if name in table._bits
+        }
+
+    def members(self, shard: int) -> np.ndarray:
+        """Buyer positions in shard, ascending"""
+        return np.sort(self.rows[self.offsets[shard]:self.offsets[shard + 1]])
+
+    def has_item(self, name: str, item: str) -> np.ndarray:
+        """Shards with at least one member listing item in list column name"""
+
+        vocab = self.table._vocab.get(name, [])
+        if name not in self._bits or item not in vocab:
+            return np.zeros(self.count, dtype=bool)
+        bit = vocab.index(item)
+        return (self._bits[name][:, bit >> 3] & (0x80 >> (bit & 7))) != 0
+
+    def min_distance_km(self, lat: float, lng: float) -> np.ndarray:
+        """
+        Lower bound on the great-circle distance from (lat, lng) to any
+        member of each shard (0 for the unlocated shard)
+        """
+
+        lat_near = np.clip(lat, self.lat_lo, self.lat_hi)
+        lat_gap = EARTH_RADIUS_KM * np.abs(np.radians(lat) - np.radians(lat_near))
+
+        # Angular distance to the nearest meridian edge of the box
+        to_lo = np.abs((self.lng_lo - lng + 180) % 360 - 180)
+        to_hi = np.abs((self.lng_hi - lng + 180) % 360 - 180)
+        inside = (lng >= self.lng_lo) & (lng <= self.lng_hi)
+        dlng = np.where(inside, 0.0, np.minimum(to_lo, to_hi))
+        edge = np.where(to_lo <= to_hi, self.lng_lo, self.lng_hi)
+
+        # Closest point on that meridian segment (unimodal along it)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            lat_star = np.degrees(np.arctan(np.tan(np.radians(lat)) / np.cos(np.radians(dlng))))
+            lat_star = np.clip(lat_star, self.lat_lo, self.lat_hi)
+            edge_distance = haversine_km(lat, lng, lat_star, edge)
+
+        distance = np.where(inside | (dlng >= 90), lat_gap, np.maximum(lat_gap, edge_distance))
+        distance = np.where(np.isnan(self.lat_lo), 0.0, distance)
+
+        # Keep a margin for floating point so the bound never overshoots
+        return np.maximum(distance * (1 - 1e-9) - 1e-6, 0)
+
+    def stats(self) -> Dict:
+        sizes = np.diff(self.offsets)
+        return {
+            'shards': int(self.count),
+            'largest_shard': int(sizes.max()) if self.count else 0,
+            'mean_shard': float(sizes.mean()) if self.count else 0.0
+        }
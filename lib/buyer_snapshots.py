@@ -0,0 +1,287 @@
+import logging
+import os
+import re
+import shutil
+import threading
+import time
+import pandas as pd
+from typing import Dict, Tuple
+from lib.buyer_database import BuyerDatabase, source_signature
+from lib.buyer_store import BuyerStore, is_sqlite_path
+
+logger = logging.getLogger(__name__)
+
+# Published snapshot directories under a shared root: gen-000001, gen-000002, ...
+GENERATION_DIR = re.compile(r'^gen-(\d+)$')
+
+# Older generations kept after publishing (workers may still map them)
+KEEP_GENERATIONS = 3
+
+# Seconds after which a leftover publish lock is considered abandoned
+PUBLISH_LOCK_TIMEOUT = 600
+
+
+def latest_generation(shared_root: str) -> Tuple[int, str]:
+    """(generation, snapshot dir) of the newest published snapshot, (0, None) if none"""
+
+    try:
+        names = os.listdir(shared_root)
+    except FileNotFoundError:
+        return 0, None
+    generations = [int(m.group(1)) for m in map(GENERATION_DIR.match, names) if m]
+    if not generations:
+        return 0, None
+    generation = max(generations)
+    return generation, os.path.join(shared_root, f'gen-{generation:06d}')
+
+
+def publish_snapshot(source: str, shared_root: str, keep: int = KEEP_GENERATIONS) -> int:
+    """
+    Compile source into the next generation under shared_root; returns it,
+    or None when another process is already publishing
+
+    The snapshot is written to a private directory and then renamed to
+    gen-N (the next free number). Published directories are never
+    modified, so workers can keep mapping any generation they attached to.
+    """
+
+    os.makedirs(shared_root, exist_ok=True)
+    lock_path = os.path.join(shared_root, 'publish.lock')
+    try:
+        os.close(os.open(lock_path, os.O_CREAT | os.O_EXCL | os.O_WRONLY))
+    except FileExistsError:
+        # A publisher that died leaves its lock behind
+        if time.time() - os.path.getmtime(lock_path) < PUBLISH_LOCK_TIMEOUT:
+            return None
+        os.utime(lock_path)
+
+    try:
+        # Someone may have published this source state while we waited
+        generation, path = latest_generation(shared_root)
+        if path and BuyerDatabase(path).source_signature == source_signature(source):
+            return generation
+
+        tmp_path = os.path.join(shared_root, f'publish.tmp{os.getpid()}')
+        BuyerDatabase.compile_snapshot(source, tmp_path)
+
+        generation = latest_generation(shared_root)[0] + 1
+        while os.path.exists(os.path.join(shared_root, f'gen-{generation:06d}')):
+            generation += 1
+        os.rename(tmp_path, os.path.join(shared_root, f'gen-{generation:06d}'))
+    finally:
+        os.remove(lock_path)
+
+    # Unlinking mapped files is safe on POSIX; elsewhere old ones stay until unmapped
+    stale = sorted(
+        int(m.group(1)) for m in map(GENERATION_DIR.match, os.listdir(shared_root)) if m
+    )[:-keep]
+    for old in stale:
+        shutil.rmtree(os.path.join(shared_root, f'gen-{old:06d}'), ignore_errors=True)
+
+    logger.info("Published buyer snapshot generation %d to %s", generation, shared_root)
+    return generation
+
+
+class BuyerSnapshotManager:
+    """
+    Serve the latest BuyerDatabase for a buyer source without blocking readers
+
+    Readers take `current` once per request and keep using that database,
+    so a reload never changes data under an in-flight request. When the
+    source changes (CSV mtime/size, or the SQLite registry's write
+    counter), a background thread builds a new
+    BuyerDatabase with its snapshot, then swaps it in with one reference
+    assignment. `version` counts swaps and in-memory additions.
+
+    With snapshot_path, databases are memory-mapped from the compiled
+    snapshot when it matches the CSV, and the snapshot is recompiled
+    from the CSV (the import source) when it does not.
+
+    With shared_root, every worker process attaches read-only to the
+    newest generation published there (publish_snapshot, or
+    scripts/publish_buyer_snapshot.py as a standalone loader). Their
+    arrays live in the page cache once for all workers. A newer
+    generation is picked up like any other source change. A worker
+    publishes one itself when none matches the source yet.
+    """
+
+    def __init__(self, filename: str, poll_interval: float = 2.0, snapshot_path: str = None,
+                 shared_root: str = None):
+        self.filename = filename
+        self.poll_interval = poll_interval
+        self.snapshot_path = snapshot_path
+        self.shared_root = shared_root
+
+        self._lock = threading.Lock()       # Guards swaps and additions
+        self._reloading = None              # Background reload thread, if any
+        self._last_check = time.monotonic()
+
+        signature = self._source_signature()
+        self._state = (1, self._open(signature))
+        self._loaded_signature = self._loaded(signature, self._state[1])
+
+    @property
+    def current(self) -> BuyerDatabase:
+        """Latest database; also starts a reload if the source has changed"""
+
+        if time.monotonic() - self._last_check >= self.poll_interval:
+            self.check()
+        return self._state[1]
+
+    @property
+    def version(self) -> int:
+        return self._state[0]
+
+    @property
+    def generation(self) -> int:
+        """Shared generation the current database is mapped from (0 when not shared)"""
+        return self._generation_of(self._state[1])
+
+    @staticmethod
+    def _generation_of(db: BuyerDatabase) -> int:
+        path = db.snapshot_path
+        match = GENERATION_DIR.match(os.path.basename(path)) if path else None
+        return int(match.group(1)) if match else 0
+
+    def _loaded(self, signature, db: BuyerDatabase):
+        """Signature to record for db (shared: the generation actually attached)"""
+        if self.shared_root:
+            return self._generation_of(db), signature[1]
+        return signature
+
+    def _source_signature(self):
+        if self.shared_root:
+            return latest_generation(self.shared_root)[0], source_signature(self.filename)
+        return source_signature(self.filename)
+
+    def _open(self, signature) -> BuyerDatabase:
+        """Database for the CSV state given by signature, snapshot first"""
+
+        if self.shared_root:
+            return self._attach(signature[1])
+
+        if self.snapshot_path:
+            try:
+                db = BuyerDatabase(self.snapshot_path)
+                if db.source_signature == signature:
+                    return db
+            except (OSError, ValueError, KeyError):
+                pass
+            return BuyerDatabase.compile_snapshot(self.filename, self.snapshot_path)
+
+        db = BuyerDatabase(self.filename)
+        db.snapshot  # Build the columnar snapshot before serving
+        return db
+
+    def _attach(self, source_state) -> BuyerDatabase:
+        """
+        Newest shared generation, publishing one first if it does not match
+        source_state. While another process publishes, the newest existing
+        generation is served (or awaited at first start).
+        """
+
+        while True:
+            generation, path = latest_generation(self.shared_root)
+            db = None
+            if path:
+                try:
+                    db = BuyerDatabase(path)
+                except (OSError, ValueError, KeyError):
+                    pass
+            if db is not None and db.source_signature == source_state:
+                return db
+
+            generation = publish_snapshot(self.filename, self.shared_root)
+            if generation is not None:
+                return BuyerDatabase(os.path.join(self.shared_root, f'gen-{generation:06d}'))
+            if db is not None:
+                return db
+            time.sleep(self.poll_interval)
+
+    def check(self) -> bool:
+        """Start a background reload if the CSV changed; True if one started"""
+
+        self._last_check = time.monotonic()
+        try:
+            signature = self._source_signature()
+        except OSError:
+            return False
+
+        with self._lock:
+            if signature == self._loaded_signature or self._reloading is not None:
+                return False
+            self._reloading = threading.Thread(
+                target=self._reload, args=(signature,), daemon=True
+            )
+            self._reloading.start()
+        return True
+
+    def reload(self, wait: bool = True):
+        """Force a rebuild from the CSV (blocks until swapped when wait=True)"""
+
+        with self._lock:
+            self._loaded_signature = None
+        self.check()
+        thread = self._reloading
+        if wait and thread is not None:
+            thread.join()
+
+    def _reload(self, signature):
+        try:
+            db = self._open(signature)
+        except Exception as e:
+            logger.warning("Buyer reload failed, keeping version %d: %s", self.version, e)
+            with self._lock:
+                self._reloading = None
+            return
+
+        with self._lock:
+            self._state = (self._state[0] + 1, db)
+            self._loaded_signature = self._loaded(signature, db)
+            self._reloading = None
+        logger.info("Buyer snapshot v%d swapped in: %d buyers", self.version, db.snapshot.size)
+
+        # Picks up writes made while this reload was reading the file
+        self.check()
+
+    def next_buyer_id(self) -> str:
+        """ID after the last buyer's, e.g. B103 -> B104"""
+
+        snapshot = self._state[1].snapshot
+        if snapshot.size == 0:
+            return "B001"
+        last_id = snapshot.record(snapshot.size - 1)['buyer_id']
+        return f"B{int(last_id[1:]) + 1:03d}"
+
+    def add_buyer(self, buyer: Dict) -> Dict:
+        """
+        Assign the next buyer_id, append the row to the CSV and add it to
+        the current database in memory. Returns the stored record.
+        A SQLite source assigns the buyer_id itself (BuyerStore).
+        """
+
+        with self._lock:
+            version, db = self._state
+            if is_sqlite_path(self.filename):
+                # The registry assigns buyer_id in its insert transaction;
+                # a database opened from a snapshot has no store to do it
+                row = dict(buyer)
+                if db.store is None:
+                    row['buyer_id'] = BuyerStore(self.filename).insert_buyer(buyer)
+            else:
+                row = dict(buyer, buyer_id=self.next_buyer_id())
+                header = pd.read_csv(self.filename, nrows=0).columns
+                pd.DataFrame([row]).reindex(columns=header).to_csv(
+                    self.filename, mode='a', header=False, index=False
+                )
+
+            record = db.add_buyer(row)
+            self._state = (version + 1, db)
+
+            # The file now matches memory, unless a reload is still reading
+            # the old contents (it re-checks after swapping). Shared workers
+            # leave the change to be published as a new generation.
+            if self._reloading is None and not self.shared_root:
+                self._loaded_signature = self._source_signature()
+
+        return record
@@ -0,0 +1,202 @@
+import sqlite3
+from contextlib import closing
+from pathlib import Path
+import pandas as pd
+from typing import Dict, List
+
+# File suffixes treated as a SQLite buyer registry instead of a CSV
+SQLITE_SUFFIXES = ('.db', '.sqlite', '.sqlite3')
+
+# Buyer columns, in the CSV's order
+BUYER_COLUMNS = [
+    'buyer_id', 'company_name', 'company_type', 'accepted_waste_types',
+    'accepted_categories', 'min_quality_grade', 'min_monthly_volume_tons',
+    'max_monthly_volume_tons', 'city', 'state', 'lat', 'lng', 'pricing_model',
+    'certifications', 'contact_email', 'contact_name'
+]
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS buyers (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    buyer_id TEXT UNIQUE,
+    company_name TEXT,
+    company_type TEXT,
+    accepted_waste_types TEXT,
+    accepted_categories TEXT,
+    min_quality_grade TEXT,
+    min_monthly_volume_tons NUMERIC,
+    max_monthly_volume_tons NUMERIC,
+    city TEXT,
+    state TEXT,
+    lat REAL,
+    lng REAL,
+    pricing_model TEXT,
+    certifications TEXT,
+    contact_email TEXT,
+    contact_name TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_buyers_city ON buyers (city COLLATE NOCASE);
+CREATE INDEX IF NOT EXISTS idx_buyers_state ON buyers (state COLLATE NOCASE);
+
+CREATE TABLE IF NOT EXISTS buyer_waste_types (
+    buyer INTEGER NOT NULL REFERENCES buyers (id),
+    waste_type TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_buyer_waste_types ON buyer_waste_types (waste_type, buyer);
+
+CREATE TABLE IF NOT EXISTS buyer_categories (
+    buyer INTEGER NOT NULL REFERENCES buyers (id),
+    category TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_buyer_categories ON buyer_categories (category, buyer);
+
+-- Bumped by every write, so readers can tell when to reload
+CREATE TABLE IF NOT EXISTS registry_version (version INTEGER NOT NULL);
+INSERT INTO registry_version SELECT 0 WHERE NOT EXISTS (SELECT 1 FROM registry_version);
+"""
+
+
+def is_sqlite_path(path) -> bool:
+    return str(path).lower().endswith(SQLITE_SUFFIXES)
+
+
+def registry_version(path: str) -> int:
+    """
+    Write counter of the registry at path, read without creating or
+    changing anything (for change polling)
+    """
+
+    uri = Path(path).absolute().as_uri() + '?mode=ro'
+    with closing(sqlite3.connect(uri, uri=True, timeout=30)) as conn:
+        return conn.execute("SELECT version FROM registry_version").fetchone()[0]
+
+
+def _split(value) -> List[str]:
+    """Same splitting as BuyerDatabase._process_data"""
+    return [item.strip() for item in str(value).split(',')]
+
+
+class BuyerStore:
+    """
+    Local SQLite buyer registry
+
+    Buyers keep their CSV columns (list fields as comma-separated text),
+    plus join tables of accepted waste types and categories for indexed
+    lookups. buyer_id is derived from the autoincrement key inside the
+    insert transaction, so concurrent writers never reuse an ID.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        with closing(self._connect()) as conn:
+            conn.executescript(SCHEMA)
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA foreign_keys=ON")
+        return conn
+
+    def version(self) -> int:
+        """Write counter, bumped in every insert transaction"""
+        return registry_version(self.path)
+
+    def import_csv(self, csv_path: str) -> int:
+        """Import a buyer CSV, keeping its buyer_ids (B007 -> key 7). Returns rows added."""
+
+        df = pd.read_csv(csv_path)
+        rows = [self._row(buyer) for buyer in df.to_dict('records')]
+
+        conn = self._connect()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            for row in rows:
+                key = int(row['buyer_id'][1:])
+                self._insert(conn, row, key)
+            conn.execute("UPDATE registry_version SET version = version + 1")
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        finally:
+            conn.close()
+
+        print(f"Imported {len(rows)} buyers from {csv_path} into {self.path}")
+        return len(rows)
+
+    def insert_buyer(self, buyer: Dict) -> str:
+        """Insert one buyer in its own transaction; returns the new buyer_id"""
+
+        conn = self._connect()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            key = self._insert(conn, self._row(dict(buyer, buyer_id=None)))
+            buyer_id = f"B{key:03d}"
+            conn.execute("UPDATE buyers SET buyer_id = ? WHERE id = ?", (buyer_id, key))
+            conn.execute("UPDATE registry_version SET version = version + 1")
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        finally:
+            conn.close()
+
+        return buyer_id
+
+    @staticmethod
+    def _row(buyer: Dict) -> Dict:
+        row = {}
+        for column in BUYER_COLUMNS:
+            value = buyer.get(column)
+            if isinstance(value, list):
+                value = ','.join(value)
+            row[column] = None if pd.isna(value) else value
+        return row
+
+    def _insert(self, conn: sqlite3.Connection, row: Dict, key: int = None) -> int:
+        columns = ['id'] + BUYER_COLUMNS
+        cursor = conn.execute(
+            f"INSERT INTO buyers ({', '.join(columns)}) VALUES ({', '.join('?' * len(columns))})",
+            [key] + [row[column] for column in BUYER_COLUMNS]
+        )
+        key = cursor.lastrowid
+
+        for table, field, column in [('buyer_waste_types', 'waste_type', 'accepted_waste_types'),
+                                     ('buyer_categories', 'category', 'accepted_categories')]:
+            values = dict.fromkeys(_split(row[column])) if row[column] is not None else {}
+            conn.executemany(
+                f"INSERT INTO {table} (buyer, {field}) VALUES (?, ?)",
+                [(key, value) for value in values]
+            )
+        return key
+
+    def load_frame(self) -> pd.DataFrame:
+        """All buyers in key order, with the same columns as the CSV"""
+
+        with closing(self._connect()) as conn:
+            return pd.read_sql_query(
+                f"SELECT {', '.join(BUYER_COLUMNS)} FROM buyers ORDER BY id", conn
+            )
+
+    def search(self, waste_type: str = None, category: str = None,
+               city: str = None, state: str = None) -> List[str]:
+        """buyer_ids matching every given filter (index lookups, case-insensitive places)"""
+
+        clauses, params = [], []
+        if waste_type:
+            clauses.append("id IN (SELECT buyer FROM buyer_waste_types WHERE waste_type = ?)")
+            params.append(waste_type)
+        if category:
+            clauses.append("id IN (SELECT buyer FROM buyer_categories WHERE category = ?)")
+            params.append(category)
+        if city:
+            clauses.append("city = ? COLLATE NOCASE")
+            params.append(city)
+        if state:
+            clauses.append("state = ? COLLATE NOCASE")
+            params.append(state)
+
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+        with closing(self._connect()) as conn:
+            rows = conn.execute(f"SELECT buyer_id FROM buyers {where} ORDER BY id", params)
+            return [buyer_id for (buyer_id,) in rows]
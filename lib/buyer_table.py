@@ -0,0 +1,532 @@
+import json
+import os
+import re
+import sys
+import numpy as np
+import pandas as pd
+from collections.abc import Sequence
+from typing import List, Dict
+from lib.atomic_dir import atomic_replace_dir
+
+# Quality grades ordered from best to worst
+QUALITY_HIERARCHY = {
+    'Grade A': 4,
+    'Clean': 3,
+    'Grade B': 2,
+    'Grade C': 1,
+    'Mixed': 1,
+    'As-Is': 0
+}
+
+# Certifications accepted for hazardous waste handling
+HAZMAT_CERTIFICATIONS = ['CPCB', 'SPCB', 'MoEFCC', 'Hazardous_Waste_Authorization']
+
+# One bit per recognized authorization, in HAZMAT_CERTIFICATIONS order
+CERTIFICATION_BITS = {cert: 1 << bit for bit, cert in enumerate(HAZMAT_CERTIFICATIONS)}
+HAZMAT_MASK = sum(CERTIFICATION_BITS.values())
+
+# Pricing assumed when a buyer has none
+DEFAULT_PRICING = '₹10000-12000/ton'
+
+# Keyword pricing models and their assumed INR/ton
+KEYWORD_PRICES = {
+    'Market_Rate': 12000,
+    'Negotiable': 10000
+}
+
+# Fallbacks for pricing strings that cannot be parsed
+FALLBACK_PRICE = 10000
+FALLBACK_COLLECTION_FEE = 5000
+
+# Numeric pricing columns BuyerDatabase adds to every buyer
+PRICE_COLUMNS = ['price_min', 'price_max', 'price_avg', 'price_is_cost']
+
+# Bumped whenever the on-disk snapshot layout changes
+SNAPSHOT_FORMAT_VERSION = 1
+
+# Scoring arrays stored with a snapshot, so workers map them instead of recomputing
+DERIVED_ARRAYS = [
+    'lat', 'lng', 'min_volume', 'max_volume', 'required_level',
+    'price_per_ton', 'certification_mask', 'hazmat_certified'
+]
+
+# Comma-separated fields BuyerDatabase splits into lists
+LIST_COLUMNS = ['accepted_waste_types', 'accepted_categories', 'certifications']
+
+# e.g. "₹11000-13000/ton", "₹24-29/kg", "Collection_Fee: ₹700-1200/ton"
+PRICE_RANGE = re.compile(
+    r'^(?P<fee>Collection_Fee\s*:)?\s*₹?\s*(?P<min>\d[\d,]*(?:\.\d+)?)'
+    r'(?:\s*-\s*₹?\s*(?P<max>\d[\d,]*(?:\.\d+)?))?\s*(?:/\s*\w+)?$'
+)
+
+
+def parse_pricing(pricing) -> Dict:
+    """
+    Parse a pricing_model string into numeric columns
+
+    Returns dict with price_min, price_max, price_avg (INR per unit),
+    price_is_cost (collection fee charged to the seller) and
+    price_parsed (False when a fallback price was used).
+    """
+
+    if not isinstance(pricing, str) or not pricing.strip():
+        pricing = DEFAULT_PRICING
+    pricing = pricing.strip()
+
+    match = PRICE_RANGE.match(pricing)
+    if match:
+        min_price = float(match.group('min').replace(',', ''))
+        max_price = float((match.group('max') or match.group('min')).replace(',', ''))
+        is_cost = match.group('fee') is not None
+        parsed = True
+    else:
+        keyword = next((k for k in KEYWORD_PRICES if k in pricing), None)
+        is_cost = keyword is None and 'Collection_Fee' in pricing
+        parsed = keyword is not None
+        if keyword:
+            min_price = max_price = KEYWORD_PRICES[keyword]
+        elif is_cost:
+            min_price = max_price = FALLBACK_COLLECTION_FEE
+        else:
+            min_price = max_price = FALLBACK_PRICE
+
+    return {
+        'price_min': min_price,
+        'price_max': max_price,
+        'price_avg': (min_price + max_price) / 2,
+        'price_is_cost': is_cost,
+        'price_parsed': parsed
+    }
+
+
+def price_per_ton(buyer: Dict) -> float:
+    """
+    Signed price used for economics: the average price for buyers who pay,
+    minus the lower collection fee for buyers who charge
+    """
+
+    if 'price_avg' not in buyer:
+        buyer = parse_pricing(buyer.get('pricing_model', DEFAULT_PRICING))
+    if buyer['price_is_cost']:
+        return -buyer['price_min']
+    return buyer['price_avg']
+
+
+def certification_bits(certification: str) -> int:
+    """
+    Authorization bits granted by one certification spelling, 0 if none
+    (e.g. 'SPCB_Auth' contains SPCB; case and underscores are ignored)
+    """
+
+    normalized = str(certification).upper().replace('_', '')
+    mask = 0
+    for cert, bit in CERTIFICATION_BITS.items():
+        if cert.upper().replace('_', '') in normalized:
+            mask |= bit
+    return mask
+
+
+def certification_mask(certifications: List[str]) -> int:
+    """Bitmask of the authorizations held across a buyer's certifications"""
+
+    mask = 0
+    for certification in certifications:
+        mask |= certification_bits(certification)
+    return mask
+
+
+def build_inverted_index(values: List[List[str]]) -> Dict[str, np.ndarray]:
+    """Map each value to the sorted positions of the lists containing it"""
+
+    index = {}
+    for row, items in enumerate(values):
+        for item in items:
+            rows = index.setdefault(item, [])
+            # Guard against a value listed twice for the same buyer
+            if not rows or rows[-1] != row:
+                rows.append(row)
+
+    return {item: np.array(rows, dtype=np.int64) for item, rows in index.items()}
+
+
+class BuyerRecords(Sequence):
+    """Read-only list view building each buyer dict only when indexed"""
+
+    def __init__(self, table: 'BuyerTable'):
+        self._table = table
+
+    def __len__(self) -> int:
+        return self._table.size
+
+    def __getitem__(self, position):
+        if isinstance(position, slice):
+            return [self._table.record(j) for j in range(self._table.size)[position]]
+        if position < 0:
+            position += self._table.size
+        if not 0 <= position < self._table.size:
+            raise IndexError(position)
+        return self._table.record(position)
+
+
+class BuyerTable:
+    """
+    Immutable columnar snapshot of a buyer list for vectorized scoring
+
+    Every per-buyer attribute used by the matcher is stored as a read-only
+    NumPy array indexed by buyer position, so one waste stream can be
+    scored against all buyers with array operations. List fields are
+    multi-hot bitsets (one bit per vocabulary entry, packed 8 per byte)
+    plus CSR vocabulary ids that keep each buyer's original order; other
+    text fields are interned strings referenced by integer codes.
+    Accepted types and categories are also held as inverted indexes; pass
+    the BuyerDatabase indexes to skip rebuilding them.
+
+    Build from a DataFrame with from_frame() to avoid per-buyer dicts:
+    records then is a lazy view and record(j) rebuilds one buyer on demand.
+    save() / load() store the same arrays as a memory-mapped snapshot.
+    """
+
+    def __init__(self, buyers: List[Dict], type_index: Dict = None, category_index: Dict = None):
+        self._store_frame(pd.DataFrame(buyers))
+        self._derive(type_index, category_index)
+        self.records = buyers
+
+    @classmethod
+    def from_frame(cls, df: pd.DataFrame, type_index: Dict = None, category_index: Dict = None) -> 'BuyerTable':
+        """Snapshot of a BuyerDatabase frame (list fields already split)"""
+
+        table = cls.__new__(cls)
+        table._store_frame(df)
+        table._derive(type_index, category_index)
+        table.records = BuyerRecords(table)
+        return table
+
+    def _store_frame(self, df: pd.DataFrame):
+        self.size = len(df)
+        self.column_names = list(df.columns)
+        self._text = {}   # Key: column, Value: (codes, interned values)
+        self._numeric = {}
+        self._vocab = {}  # Key: list column, Value: vocabulary in bit order
+        self._bits = {}   # Key: list column, Value: packed multi-hot rows
+        self._lists = {}  # Key: list column, Value: (offsets, vocabulary ids)
+
+        for name in self.column_names:
+            if name in LIST_COLUMNS:
+                self._store_lists(name, df[name])
+            elif pd.api.types.is_numeric_dtype(df[name]):
+                self._numeric[name] = self._frozen(df[name].to_numpy())
+            else:
+                codes, values = pd.factorize(df[name])
+                values = np.array([sys.intern(v) if isinstance(v, str) else v for v in values], dtype=object)
+                self._text[name] = (self._frozen(codes.astype(np.int32)), values)
+
+    def _derive(self, type_index: Dict, category_index: Dict, derived: Dict = None):
+        """
+        Scoring arrays computed from the stored columns, or taken as-is
+        from derived (a loaded snapshot's DERIVED_ARRAYS)
+        """
+
+        if derived is not None:
+            for name, values in derived.items():
+                setattr(self, name, values)
+            self.type_index = type_index
+            self.category_index = category_index
+            return
+
+        self.lat = self._frozen(np.asarray(self._column('lat', np.nan), dtype=np.float64))
+        self.lng = self._frozen(np.asarray(self._column('lng', np.nan), dtype=np.float64))
+        self.min_volume = self._frozen(np.asarray(self._column('min_monthly_volume_tons', 0), dtype=np.float64))
+        self.max_volume = self._frozen(
+            np.asarray(self._column('max_monthly_volume_tons', float('inf')), dtype=np.float64)
+        )
+
+        # Unknown grades fall back to the same defaults as the per-pair scorer
+        if 'min_quality_grade' in self._text:
+            codes, values = self._text['min_quality_grade']
+            levels = np.array([QUALITY_HIERARCHY.get(str(v), 1) for v in values] + [1], dtype=np.int8)
+            self.required_level = self._frozen(levels[codes])
+        else:
+            self.required_level = self._frozen(np.full(self.size, 1, dtype=np.int8))
+
+        # Inverted indexes: accepted type / category -> buyer positions
+        self.type_index = type_index if type_index is not None else self._inverted('accepted_waste_types')
+        self.category_index = category_index if category_index is not None else self._inverted('accepted_categories')
+
+        # Signed INR/ton from the pre-parsed pricing columns
+        if all(column in self._numeric for column in PRICE_COLUMNS):
+            price = np.where(self._numeric['price_is_cost'].astype(bool),
+                             -self._numeric['price_min'].astype(np.float64),
+                             self._numeric['price_avg'].astype(np.float64))
+        else:
+            price = [price_per_ton({'pricing_model': p}) for p in self._column('pricing_model', None)]
+        self.price_per_ton = self._frozen(np.asarray(price, dtype=np.float64))
+
+        # Authorization bitmask per buyer, normalized once per spelling
+        if 'certification_mask' in self._numeric:
+            cert_mask = self._numeric['certification_mask'].astype(np.int64)
+        elif 'certifications' in self._lists:
+            offsets, ids = self._lists['certifications']
+            vocab_bits = np.array(
+                [certification_bits(cert) for cert in self._vocab['certifications']] + [0], dtype=np.int64
+            )
+            per_item = np.append(vocab_bits[ids], 0)
+            cert_mask = np.bitwise_or.reduceat(per_item, np.minimum(offsets[:-1], len(ids)))
+            cert_mask[offsets[:-1] == offsets[1:]] = 0
+        else:
+            cert_mask = np.zeros(self.size, dtype=np.int64)
+        self.certification_mask = self._frozen(cert_mask)
+        self.hazmat_certified = self._frozen((cert_mask & HAZMAT_MASK) != 0)
+
+    @property
+    def buyer_ids(self) -> np.ndarray:
+        return self._column('buyer_id', None)
+
+    @staticmethod
+    def _frozen(values: np.ndarray) -> np.ndarray:
+        values.flags.writeable = False
+        return values
+
+    def _column(self, name: str, default) -> np.ndarray:
+        """Full column as an array, default when the column is absent"""
+
+        if name in self._numeric:
+            return self._numeric[name]
+        if name in self._text:
+            codes, values = self._text[name]
+            return np.append(np.asarray(values, dtype=object), np.nan)[codes]
+        return np.full(self.size, default, dtype=object)
+
+    def _store_lists(self, name: str, lists):
+        vocab = {}
+        offsets = [0]
+        ids = []
+        for items in lists:
+            if isinstance(items, list):
+                ids.extend(vocab.setdefault(item, len(vocab)) for item in items)
+            offsets.append(len(ids))
+
+        offsets = np.array(offsets, dtype=np.int64)
+        ids = np.array(ids, dtype=np.int32)
+        dense = np.zeros((self.size, max(len(vocab), 1)), dtype=bool)
+        dense[np.repeat(np.arange(self.size), np.diff(offsets)), ids] = True
+
+        self._vocab[name] = list(vocab)
+        self._bits[name] = self._frozen(np.packbits(dense, axis=1))
+        self._lists[name] = (self._frozen(offsets), self._frozen(ids))
+
+    def _bit_column(self, name: str, bit: int) -> np.ndarray:
+        return (self._bits[name][:, bit >> 3] & (0x80 >> (bit & 7))) != 0
+
+    def _any_bit(self, name: str, selected: List[bool]) -> np.ndarray:
+        """Buyers with any of the selected vocabulary bits set"""
+
+        if name not in self._bits:
+            return np.zeros(self.size, dtype=bool)
+        wanted = np.zeros(self._bits[name].shape[1] * 8, dtype=bool)
+        wanted[:len(selected)] = selected
+        return (self._bits[name] & np.packbits(wanted)).any(axis=1)
+
+    def _inverted(self, name: str) -> Dict[str, np.ndarray]:
+        if name not in self._bits:
+            return {}
+        return {
+            item: np.flatnonzero(self._bit_column(name, bit))
+            for bit, item in enumerate(self._vocab[name])
+        }
+
+    def record(self, position: int) -> Dict:
+        """One buyer as a dict, equal to its DataFrame.to_dict('records') row"""
+
+        if isinstance(self.records, list):
+            return self.records[position]
+
+        record = {}
+        for name in self.column_names:
+            if name in self._lists:
+                offsets, ids = self._lists[name]
+                vocab = self._vocab[name]
+                record[name] = [vocab[i] for i in ids[offsets[position]:offsets[position + 1]]]
+            elif name in self._numeric:
+                record[name] = self._numeric[name][position].item()
+            else:
+                codes, values = self._text[name]
+                value = values[codes[position]] if codes[position] >= 0 else np.nan
+                record[name] = str(value) if isinstance(value, np.str_) else value
+        return record
+
+    def rows_where(self, name: str, predicate) -> np.ndarray:
+        """Rows whose text column value satisfies predicate (tested once per distinct value)"""
+
+        if name not in self._text:
+            return np.zeros(0, dtype=np.int64)
+        codes, values = self._text[name]
+        hit = np.array([isinstance(v, str) and predicate(str(v)) for v in values] + [False], dtype=bool)
+        return np.flatnonzero(hit[codes])
+
+    def records_at(self, rows) -> List[Dict]:
+        """Buyer dicts for the given positions, in order"""
+        return [self.record(int(j)) for j in rows]
+
+    def to_frame(self) -> pd.DataFrame:
+        """Rebuild the source DataFrame (list fields as lists)"""
+
+        columns = {}
+        for name in self.column_names:
+            if name in self._lists:
+                offsets, ids = self._lists[name]
+                vocab = np.array(self._vocab[name] + [None], dtype=object)
+                items = vocab[ids]
+                columns[name] = [list(items[offsets[j]:offsets[j + 1]]) for j in range(self.size)]
+            elif name in self._numeric:
+                columns[name] = np.array(self._numeric[name])
+            else:
+                columns[name] = self._column(name, None)
+        return pd.DataFrame(columns, columns=self.column_names)
+
+    def save(self, path: str, metadata: Dict = None):
+        """
+        Write the snapshot as a directory of .npy arrays plus manifest.json
+        (replaced atomically). metadata is stored in the manifest as-is.
+        """
+
+        atomic_replace_dir(path, lambda tmp_path: self._write(tmp_path, metadata))
+
+    def _write(self, tmp_path: str, metadata: Dict):
+        """Arrays and manifest of save(), written into the empty directory tmp_path"""
+
+        def put(array_name, values):
+            np.save(os.path.join(tmp_path, array_name + '.npy'), np.asarray(values))
+            return array_name
+
+        columns = []
+        for i, name in enumerate(self.column_names):
+            if name in self._lists:
+                offsets, ids = self._lists[name]
+                columns.append({
+                    'name': name, 'kind': 'list', 'vocab': self._vocab[name],
+                    'bits': put(f'bits_{i}', self._bits[name]),
+                    'offsets': put(f'offsets_{i}', offsets),
+                    'ids': put(f'ids_{i}', ids)
+                })
+            elif name in self._numeric:
+                columns.append({'name': name, 'kind': 'numeric', 'values': put(f'values_{i}', self._numeric[name])})
+            else:
+                codes, values = self._text[name]
+                column = {'name': name, 'kind': 'text', 'codes': put(f'codes_{i}', codes)}
+                if all(isinstance(v, str) for v in values):
+                    # Fixed-width string table
+                    column['strings'] = put(f'strings_{i}', np.array(values, dtype=str))
+                else:
+                    column['values'] = [v.item() if isinstance(v, np.generic) else v for v in values]
+                columns.append(column)
+
+        indexes = {}
+        for key, index in [('type_index', self.type_index), ('category_index', self.category_index)]:
+            keys = list(index)
+            indexes[key] = {
+                'keys': keys,
+                'offsets': put(f'{key}_offsets', np.cumsum([0] + [len(index[k]) for k in keys])),
+                'rows': put(f'{key}_rows', np.concatenate(
+                    [np.asarray(index[k], dtype=np.int64) for k in keys] or [np.zeros(0, dtype=np.int64)]
+                ))
+            }
+
+        manifest = {
+            'format_version': SNAPSHOT_FORMAT_VERSION,
+            'size': self.size,
+            'columns': columns,
+            'indexes': indexes,
+            'derived': {name: put(f'derived_{name}', getattr(self, name)) for name in DERIVED_ARRAYS},
+            'metadata': metadata or {}
+        }
+        with open(os.path.join(tmp_path, 'manifest.json'), 'w', encoding='utf-8') as f:
+            json.dump(manifest, f, ensure_ascii=False)
+
+    @classmethod
+    def load(cls, path: str) -> 'BuyerTable':
+        """Memory-map a snapshot written by save(); metadata goes to .metadata"""
+
+        with open(os.path.join(path, 'manifest.json'), encoding='utf-8') as f:
+            manifest = json.load(f)
+        if manifest.get('format_version') != SNAPSHOT_FORMAT_VERSION:
+            raise ValueError(
+                f"Buyer snapshot {path} has format {manifest.get('format_version')}, "
+                f"expected {SNAPSHOT_FORMAT_VERSION}; recompile it from the CSV"
+            )
+
+        def get(array_name):
+            file = os.path.join(path, array_name + '.npy')
+            try:
+                return np.load(file, mmap_mode='r')
+            except ValueError:
+                # Zero-length arrays cannot be memory-mapped
+                return np.load(file)
+
+        table = cls.__new__(cls)
+        table.size = manifest['size']
+        table.column_names = [column['name'] for column in manifest['columns']]
+        table._text, table._numeric, table._vocab, table._bits, table._lists = {}, {}, {}, {}, {}
+
+        for column in manifest['columns']:
+            name = column['name']
+            if column['kind'] == 'list':
+                table._vocab[name] = column['vocab']
+                table._bits[name] = get(column['bits'])
+                table._lists[name] = (get(column['offsets']), get(column['ids']))
+            elif column['kind'] == 'numeric':
+                table._numeric[name] = get(column['values'])
+            else:
+                if 'strings' in column:
+                    # Fixed-width table, decoded per value on access
+                    values = get(column['strings'])
+                else:
+                    values = np.array(column['values'], dtype=object)
+                table._text[name] = (get(column['codes']), values)
+
+        indexes = {}
+        for key, spec in manifest['indexes'].items():
+            offsets, rows = get(spec['offsets']), get(spec['rows'])
+            indexes[key] = {k: rows[offsets[i]:offsets[i + 1]] for i, k in enumerate(spec['keys'])}
+
+        # Snapshots without stored scoring arrays recompute them
+        derived = None
+        if set(manifest.get('derived', {})) == set(DERIVED_ARRAYS):
+            derived = {name: get(array_name) for name, array_name in manifest['derived'].items()}
+        table._derive(indexes['type_index'], indexes['category_index'], derived)
+        table.records = BuyerRecords(table)
+        table.metadata = manifest['metadata']
+        return table
+
+    def accepts(self, waste_type: str) -> np.ndarray:
+        """Boolean mask of buyers listing waste_type as accepted"""
+        return self._mask(self.type_index.get(waste_type))
+
+    def accepts_in_category(self, category: str) -> np.ndarray:
+        """Boolean mask of buyers listing category as accepted"""
+        return self._mask(self.category_index.get(category))
+
+    def has_item(self, name: str, item: str, rows: np.ndarray = None) -> np.ndarray:
+        """
+        Bitset test: which buyers (all, or just rows) list item in list
+        column name, e.g. has_item('accepted_waste_types', 'fabric_scraps')
+        """
+
+        bits = self._bits.get(name)
+        vocab = self._vocab.get(name, [])
+        if bits is None or item not in vocab:
+            return np.zeros(self.size if rows is None else len(rows), dtype=bool)
+        bit = vocab.index(item)
+        column = bits[:, bit >> 3] if rows is None else bits[rows, bit >> 3]
+        return (column & (0x80 >> (bit & 7))) != 0
+
+    def has_certification(self, certification: str) -> np.ndarray:
+        """Boolean mask of buyers listing certification (bitset lookup)"""
+
+        vocab = self._vocab.get('certifications', [])
+        return self._any_bit('certifications', [cert == certification for cert in vocab])
+
+    def _mask(self, rows) -> np.ndarray:
+        mask = np.zeros(self.size, dtype=bool)
+        if rows is not None:
+            mask[rows] = True
+        return mask
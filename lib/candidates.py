@@ -0,0 +1,106 @@
+import numpy as np
+from abc import ABC, abstractmethod
+from typing import Dict
+
+# Nearest buyers always kept as candidates, whatever they accept
+NEAREST_CANDIDATES = 2000
+
+# Radius (km) within which every type / category index hit is a candidate
+INDEX_CANDIDATE_RADIUS_KM = 300
+
+
+class CandidateGenerator(ABC):
+    """
+    Candidate-generation stage for GraphMatcher
+
+    A generator is called with (waste_profile, buyer_db) and returns the
+    buyer positions worth scoring, ascending. Only those buyers are
+    scored, so results match a full scan whenever every buyer that
+    would make the top-k is a candidate (see
+    scripts/benchmark_candidates.py for measured recall).
+    """
+
+    @abstractmethod
+    def __call__(self, waste_profile: Dict, buyer_db) -> np.ndarray:
+        """Buyer positions to score for waste_profile, ascending"""
+
+    def __or__(self, other: 'CandidateGenerator') -> 'CandidateGenerator':
+        return UnionCandidates(self, other)
+
+
+class NearestCandidates(CandidateGenerator):
+    """
+    The k buyers nearest the facility (the spatial index widens its radius
+    until it holds k), plus every buyer within radius_km
+    """
+
+    def __init__(self, k: int = NEAREST_CANDIDATES, radius_km: float = 0):
+        self.k = k
+        self.radius_km = radius_km
+
+    def __call__(self, waste_profile: Dict, buyer_db) -> np.ndarray:
+        location = waste_profile['location']
+        rows, _ = buyer_db.spatial_index.nearest(location['lat'], location['lng'], self.k)
+        if self.radius_km > 0:
+            rows = np.union1d(rows, buyer_db.spatial_index.within_radius(
+                location['lat'], location['lng'], self.radius_km
+            ))
+        return np.sort(rows)
+
+    def __repr__(self):
+        return f"NearestCandidates(k={self.k}, radius_km={self.radius_km})"
+
+
+class IndexCandidates(CandidateGenerator):
+    """
+    Buyers accepting any stream's waste type or category (inverted index
+    hits), optionally only those within max_distance_km
+    """
+
+    def __init__(self, max_distance_km: float = None):
+        self.max_distance_km = max_distance_km
+
+    def __call__(self, waste_profile: Dict, buyer_db) -> np.ndarray:
+        streams = waste_profile['waste_streams']
+        if self.max_distance_km is None:
+            rows = np.zeros(0, dtype=np.int64)
+            for waste in streams:
+                rows = np.union1d(rows, buyer_db.candidate_rows(waste['type'], waste.get('category')))
+            return rows
+
+        # Nearby buyers first, then bitset tests instead of merging whole index lists
+        location = waste_profile['location']
+        table = buyer_db.snapshot
+        rows = buyer_db.spatial_index_for(table).within_radius(
+            location['lat'], location['lng'], self.max_distance_km
+        )
+        hit = np.zeros(len(rows), dtype=bool)
+        for waste in streams:
+            hit |= table.has_item('accepted_waste_types', waste['type'], rows)
+            if waste.get('category'):
+                hit |= table.has_item('accepted_categories', waste['category'], rows)
+        return rows[hit]
+
+    def __repr__(self):
+        return f"IndexCandidates(max_distance_km={self.max_distance_km})"
+
+
+class UnionCandidates(CandidateGenerator):
+    """Buyers proposed by any of the given generators"""
+
+    def __init__(self, *generators: CandidateGenerator):
+        self.generators = generators
+
+    def __call__(self, waste_profile: Dict, buyer_db) -> np.ndarray:
+        rows = np.zeros(0, dtype=np.int64)
+        for generator in self.generators:
+            rows = np.union1d(rows, generator(waste_profile, buyer_db))
+        return rows
+
+    def __repr__(self):
+        return ' | '.join(map(repr, self.generators))
+
+
+def default_candidates() -> CandidateGenerator:
+    """Nearest buyers plus the type / category index hits near the facility"""
+    return NearestCandidates() | IndexCandidates(max_distance_km=INDEX_CANDIDATE_RADIUS_KM)
@@ -0,0 +1,85 @@
+import numpy as np
+from typing import Dict, List, Union
+
+# Categorical inputs, in feature-matrix order
+CATEGORICAL_FEATURES = ['industry', 'product', 'process', 'machinery', 'scale']
+
+# Known values listed in an unknown-category error
+SHOWN_CHOICES = 12
+
+
+class UnknownCategoryError(ValueError):
+    """A facility input value the encoders were not fitted on"""
+
+    def __init__(self, feature: str, value, choices: List[str]):
+        self.feature = feature
+        self.value = value
+        shown = ', '.join(choices[:SHOWN_CHOICES]) + (', ...' if len(choices) > SHOWN_CHOICES else '')
+        super().__init__(f"Unknown {feature} {value!r}; expected one of: {shown}")
+
+
+class FeatureEncoder:
+    """
+    The fitted LabelEncoders and StandardScaler as plain lookup tables
+
+    Each categorical feature maps its lowercased value to the
+    LabelEncoder's code with one dict lookup, and units_per_month is
+    scaled with the scaler's mean and scale, so encoding matches the
+    sklearn encoders exactly without calling them. Values the encoders
+    never saw raise UnknownCategoryError unless a fallback code is
+    configured: one int for every feature, or {feature: code}.
+
+    spec is the exported form (lib/tree_export.export_encoders): a class
+    list per categorical feature plus 'scaler': {'mean', 'scale'}.
+    """
+
+    def __init__(self, spec: Dict, unknown: Union[int, Dict[str, int]] = None):
+        self.classes = {name: list(spec[name]) for name in CATEGORICAL_FEATURES}
+        self.tables = {name: {value: code for code, value in enumerate(classes)}
+                       for name, classes in self.classes.items()}
+        self.mean = float(spec['scaler']['mean'][0])
+        self.scale = float(spec['scaler']['scale'][0])
+        self.unknown = unknown
+
+    def _fallback(self, name: str, value) -> int:
+        code = self.unknown.get(name) if isinstance(self.unknown, dict) else self.unknown
+        if code is None:
+            raise UnknownCategoryError(name, value, self.classes[name])
+        return code
+
+    def code(self, name: str, value: str) -> int:
+        """Code of one categorical value"""
+
+        code = self.tables[name].get(value.lower())
+        return self._fallback(name, value) if code is None else code
+
+    def encode(self, facility_input: Dict) -> np.ndarray:
+        """Feature row (1 x 8) for one facility input dict"""
+
+        codes = [self.code(name, facility_input[name]) for name in CATEGORICAL_FEATURES]
+        industry, product, process, machinery, scale = codes
+        units_scaled = (facility_input['units_per_month'] - self.mean) / self.scale
+        return np.array([[
+            industry, product, process, machinery, scale,
+            units_scaled, industry * 100 + process, process * 100 + machinery
+        ]], dtype=np.float64)
+
+    def encode_batch(self, facility_inputs: List[Dict]) -> np.ndarray:
+        """Feature matrix, one row per facility input"""
+
+        columns = {}
+        for name in CATEGORICAL_FEATURES:
+            table = self.tables[name]
+            codes = np.array([table.get(facility_input[name].lower(), -1) for facility_input in facility_inputs],
+                             dtype=np.int64)
+            for row in np.flatnonzero(codes < 0):
+                codes[row] = self._fallback(name, facility_inputs[row][name])
+            columns[name] = codes
+
+        units = np.array([facility_input['units_per_month'] for facility_input in facility_inputs], dtype=np.float64)
+        return np.column_stack([
+            columns['industry'], columns['product'], columns['process'],
+            columns['machinery'], columns['scale'], (units - self.mean) / self.scale,
+            columns['industry'] * 100 + columns['process'],
+            columns['process'] * 100 + columns['machinery']
+        ]).astype(np.float64)
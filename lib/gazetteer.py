@@ -0,0 +1,129 @@
+import bisect
+import difflib
+import os
+import re
+import pandas as pd
+from functools import lru_cache
+from typing import Dict, List, Optional
+
+# Precompiled city / state coordinates shipped with the app
+DEFAULT_GAZETTEER = os.path.join(os.path.dirname(__file__), '..', 'data', 'india_places.csv')
+
+# Minimum difflib ratio for a fuzzy match
+FUZZY_CUTOFF = 0.8
+
+
+def normalize_place(name) -> str:
+    """Case-insensitive lookup key: casefolded, single-spaced, no punctuation"""
+    return re.sub(r'[^\w]+', ' ', str(name).casefold()).strip()
+
+
+class Gazetteer:
+    """
+    City / state name -> coordinates
+
+    Every name and alias is stored under its normalized key in a hash
+    index, so exact lookups are O(1). A sorted key list serves prefix
+    lookups by binary search, and fuzzy lookups compare only against
+    keys sharing the query's first letter. "City, State" picks between
+    places with the same name.
+    """
+
+    def __init__(self, places: List[Dict]):
+        self.places = [dict(place) for place in places]
+        self.index: Dict[str, List[int]] = {}
+
+        for i, place in enumerate(self.places):
+            names = [place['name']] + [a for a in str(place.get('aliases') or '').split(';') if a.strip()]
+            for name in names:
+                positions = self.index.setdefault(normalize_place(name), [])
+                if i not in positions:
+                    positions.append(i)
+
+        self.keys = sorted(self.index)
+        self._by_initial: Dict[str, List[str]] = {}
+        for key in self.keys:
+            self._by_initial.setdefault(key[:1], []).append(key)
+
+    @classmethod
+    def from_csv(cls, path: str) -> 'Gazetteer':
+        df = pd.read_csv(path, keep_default_na=False)
+        return cls(df.to_dict('records'))
+
+    def _result(self, i: int) -> Dict:
+        place = self.places[i]
+        return {
+            'name': place['name'],
+            'state': place.get('state'),
+            'kind': place.get('kind', 'city'),
+            'lat': float(place['lat']),
+            'lng': float(place['lng'])
+        }
+
+    def lookup(self, name: str) -> Optional[Dict]:
+        """Exact (case-insensitive) match of a name, alias or "City, State" """
+
+        city, _, state = str(name).partition(',')
+        positions = self.index.get(normalize_place(city), [])
+        if state.strip():
+            state_key = normalize_place(state)
+            positions = [i for i in positions if normalize_place(self.places[i].get('state', '')) == state_key]
+
+        # Cities win over a state of the same name
+        positions = sorted(positions, key=lambda i: self.places[i].get('kind') == 'state')
+        return self._result(positions[0]) if positions else None
+
+    def prefix(self, text: str, limit: int = 10) -> List[Dict]:
+        """Places whose name or alias starts with text, alphabetically"""
+
+        key = normalize_place(text)
+        results, seen = [], set()
+        for k in self.keys[bisect.bisect_left(self.keys, key):]:
+            if not k.startswith(key) or len(results) >= limit:
+                break
+            for i in self.index[k]:
+                if i not in seen:
+                    seen.add(i)
+                    results.append(self._result(i))
+        return results[:limit]
+
+    def fuzzy(self, text: str, limit: int = 5, cutoff: float = FUZZY_CUTOFF) -> List[Dict]:
+        """Closest spellings of text (e.g. "Banglore"), best first"""
+
+        key = normalize_place(text)
+        candidates = self._by_initial.get(key[:1], [])
+        matches = difflib.get_close_matches(key, candidates, n=limit, cutoff=cutoff)
+        if not matches:
+            matches = difflib.get_close_matches(key, self.keys, n=limit, cutoff=cutoff)
+
+        results, seen = [], set()
+        for k in matches:
+            for i in self.index[k]:
+                if i not in seen:
+                    seen.add(i)
+                    results.append(self._result(i))
+        return results[:limit]
+
+    def locate(self, text: str) -> Optional[Dict]:
+        """Exact match, else a unique prefix match, else the best fuzzy match (None if nothing fits)"""
+
+        if not text or not str(text).strip():
+            return None
+        place = self.lookup(text)
+        if place is None:
+            candidates = self.prefix(text, limit=2)
+            if len(candidates) == 1:
+                place = candidates[0]
+        if place is None:
+            candidates = self.fuzzy(text, limit=1)
+            place = candidates[0] if candidates else None
+        if place is None and ',' in text:
+            # State qualifier matched nothing; try the city alone
+            place = self.locate(text.partition(',')[0])
+        return place
+
+
+@lru_cache(maxsize=None)
+def load_gazetteer(path: str = DEFAULT_GAZETTEER) -> Gazetteer:
+    """Gazetteer for path, loaded once per process and shared"""
+    return Gazetteer.from_csv(os.path.abspath(path))
@@ -1,18 +1,131 @@
+import copy
+import heapq
+import json
+import logging
+import os
+from concurrent.futures import ThreadPoolExecutor
 import networkx as nx
 import numpy as np
 from typing import List, Dict
 import matplotlib.pyplot as plt
+from lib.buyer_table import BuyerTable, QUALITY_HIERARCHY, HAZMAT_MASK, certification_mask, price_per_ton
+from lib.allocation import allocate_capacity
+from lib.candidates import CandidateGenerator
+from lib.match_graph import MatchGraph, BREAKDOWN_KEYS, ECONOMICS_KEYS, ENVIRONMENTAL_KEYS
+
+logger = logging.getLogger(__name__)
+
+# Weights of the five match dimensions
+SCORE_WEIGHTS = {
+    'material': 0.35,
+    'quality': 0.20,
+    'volume': 0.15,
+    'distance': 0.20,
+    'compliance': 0.10
+}
+
+# Minimum total score for a waste-buyer edge
+EDGE_THRESHOLD = 0.3
+
+# Max (waste streams x buyers) cells scored at once by the batch API
+BATCH_BLOCK_CELLS = 2 ** 22
+
+# Facilities whose ranked matches are kept when result caching is on
+RESULT_CACHE_SIZE = 256
+
+# Buyers scored per worker task by find_sharded_matches
+SHARD_TASK_ROWS = 8192
+
+
+def _round_like_python(values: np.ndarray, decimals: int) -> np.ndarray:
+    """np.round, with near-halfway values re-rounded by Python's round()"""
+    
+    rounded = np.round(values, decimals)
+    with np.errstate(invalid='ignore'):
+        scaled = np.abs(values) * 10 ** decimals
+        near_half = np.abs(scaled - np.floor(scaled) - 0.5) < 1e-6
+    for idx in np.flatnonzero(near_half):
+        rounded.flat[idx] = round(float(values.flat[idx]), decimals)
+    return rounded
+
+
+def _overall_score(total: np.ndarray) -> np.ndarray:
+    """Raw totals to the frontend overallScore (percent, 1 decimal)"""
+    
+    return _round_like_python(_round_like_python(total, 3) * 100, 1)
+
+
+def _select_streams(material: np.ndarray, overall: np.ndarray, has_edge: np.ndarray):
+    """
+    Stream kept per buyer column, by find_optimal_matches' dedupe rule
+    
+    Streams are visited in order. A buyer takes its first stream with an
+    edge, and switches to a later one whose material score (x100) beats
+    the kept overallScore.
+    
+    Returns:
+        (best_stream, best_score, first_seen) per column; best_stream is
+        -1 for buyers without any edge
+    """
+    
+    best_stream = np.full(has_edge.shape[1], -1, dtype=np.int64)
+    best_score = np.zeros(has_edge.shape[1])
+    first_seen = np.zeros(has_edge.shape[1], dtype=np.int64)
+    for i in range(len(has_edge)):
+        unseen = has_edge[i] & (best_stream < 0)
+        first_seen[unseen] = i
+        update = unseen | (has_edge[i] & (material[i] * 100 > best_score))
+        best_stream[update] = i
+        best_score[update] = overall[i, update]
+    return best_stream, best_score, first_seen
+
 
 class GraphMatcher:
-    def __init__(self, buyer_database):
+    def __init__(self, buyer_database, vectorized: bool = True, cache_results: bool = False,
+                 candidates: CandidateGenerator = None):
         """
         Initialize matcher with buyer database
         buyer_database: BuyerDatabase instance
+        vectorized: score all streams x buyers as array operations
+                    instead of calling _calculate_match_score per pair
+        cache_results: keep find_optimal_matches results per facility and
+                       update them in place when buyers are added
+                       (full scans only)
+        candidates: optional candidate generator (see lib/candidates.py);
+                    find_optimal_matches then scores only its buyers
         """
         self.buyer_db = buyer_database
-        self.graph = None
+        self.vectorized = vectorized
+        self.candidates = candidates
+        self.match_graph = None
+        self._nx_graph = None
+        self.search_stats = {}
+        
+        # Key: (profile JSON, max_matches), Value: cached ranking
+        self.result_cache = {}
+        self.cache_results = cache_results
+        if cache_results:
+            buyer_database.add_listener(self._on_buyer_added)
     
-    def build_graph(self, waste_profile: Dict, buyers: List[Dict]) -> nx.DiGraph:
+    @property
+    def graph(self) -> nx.DiGraph:
+        """networkx export of the last built graph, created on first access"""
+        
+        if self._nx_graph is None and self.match_graph is not None:
+            self._nx_graph = self.match_graph.to_networkx()
+        return self._nx_graph
+    
+    def _load_buyers(self):
+        """
+        The database's columnar snapshot and its lazy record view
+        (buyer dicts are only built for the buyers actually returned)
+        """
+        
+        table = self.buyer_db.snapshot
+        return table.records, table
+    
+    def build_graph(self, waste_profile: Dict, buyers: List[Dict], table: BuyerTable = None,
+                    rows: np.ndarray = None) -> MatchGraph:
         """
         Build weighted directed bipartite graph
         
@@ -23,59 +136,253 @@ class GraphMatcher:
         Edges:
             - Weighted by match quality (0-1)
             - Directed from waste to buyer
-        """
+            - Stored as CSR arrays (see MatchGraph)
         
-        G = nx.DiGraph()
+        table: optional prebuilt BuyerTable for buyers (vectorized mode)
+        rows: optional candidate positions in buyers; only these are scored
+        """
         
-        # Add waste stream nodes
-        for i, waste in enumerate(waste_profile['waste_streams']):
-            node_id = f"waste_{i}_{waste['type']}"
-            G.add_node(
-                node_id,
-                node_type='waste',
-                waste_data=waste,
-                facility_location=waste_profile['location']
-            )
+        if self.vectorized:
+            edges = self._scored_edges(waste_profile, table or BuyerTable(buyers), rows)
+        else:
+            edges = self._pairwise_edges(waste_profile, buyers, rows)
         
-        # Add buyer nodes
-        for buyer in buyers:
-            buyer_id = f"buyer_{buyer['buyer_id']}"
-            G.add_node(
-                buyer_id,
-                node_type='buyer',
-                buyer_data=buyer
-            )
+        G = MatchGraph(waste_profile, buyers, **edges)
         
-        # Create edges with weights
-        edge_count = 0
-        for i, waste in enumerate(waste_profile['waste_streams']):
-            waste_node = f"waste_{i}_{waste['type']}"
-            
-            for buyer in buyers:
-                buyer_node = f"buyer_{buyer['buyer_id']}"
-                
-                # Calculate comprehensive match score
+        print(f"Graph built: {G.num_nodes} nodes, {G.num_edges} edges")
+        self.match_graph = G
+        self._nx_graph = None
+        return G
+    
+    def _pairwise_edges(self, waste_profile: Dict, buyers: List[Dict], rows: np.ndarray = None) -> Dict:
+        """Score every (waste stream, buyer) pair one at a time"""
+        
+        positions = range(len(buyers)) if rows is None else rows
+        offsets = [0]
+        buyer_index = []
+        rows = []
+        for waste in waste_profile['waste_streams']:
+            for j in positions:
+                buyer = buyers[j]
+                # Calculate comprehensive match score (impacts come later, per edge)
                 score_data = self._calculate_match_score(
                     waste, 
                     buyer,
-                    waste_profile['location']
+                    waste_profile['location'],
+                    with_impacts=False
                 )
                 
                 # Only add edge if score above threshold
-                if score_data['total_score'] > 0.3:
-                    G.add_edge(
-                        waste_node,
-                        buyer_node,
-                        weight=score_data['total_score'],
-                        **score_data  # Include all score components
-                    )
-                    edge_count += 1
-        
-        print(f"Graph built: {G.number_of_nodes()} nodes, {edge_count} edges")
-        self.graph = G
-        return G
+                if score_data['total_score'] > EDGE_THRESHOLD:
+                    buyer_index.append(j)
+                    rows.append(score_data)
+            
+            offsets.append(len(buyer_index))
+        
+        streams = waste_profile['waste_streams']
+        stream_index = np.repeat(np.arange(len(streams)), np.diff(offsets))
+        
+        def impacts(edges: np.ndarray):
+            return self._pack_impacts([
+                self._edge_impacts(streams[stream_index[e]], buyers[buyer_index[e]], waste_profile['location'])
+                for e in edges
+            ])
+        
+        return {
+            'offsets': np.array(offsets),
+            'buyer_index': np.array(buyer_index, dtype=np.int32),
+            'weights': np.array([r['total_score'] for r in rows]),
+            'breakdown': {
+                key: np.array([r['score_breakdown'][key] for r in rows])
+                for key in BREAKDOWN_KEYS
+            },
+            'distance_km': np.array([r['distance_km'] for r in rows]),
+            'impacts': impacts
+        }
     
-    def _calculate_match_score(self, waste: Dict, buyer: Dict, facility_location: Dict) -> Dict:
+    def _scored_edges(self, waste_profile: Dict, table: BuyerTable, rows: np.ndarray = None) -> Dict:
+        """Score all streams x buyers (or x rows) as arrays, keep edges above threshold"""
+        
+        streams = waste_profile['waste_streams']
+        scores = self._score_matrix(streams, table, waste_profile['location'], rows)
+        
+        total = _round_like_python(scores['total'], 3)
+        keep = total > EDGE_THRESHOLD
+        stream_index, column = np.nonzero(keep)
+        distance_km = scores['distance_km'][column]
+        buyer_index = column if rows is None else rows[column]
+        
+        streams_qty = np.array(
+            [(w['quantity_min_tons'] + w['quantity_max_tons']) / 2 for w in streams]
+        )
+        buyer_distance_km = scores['distance_km']
+        
+        def impacts(edges: np.ndarray):
+            """Economics / environmental arrays for the given edges only"""
+            annual_qty = streams_qty[stream_index[edges]] * 12
+            edge_distance = buyer_distance_km[column[edges]]
+            return (
+                self._economics_arrays(annual_qty, table.price_per_ton[buyer_index[edges]], edge_distance),
+                self._environmental_arrays(annual_qty, edge_distance)
+            )
+        
+        return {
+            'offsets': np.concatenate([[0], np.cumsum(keep.sum(axis=1))]),
+            'buyer_index': buyer_index,
+            'weights': total[keep],
+            'breakdown': {
+                key: _round_like_python(scores[key][keep], 3)
+                for key in BREAKDOWN_KEYS
+            },
+            'distance_km': np.round(distance_km, 1),
+            'impacts': impacts
+        }
+    
+    def _pack_impacts(self, rows: List[tuple]):
+        """Turn per-edge (economics, environmental) dicts into parallel arrays"""
+        
+        return (
+            {
+                key: np.array([economics[key] for economics, _ in rows], dtype=np.float64)
+                for key in ECONOMICS_KEYS
+            },
+            {
+                key: np.array([environmental[key] for _, environmental in rows])
+                for key in ENVIRONMENTAL_KEYS
+            }
+        )
+    
+    def _edge_impacts(self, waste: Dict, buyer: Dict, facility_location: Dict):
+        """(economics, environmental) of one pair, as _calculate_match_score computes them"""
+        
+        distance_km = self._haversine_distance(
+            facility_location['lat'], facility_location['lng'],
+            buyer['lat'], buyer['lng']
+        )
+        return (
+            self._calculate_economics(waste, buyer, distance_km),
+            self._calculate_environmental_impact(waste, distance_km)
+        )
+    
+    def _score_matrix(self, waste_streams: List[Dict], table: BuyerTable, facility_location: Dict,
+                      rows: np.ndarray = None) -> Dict:
+        """
+        Vectorized counterpart of _calculate_match_score
+        
+        Returns (streams x buyers) arrays for every score dimension and the
+        total, plus the per-buyer distance in km. With rows, only those
+        buyer positions are scored (columns follow rows).
+        """
+        
+        scores = self._score_buyer_fit(waste_streams, table, rows)
+        
+        # Distance only depends on the buyer
+        columns = slice(None) if rows is None else rows
+        distance_km = self._haversine_distance(
+            facility_location['lat'], facility_location['lng'],
+            table.lat[columns], table.lng[columns]
+        )
+        scores['distance'] = np.broadcast_to(
+            self._score_distance_array(distance_km), scores['material'].shape
+        )
+        scores['total'] = self._weighted_total(scores)
+        scores['distance_km'] = distance_km
+        
+        return scores
+    
+    def _score_buyer_fit(self, waste_streams: List[Dict], table: BuyerTable, rows: np.ndarray = None) -> Dict:
+        """
+        Material, quality, volume and compliance scores (streams x buyers),
+        for all buyers or only the buyer positions in rows
+        """
+        
+        columns = slice(None) if rows is None else rows
+        shape = (len(waste_streams), table.size if rows is None else len(rows))
+        material = np.zeros(shape)
+        
+        # 1. Material Compatibility (index lookups, type match wins)
+        for i, waste in enumerate(waste_streams):
+            if rows is None:
+                material[i, table.category_index.get(waste['category'], [])] = 0.7
+                material[i, table.type_index.get(waste['type'], [])] = 1.0
+            else:
+                material[i, table.has_item('accepted_categories', waste['category'], rows)] = 0.7
+                material[i, table.has_item('accepted_waste_types', waste['type'], rows)] = 1.0
+        
+        # 2. Quality Fit
+        waste_level = np.array([
+            QUALITY_HIERARCHY.get(waste.get('quality_grade', 'Grade B'), 2)
+            for waste in waste_streams
+        ])[:, None]
+        required_level = table.required_level[columns]
+        quality = np.where(
+            waste_level >= required_level, 1.0,
+            np.where(waste_level == required_level - 1, 0.6, 0.3)
+        )
+        
+        # 3. Volume Fit
+        volume = self._score_volume_array(waste_streams, table, rows)
+        
+        # 5. Compliance
+        hazardous = np.array([
+            'Hazardous' in waste.get('hazard_class', 'Non-hazardous')
+            for waste in waste_streams
+        ], dtype=bool)[:, None]
+        certified = (table.certification_mask[columns] & HAZMAT_MASK) != 0
+        compliance = np.where(hazardous & ~certified, 0.2, 1.0)
+        
+        return {
+            'material': material,
+            'quality': np.broadcast_to(quality, shape),
+            'volume': volume,
+            'compliance': np.broadcast_to(compliance, shape)
+        }
+    
+    def _weighted_total(self, scores: Dict) -> np.ndarray:
+        """Weighted total, summed in the same order as _calculate_match_score"""
+        
+        return (
+            scores['material'] * SCORE_WEIGHTS['material'] +
+            scores['quality'] * SCORE_WEIGHTS['quality'] +
+            scores['volume'] * SCORE_WEIGHTS['volume'] +
+            scores['distance'] * SCORE_WEIGHTS['distance'] +
+            scores['compliance'] * SCORE_WEIGHTS['compliance']
+        )
+    
+    def _score_volume_array(self, waste_streams: List[Dict], table: BuyerTable, rows: np.ndarray = None) -> np.ndarray:
+        """Vectorized _score_volume_match (streams x buyers, or x rows)"""
+        
+        avg_waste_qty = np.array([
+            (waste['quantity_min_tons'] + waste['quantity_max_tons']) / 2
+            for waste in waste_streams
+        ])[:, None]
+        columns = slice(None) if rows is None else rows
+        min_vol = table.min_volume[columns]
+        max_vol = table.max_volume[columns]
+        
+        ratio = np.divide(
+            avg_waste_qty, min_vol,
+            out=np.zeros((len(waste_streams), len(min_vol))), where=min_vol > 0
+        )
+        below = np.maximum(0.3, np.minimum(ratio, 1.0))
+        
+        return np.where(
+            (min_vol <= avg_waste_qty) & (avg_waste_qty <= max_vol), 1.0,
+            np.where(avg_waste_qty < min_vol, below, 0.7)
+        )
+    
+    def _score_distance_array(self, distance_km: np.ndarray) -> np.ndarray:
+        """Vectorized _score_distance"""
+        
+        return np.select(
+            [distance_km <= 50, distance_km <= 150, distance_km <= 300,
+             distance_km <= 500, distance_km <= 800],
+            [1.0, 0.85, 0.65, 0.45, 0.25],
+            default=0.1
+        )
+    
+    def _calculate_match_score(self, waste: Dict, buyer: Dict, facility_location: Dict,
+                               with_impacts: bool = True) -> Dict:
         """
         Multi-dimensional scoring function
         
@@ -85,6 +392,9 @@ class GraphMatcher:
             3. Volume match (15%)
             4. Distance/logistics (20%)
             5. Regulatory compliance (10%)
+        
+        with_impacts=False skips the economics / environmental figures
+        (ranking only needs the weighted score)
         """
         
         # 1. Material Compatibility
@@ -107,13 +417,7 @@ class GraphMatcher:
         compliance_score = self._score_compliance(waste, buyer)
         
         # Weighted total
-        weights = {
-            'material': 0.35,
-            'quality': 0.20,
-            'volume': 0.15,
-            'distance': 0.20,
-            'compliance': 0.10
-        }
+        weights = SCORE_WEIGHTS
         
         total_score = (
             material_score * weights['material'] +
@@ -123,13 +427,7 @@ class GraphMatcher:
             compliance_score * weights['compliance']
         )
         
-        # Economic calculations
-        economics = self._calculate_economics(waste, buyer, distance_km)
-        
-        # Environmental impact
-        environmental = self._calculate_environmental_impact(waste, distance_km)
-        
-        return {
+        score_data = {
             'total_score': round(total_score, 3),
             'score_breakdown': {
                 'material': round(material_score, 3),
@@ -138,10 +436,17 @@ class GraphMatcher:
                 'distance': round(distance_score, 3),
                 'compliance': round(compliance_score, 3)
             },
-            'distance_km': round(distance_km, 1),
-            'economics': economics,
-            'environmental': environmental
+            'distance_km': round(distance_km, 1)
         }
+        
+        if with_impacts:
+            # Economic calculations
+            score_data['economics'] = self._calculate_economics(waste, buyer, distance_km)
+            
+            # Environmental impact
+            score_data['environmental'] = self._calculate_environmental_impact(waste, distance_km)
+        
+        return score_data
     
     def _score_material_match(self, waste: Dict, buyer: Dict) -> float:
         """Score material compatibility"""
@@ -166,14 +471,7 @@ class GraphMatcher:
     def _score_quality_match(self, waste: Dict, buyer: Dict) -> float:
         """Score quality alignment"""
         
-        quality_hierarchy = {
-            'Grade A': 4,
-            'Clean': 3,
-            'Grade B': 2,
-            'Grade C': 1,
-            'Mixed': 1,
-            'As-Is': 0
-        }
+        quality_hierarchy = QUALITY_HIERARCHY
         
         waste_quality = waste.get('quality_grade', 'Grade B')
         min_required = buyer.get('min_quality_grade', 'Grade C')
@@ -231,20 +529,15 @@ class GraphMatcher:
         """Score regulatory compliance"""
         
         hazard_class = waste.get('hazard_class', 'Non-hazardous')
-        certifications = buyer.get('certifications', [])
         
         # Check if hazardous waste requires special permits
         if 'Hazardous' in hazard_class:
-            required_certs = ['CPCB', 'SPCB', 'MoEFCC', 'Hazardous_Waste_Authorization']
+            # Authorization bits normalized at load (computed here for plain dicts)
+            cert_mask = buyer.get('certification_mask')
+            if cert_mask is None:
+                cert_mask = certification_mask(buyer.get('certifications', []))
             
-            # Check if buyer has any required certification
-            certs_str = ' '.join(certifications).upper()
-            has_hazmat_cert = any(
-                cert.upper().replace('_', '') in certs_str.replace('_', '')
-                for cert in required_certs
-            )
-            
-            return 1.0 if has_hazmat_cert else 0.2
+            return 1.0 if int(cert_mask) & HAZMAT_MASK else 0.2
         
         # Non-hazardous always compliant
         return 1.0
@@ -270,32 +563,8 @@ class GraphMatcher:
         avg_qty = (waste['quantity_min_tons'] + waste['quantity_max_tons']) / 2
         annual_qty = avg_qty * 12
         
-        # Parse pricing
-        pricing = buyer.get('pricing_model', '₹10000-12000/ton')
-        pricing_clean = pricing.replace('₹', '').replace(',', '').strip()
-        
-        # Handle different formats
-        if '-' in pricing_clean:
-            parts = pricing_clean.split('-')
-            try:
-                min_price = float(parts[0])
-                max_price = float(parts[1].split('/')[0])
-                avg_price = (min_price + max_price) / 2
-            except:
-                avg_price = 10000
-        elif 'Market_Rate' in pricing:
-            avg_price = 12000
-        elif 'Negotiable' in pricing:
-            avg_price = 10000
-        elif 'Collection_Fee' in pricing:
-            # This is a cost, not revenue
-            try:
-                fee = float(pricing_clean.split(':')[1].split('-')[0])
-                avg_price = -fee  # Negative indicates cost
-            except:
-                avg_price = -5000
-        else:
-            avg_price = 10000
+        # Signed price per ton (negative = collection fee), parsed at load
+        avg_price = price_per_ton(buyer)
         
         # Calculate revenue/cost
         annual_revenue = annual_qty * avg_price
@@ -352,73 +621,579 @@ class GraphMatcher:
         virgin_material_avoided = annual_qty * 0.75
         
         return {
-            'co2_saved_tons_annual': round(max(0, net_co2_saved), 2),
+            'co2_saved_tons_annual': round(max(0.0, net_co2_saved), 2),
             'landfill_diverted_tons_annual': round(annual_qty, 1),
             'virgin_material_avoided_tons': round(virgin_material_avoided, 1),
             'recycling_efficiency_pct': 75
         }
     
-    def find_optimal_matches(self, waste_profile: Dict, max_matches: int = 10) -> List[Dict]:
+    def _economics_arrays(self, annual_qty: np.ndarray, price: np.ndarray, distance: np.ndarray) -> Dict:
+        """Vectorized _calculate_economics over edges (currency omitted)"""
+        
+        annual_revenue = annual_qty * price
+        annual_transport = annual_qty * (distance * 4)
+        disposal_savings = annual_qty * 6000
+        net_benefit = np.where(
+            price > 0,
+            annual_revenue - annual_transport + disposal_savings,
+            disposal_savings - np.abs(annual_revenue) - annual_transport
+        )
+        
+        return {
+            'annual_revenue': np.round(annual_revenue, 0),
+            'annual_transport_cost': np.round(annual_transport, 0),
+            'disposal_cost_avoided': np.round(disposal_savings, 0),
+            'net_annual_benefit': np.round(net_benefit, 0),
+            'price_per_ton': np.round(price, 0),
+            'annual_quantity_tons': _round_like_python(annual_qty, 1)
+        }
+    
+    def _environmental_arrays(self, annual_qty: np.ndarray, distance: np.ndarray) -> Dict:
+        """Vectorized _calculate_environmental_impact over edges"""
+        
+        landfill_emissions = annual_qty * 0.8
+        recycling_emissions = annual_qty * 0.15
+        transport_emissions = annual_qty * distance * 0.00012 * 2
+        net_co2_saved = landfill_emissions - (recycling_emissions + transport_emissions)
+        
+        return {
+            'co2_saved_tons_annual': np.round(np.maximum(0.0, net_co2_saved), 2),
+            'landfill_diverted_tons_annual': _round_like_python(annual_qty, 1),
+            'virgin_material_avoided_tons': _round_like_python(annual_qty * 0.75, 1),
+            'recycling_efficiency_pct': np.full(len(annual_qty), 75)
+        }
+    
+    def find_optimal_matches(self, waste_profile: Dict, max_matches: int = 10,
+                             candidate_rows: np.ndarray = None) -> List[Dict]:
         """
         Find and rank optimal matches using graph algorithms
         
+        candidate_rows: buyer positions to score (e.g. from
+                        BuyerDatabase.search_rows); defaults to the
+                        matcher's candidate generator, else all buyers
+        
         Returns:
             List of match dictionaries sorted by score (frontend-compatible format)
         """
         
+        # Candidate generation stage
+        if candidate_rows is None and self.candidates is not None:
+            candidate_rows = self.candidates(waste_profile, self.buyer_db)
+        if candidate_rows is not None:
+            candidate_rows = np.unique(np.asarray(candidate_rows, dtype=np.int64))
+        
+        use_cache = self.cache_results and candidate_rows is None
+        if use_cache:
+            key = self._cache_key(waste_profile, max_matches)
+            if key in self.result_cache:
+                return copy.deepcopy([m for *_, m in self.result_cache[key]['ranked']])
+        
         # Get all buyers
-        all_buyers = self.buyer_db.get_all_buyers()
+        all_buyers, table = self._load_buyers()
+        self.search_stats = {
+            'buyers_total': table.size,
+            'candidates': table.size if candidate_rows is None else len(candidate_rows)
+        }
         
         # Build graph
-        G = self.build_graph(waste_profile, all_buyers)
+        G = self.build_graph(waste_profile, all_buyers, table, candidate_rows)
         
         # Extract all viable matches with buyer deduplication
-        buyer_matches = {}  # Key: buyer_id, Value: best match data
+        overall_scores = _round_like_python(G.total_scores() * 100, 1)
+        material_scores = G.breakdown_scores('material') * 100
+        
+        best_edge = np.full(len(all_buyers), -1, dtype=np.int64)  # Best edge per buyer
+        best_score = np.zeros(len(all_buyers))
+        first_seen = np.zeros(len(all_buyers), dtype=np.int64)
         
-        for waste_node in [n for n, d in G.nodes(data=True) if d.get('node_type') == 'waste']:
-            waste_data = G.nodes[waste_node]['waste_data']
+        for i in range(len(G.waste_streams)):
+            # Outgoing edges of this waste stream (potential buyers)
+            edges = np.arange(G.offsets[i], G.offsets[i + 1])
+            buyers = G.buyer_index[edges]
+            
+            unseen = best_edge[buyers] < 0
+            first_seen[buyers[unseen]] = i
+            
+            # If this buyer not seen before, or this match scores higher, update
+            update = unseen | (material_scores[edges] > best_score[buyers])
+            best_edge[buyers[update]] = edges[update]
+            best_score[buyers[update]] = overall_scores[edges[update]]
+        
+        # Sort by overall score (descending), ties in discovery order
+        seen = np.flatnonzero(best_edge >= 0)
+        order = np.lexsort((seen, first_seen[seen], -best_score[seen]))
+        
+        # Rank key (-score, first stream, position) kept for cache updates
+        ranked = [
+            (-best_score[j], int(first_seen[j]), int(j),
+             self._format_match(all_buyers[j], G.edge_data(best_edge[j])))
+            for j in seen[order[:max_matches]]
+        ]
+        
+        if use_cache:
+            if len(self.result_cache) >= RESULT_CACHE_SIZE:
+                self.result_cache.pop(next(iter(self.result_cache)))
+            self.result_cache[key] = {
+                'profile': copy.deepcopy(waste_profile),
+                'max_matches': max_matches,
+                'ranked': ranked
+            }
+            return copy.deepcopy([m for *_, m in ranked])
+        
+        return [m for *_, m in ranked]
+    
+    @staticmethod
+    def _cache_key(waste_profile: Dict, max_matches: int):
+        return json.dumps(waste_profile, sort_keys=True, default=str), max_matches
+    
+    def _on_buyer_added(self, buyer: Dict, position: int):
+        """
+        Update cached rankings for one new buyer
+        
+        Only the new buyer is scored against each cached facility's
+        streams. It enters a ranking if it beats the current k-th entry,
+        with the same tie rules as find_optimal_matches.
+        """
+        
+        updated = 0
+        for entry in self.result_cache.values():
+            profile = entry['profile']
+            best = None
+            for i, waste in enumerate(profile['waste_streams']):
+                score_data = self._calculate_match_score(waste, buyer, profile['location'], with_impacts=False)
+                if score_data['total_score'] <= EDGE_THRESHOLD:
+                    continue
+                overall = round(score_data['total_score'] * 100, 1)
+                if best is None:
+                    best = [overall, i, i]
+                elif score_data['score_breakdown']['material'] * 100 > best[0]:
+                    best[0], best[2] = overall, i
+            
+            if best is None:
+                continue
             
-            # Get all outgoing edges (potential buyers)
-            for buyer_node in G.successors(waste_node):
-                edge_data = G.edges[waste_node, buyer_node]
-                buyer_data = G.nodes[buyer_node]['buyer_data']
-                buyer_id = buyer_data['buyer_id']
+            rank_key = (-best[0], best[1], position)
+            ranked = entry['ranked']
+            if len(ranked) < entry['max_matches'] or rank_key < ranked[-1][:3]:
+                waste = profile['waste_streams'][best[2]]
+                score_data = self._calculate_match_score(waste, buyer, profile['location'])
+                ranked.append((*rank_key, self._format_match(buyer, score_data)))
+                ranked.sort(key=lambda r: r[:3])
+                del ranked[entry['max_matches']:]
+                updated += 1
+        
+        if self.result_cache:
+            logger.debug("Buyer %s added: %d/%d cached rankings changed",
+                         buyer.get('buyer_id'), updated, len(self.result_cache))
+    
+    def find_top_matches(self, waste_profile: Dict, max_matches: int = 10) -> List[Dict]:
+        """
+        Branch-and-bound top-k search with the same results as find_optimal_matches
+        
+        Material, quality, volume and compliance are scored for every buyer
+        first. The distance score is bounded from the latitude gap alone,
+        which gives an upper bound on each buyer's best total. Buyers are
+        then scored exactly in bound order and kept in a size-k heap, and
+        the search stops once no remaining bound can beat the k-th score.
+        Economics and environmental impact are only computed for the
+        returned matches.
+        
+        Pruning counters of the last search are kept in self.search_stats.
+        """
+        
+        all_buyers, table = self._load_buyers()
+        streams = waste_profile['waste_streams']
+        location = waste_profile['location']
+        
+        fit = self._score_buyer_fit(streams, table)
+        
+        # Great-circle distance is never shorter than the latitude gap
+        lat_gap_km = 6371 * np.abs(np.radians(table.lat) - np.radians(location['lat']))
+        upper = dict(fit, distance=self._score_distance_array(lat_gap_km * (1 - 1e-9)))
+        bound = _overall_score(self._weighted_total(upper).max(axis=0, initial=-np.inf))
+        
+        # Min-heap of (overallScore, -first stream, -buyer position, best stream)
+        heap = []
+        buyers_scored = 0
+        order = np.argsort(-bound, kind='stable')
+        block_size = max(256, 4 * max_matches)
+        
+        for start in range(0, len(order), block_size):
+            block = order[start:start + block_size]
+            
+            # Nothing left can clear the edge threshold or beat the k-th score
+            cutoff = heap[0][0] if len(heap) == max_matches else -np.inf
+            block = block[(bound[block] > EDGE_THRESHOLD * 100) & (bound[block] >= cutoff)]
+            if len(block) == 0:
+                break
+            
+            distance_km = self._haversine_distance(
+                location['lat'], location['lng'],
+                table.lat[block], table.lng[block]
+            )
+            exact = {key: values[:, block] for key, values in fit.items()}
+            exact['distance'] = np.broadcast_to(
+                self._score_distance_array(distance_km), exact['material'].shape
+            )
+            total = _round_like_python(self._weighted_total(exact), 3)
+            overall = _round_like_python(total * 100, 1)
+            has_edge = total > EDGE_THRESHOLD
+            buyers_scored += len(block)
+            
+            best_stream, best_score, first_seen = _select_streams(exact['material'], overall, has_edge)
+            for col in np.flatnonzero(best_stream >= 0):
+                entry = (best_score[col], -first_seen[col], -block[col], best_stream[col])
+                
+                if len(heap) < max_matches:
+                    heapq.heappush(heap, entry)
+                elif entry > heap[0]:
+                    heapq.heapreplace(heap, entry)
+        
+        pairs_total = len(streams) * table.size
+        pairs_scored = len(streams) * buyers_scored
+        self.search_stats = {
+            'pairs_total': pairs_total,
+            'pairs_scored': pairs_scored,
+            'pairs_pruned': pairs_total - pairs_scored,
+            'fully_scored': len(heap)
+        }
+        logger.debug("Top-k search: %d pairs scored, %d pruned", pairs_scored, pairs_total - pairs_scored)
+        
+        matches = []
+        for _, _, neg_position, stream in sorted(heap, reverse=True):
+            buyer = all_buyers[-neg_position]
+            score_data = self._calculate_match_score(streams[stream], buyer, location)
+            matches.append(self._format_match(buyer, score_data))
+        
+        return matches
+    
+    def _shard_bounds(self, waste_streams: List[Dict], shards, location: Dict) -> np.ndarray:
+        """
+        Upper bound on the overallScore of any buyer in each shard
+        
+        Each dimension takes its best case over the shard's members:
+        material from the OR of their accepted types / categories, quality
+        from the lowest required level, volume 1.0, distance from the
+        nearest point of the shard's bounding box, and compliance 0.2 only
+        when a hazardous stream meets a shard without hazmat certification.
+        """
+        
+        upper = {
+            'material': np.zeros((len(waste_streams), shards.count)),
+            'volume': 1.0
+        }
+        for i, waste in enumerate(waste_streams):
+            upper['material'][i, shards.has_item('accepted_categories', waste['category'])] = 0.7
+            upper['material'][i, shards.has_item('accepted_waste_types', waste['type'])] = 1.0
+        
+        waste_level = np.array([
+            QUALITY_HIERARCHY.get(waste.get('quality_grade', 'Grade B'), 2)
+            for waste in waste_streams
+        ])[:, None]
+        required_level = shards.min_required_level
+        upper['quality'] = np.where(
+            waste_level >= required_level, 1.0,
+            np.where(waste_level == required_level - 1, 0.6, 0.3)
+        )
+        
+        upper['distance'] = self._score_distance_array(
+            shards.min_distance_km(location['lat'], location['lng'])
+        )
+        
+        hazardous = np.array([
+            'Hazardous' in waste.get('hazard_class', 'Non-hazardous')
+            for waste in waste_streams
+        ], dtype=bool)[:, None]
+        upper['compliance'] = np.where(hazardous & ~shards.any_hazmat, 0.2, 1.0)
+        
+        return _overall_score(self._weighted_total(upper)).max(axis=0, initial=-np.inf)
+    
+    def _rank_rows(self, waste_streams: List[Dict], table: BuyerTable, location: Dict,
+                   rows: np.ndarray, max_matches: int) -> List[tuple]:
+        """
+        Score the buyers at rows exactly and return their top max_matches
+        as (-overallScore, first stream, position, best stream) rank keys
+        """
+        
+        scores = self._score_buyer_fit(waste_streams, table, rows)
+        distance_km = self._haversine_distance(
+            location['lat'], location['lng'], table.lat[rows], table.lng[rows]
+        )
+        scores['distance'] = np.broadcast_to(
+            self._score_distance_array(distance_km), scores['material'].shape
+        )
+        total = _round_like_python(self._weighted_total(scores), 3)
+        overall = _round_like_python(total * 100, 1)
+        best_stream, best_score, first_seen = _select_streams(
+            scores['material'], overall, total > EDGE_THRESHOLD
+        )
+        
+        seen = np.flatnonzero(best_stream >= 0)
+        order = seen[np.lexsort((rows[seen], first_seen[seen], -best_score[seen]))[:max_matches]]
+        return [
+            (-best_score[col], int(first_seen[col]), int(rows[col]), int(best_stream[col]))
+            for col in order
+        ]
+    
+    def find_sharded_matches(self, waste_profile: Dict, max_matches: int = 10,
+                             workers: int = None) -> List[Dict]:
+        """
+        Region-sharded top-k search with the same results as find_optimal_matches
+        
+        Buyers are partitioned into geographic shards (BuyerDatabase.shards).
+        Every shard gets an upper bound on its members' scores, and shards
+        are visited best bound first, in waves scored in parallel by a
+        thread pool. Each task returns its own top-k; since every buyer has
+        one rank key (score, first stream, position), the global top-k is
+        always within the union of those lists. Once a shard's bound falls
+        below the k-th score found so far it cannot contribute, and it is
+        skipped along with every shard after it.
+        
+        Pruning counters of the last search are kept in self.search_stats.
+        """
+        
+        if not waste_profile['waste_streams'] or max_matches <= 0:
+            return []
+        
+        all_buyers, table = self._load_buyers()
+        shards = self.buyer_db.shards
+        streams = waste_profile['waste_streams']
+        location = waste_profile['location']
+        workers = workers or min(8, os.cpu_count() or 1)
+        
+        bound = self._shard_bounds(streams, shards, location)
+        order = np.argsort(-bound, kind='stable')
+        order = order[bound[order] > EDGE_THRESHOLD * 100]
+        
+        ranked = []
+        shards_scored = 0
+        buyers_scored = 0
+        next_shard = 0
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            while True:
+                # Shards from `end` on cannot beat the current k-th score
+                cutoff = -ranked[max_matches - 1][0] if len(ranked) >= max_matches else -np.inf
+                end = int(np.count_nonzero(bound[order] >= cutoff))
+                if next_shard >= end:
+                    break
                 
-                match_score = edge_data['score_breakdown']['material'] * 100
+                # One wave: up to `workers` tasks of ~SHARD_TASK_ROWS buyers
+                tasks = []
+                while next_shard < end and len(tasks) < workers:
+                    members = []
+                    while next_shard < end and sum(map(len, members)) < SHARD_TASK_ROWS:
+                        members.append(shards.members(order[next_shard]))
+                        next_shard += 1
+                    shards_scored += len(members)
+                    tasks.append(np.concatenate(members))
+                buyers_scored += sum(map(len, tasks))
                 
-                # If this buyer not seen before, or this match scores higher, update
-                if buyer_id not in buyer_matches or match_score > buyer_matches[buyer_id]['overallScore']:
-                    buyer_matches[buyer_id] = {
-                        'id': int(buyer_id.replace('B', '')),
-                        'company': buyer_data['company_name'],
-                        'type': buyer_data['company_type'],
-                        'materialMatch': round(edge_data['score_breakdown']['material'] * 100, 1),
-                        'qualityFit': round(edge_data['score_breakdown']['quality'] * 100, 1),
-                        'distance': edge_data['distance_km'],
-                        'costSaving': edge_data['economics']['net_annual_benefit'] / 1000,
-                        'environmentalImpact': {
-                            'co2Saved': edge_data['environmental']['co2_saved_tons_annual'],
-                            'landfillDiverted': edge_data['environmental']['landfill_diverted_tons_annual']
-                        },
-                        'compliance': 'Compliant' if edge_data['score_breakdown']['compliance'] > 0.5 else 'Review Required',
-                        'overallScore': round(edge_data['total_score'] * 100, 1),
-                        'requirements': f"Min {buyer_data.get('min_monthly_volume_tons', 'N/A')} tons/month",
-                        'pricing': buyer_data.get('pricing_model', 'Market dependent'),
-                        'contact_email': buyer_data.get('contact_email', ''),
-                        'contact_name': buyer_data.get('contact_name', ''),
-                        'buyer_id': buyer_id
-                    }
-        
-        # Convert to list and sort by overall score (descending)
-        matches = list(buyer_matches.values())
-        matches.sort(key=lambda x: x['overallScore'], reverse=True)
-        
-        return matches[:max_matches]
+                results = pool.map(
+                    lambda rows: self._rank_rows(streams, table, location, rows, max_matches), tasks
+                )
+                ranked = sorted(ranked + [key for result in results for key in result])[:max_matches]
+        
+        pairs_total = len(streams) * table.size
+        pairs_scored = len(streams) * buyers_scored
+        self.search_stats = {
+            'shards_total': int(shards.count),
+            'shards_scored': shards_scored,
+            'pairs_total': pairs_total,
+            'pairs_scored': pairs_scored,
+            'pairs_pruned': pairs_total - pairs_scored
+        }
+        logger.debug("Sharded search: %d/%d shards, %d pairs scored, %d pruned",
+                     shards_scored, shards.count, pairs_scored, pairs_total - pairs_scored)
+        
+        matches = []
+        for _, _, position, stream in ranked:
+            buyer = all_buyers[position]
+            score_data = self._calculate_match_score(streams[stream], buyer, location)
+            matches.append(self._format_match(buyer, score_data))
+        
+        return matches
+    
+    def find_optimal_matches_batch(self, profiles: List[Dict], max_matches: int = 10) -> List[List[Dict]]:
+        """
+        find_optimal_matches for many facilities in one call
+        
+        The buyer table is built once and shared. Facilities are grouped
+        into blocks of up to BATCH_BLOCK_CELLS (streams x buyers) cells, and
+        each block's streams are scored against all buyers as one matrix.
+        Only the returned matches get economics and environmental figures.
+        
+        Returns:
+            One match list per profile, identical to find_optimal_matches
+        """
+        
+        all_buyers, table = self._load_buyers()
+        results = []
+        
+        start = 0
+        while start < len(profiles):
+            # Grow the block until it would exceed the cell budget
+            end = start + 1
+            cells = len(profiles[start]['waste_streams']) * table.size
+            while end < len(profiles):
+                next_cells = len(profiles[end]['waste_streams']) * table.size
+                if cells + next_cells > BATCH_BLOCK_CELLS:
+                    break
+                cells += next_cells
+                end += 1
+            
+            results.extend(self._match_block(profiles[start:end], all_buyers, table, max_matches))
+            start = end
+        
+        logger.debug("Batch matching: %d facilities x %d buyers", len(profiles), table.size)
+        return results
+    
+    def _match_block(self, profiles: List[Dict], all_buyers: List[Dict], table: BuyerTable,
+                     max_matches: int) -> List[List[Dict]]:
+        """Score one block of facilities and rank each facility's buyers"""
+        
+        streams = [waste for profile in profiles for waste in profile['waste_streams']]
+        fit = self._score_buyer_fit(streams, table)
+        
+        # Distance only depends on (facility, buyer)
+        facility = np.repeat(
+            np.arange(len(profiles)), [len(p['waste_streams']) for p in profiles]
+        )
+        distance_km = np.array([
+            self._haversine_distance(p['location']['lat'], p['location']['lng'], table.lat, table.lng)
+            for p in profiles
+        ]).reshape(len(profiles), table.size)
+        fit['distance'] = self._score_distance_array(distance_km)[facility]
+        
+        total = _round_like_python(self._weighted_total(fit), 3)
+        overall = _round_like_python(total * 100, 1)
+        has_edge = total > EDGE_THRESHOLD
+        
+        results = []
+        offsets = np.concatenate([[0], np.cumsum([len(p['waste_streams']) for p in profiles])])
+        for f, profile in enumerate(profiles):
+            span = slice(offsets[f], offsets[f + 1])
+            if offsets[f] == offsets[f + 1]:
+                results.append([])
+                continue
+            
+            # Same ranking as find_optimal_matches: one stream per buyer,
+            # ties by the first stream reaching the buyer, then position
+            best_stream, best_score, first_seen = _select_streams(
+                fit['material'][span], overall[span], has_edge[span]
+            )
+            seen = np.flatnonzero(best_stream >= 0)
+            best_stream, best_score, first_seen = best_stream[seen], best_score[seen], first_seen[seen]
+            
+            # Only buyers scoring at least the k-th best can make the cut
+            if 0 < max_matches < len(seen):
+                kth = -np.partition(-best_score, max_matches - 1)[max_matches - 1]
+                contenders = np.flatnonzero(best_score >= kth)
+            else:
+                contenders = np.arange(len(seen))
+            ranked = np.lexsort((
+                seen[contenders], first_seen[contenders], -best_score[contenders]
+            ))
+            order = contenders[ranked[:max_matches]]
+            
+            matches = []
+            for col in order:
+                buyer = all_buyers[seen[col]]
+                waste = profile['waste_streams'][best_stream[col]]
+                score_data = self._calculate_match_score(waste, buyer, profile['location'])
+                matches.append(self._format_match(buyer, score_data))
+            results.append(matches)
+        
+        return results
+    
+    def _format_match(self, buyer_data: Dict, edge_data: Dict) -> Dict:
+        """Frontend-compatible match dict for one waste-buyer edge"""
+        
+        buyer_id = buyer_data['buyer_id']
+        return {
+            'id': int(buyer_id.replace('B', '')),
+            'company': buyer_data['company_name'],
+            'type': buyer_data['company_type'],
+            'materialMatch': round(edge_data['score_breakdown']['material'] * 100, 1),
+            'qualityFit': round(edge_data['score_breakdown']['quality'] * 100, 1),
+            'distance': edge_data['distance_km'],
+            'costSaving': edge_data['economics']['net_annual_benefit'] / 1000,
+            'environmentalImpact': {
+                'co2Saved': edge_data['environmental']['co2_saved_tons_annual'],
+                'landfillDiverted': edge_data['environmental']['landfill_diverted_tons_annual']
+            },
+            'compliance': 'Compliant' if edge_data['score_breakdown']['compliance'] > 0.5 else 'Review Required',
+            'overallScore': round(edge_data['total_score'] * 100, 1),
+            'requirements': f"Min {buyer_data.get('min_monthly_volume_tons', 'N/A')} tons/month",
+            'pricing': buyer_data.get('pricing_model', 'Market dependent'),
+            'contact_email': buyer_data.get('contact_email', ''),
+            'contact_name': buyer_data.get('contact_name', ''),
+            'buyer_id': buyer_id
+        }
+    
+    def find_capacity_allocation(self, waste_profile: Dict, max_matches: int = 10) -> Dict:
+        """
+        Split each waste stream's monthly tonnage across buyers
+        without exceeding their max_monthly_volume_tons
+        
+        Returns:
+            dict with:
+                - allocations: one row per (waste stream, buyer) shipment
+                - unallocated: tons/month per waste type no buyer can absorb
+                - matches: buyers receiving waste, ranked by score (frontend format)
+        """
+        
+        all_buyers, table = self._load_buyers()
+        G = self.build_graph(waste_profile, all_buyers, table)
+        
+        supply = np.array([
+            (waste['quantity_min_tons'] + waste['quantity_max_tons']) / 2
+            for waste in G.waste_streams
+        ], dtype=np.float64)
+        capacity = table.max_volume
+        
+        total_scores = G.total_scores()
+        result = allocate_capacity(G.offsets, G.buyer_index, total_scores, supply, capacity)
+        
+        allocations = []
+        buyer_tons = {}  # Key: buyer position, Value: total tons received
+        best_edge = {}   # Key: buyer position, Value: highest-scoring allocated edge
+        for e, tons in zip(result['edges'], result['tons']):
+            i = G.stream_index[e]
+            j = G.buyer_index[e]
+            allocations.append({
+                'waste_type': G.waste_streams[i]['type'],
+                'buyer_id': all_buyers[j]['buyer_id'],
+                'company': all_buyers[j]['company_name'],
+                'tons_per_month': round(float(tons), 2),
+                'share_pct': round(float(tons / supply[i]) * 100, 1),
+                'score': float(total_scores[e])
+            })
+            buyer_tons[j] = buyer_tons.get(j, 0.0) + float(tons)
+            if j not in best_edge or total_scores[e] > total_scores[best_edge[j]]:
+                best_edge[j] = e
+        
+        # Rank receiving buyers by their best score, then by tonnage
+        ranked = sorted(best_edge, key=lambda j: (-total_scores[best_edge[j]], -buyer_tons[j], j))
+        matches = []
+        for j in ranked[:max_matches]:
+            match = self._format_match(all_buyers[j], G.edge_data(best_edge[j]))
+            match['allocatedTons'] = round(buyer_tons[j], 2)
+            matches.append(match)
+        
+        return {
+            'allocations': allocations,
+            'unallocated': {
+                waste['type']: round(float(tons), 2)
+                for waste, tons in zip(G.waste_streams, result['unallocated'])
+                if tons > 0.005
+            },
+            'matches': matches
+        }
     
     def visualize_graph(self, save_path: str = 'graph_visualization.png'):
         """Visualize the matching graph"""
         
-        if not self.graph:
+        if self.match_graph is None:
             print("No graph to visualize. Build graph first.")
             return
         
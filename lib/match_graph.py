@@ -0,0 +1,148 @@
+import networkx as nx
+import numpy as np
+from typing import Callable, List, Dict
+
+# Score dimensions stored per edge, in breakdown order
+BREAKDOWN_KEYS = ['material', 'quality', 'volume', 'distance', 'compliance']
+
+# Numeric economics/environmental figures stored per edge
+ECONOMICS_KEYS = [
+    'annual_revenue', 'annual_transport_cost', 'disposal_cost_avoided',
+    'net_annual_benefit', 'price_per_ton', 'annual_quantity_tons'
+]
+ENVIRONMENTAL_KEYS = [
+    'co2_saved_tons_annual', 'landfill_diverted_tons_annual',
+    'virgin_material_avoided_tons', 'recycling_efficiency_pct'
+]
+
+
+class MatchGraph:
+    """
+    Array-backed bipartite waste -> buyer graph in CSR layout
+
+    Edges of waste stream i live at positions offsets[i]:offsets[i + 1] of
+    the parallel edge arrays, ordered by buyer position. Nodes are not
+    materialized; waste streams and buyers are referenced by index into
+    the lists the graph was built from.
+
+    Economics and environmental figures are not needed for ranking, so
+    they can be left to impacts(edges) -> (economics, environmental),
+    which is called for single edges by edge_data() and for all edges
+    only when the economics / environmental properties are read.
+    """
+
+    def __init__(self, waste_profile: Dict, buyers: List[Dict], offsets: np.ndarray,
+                 buyer_index: np.ndarray, weights: np.ndarray, breakdown: Dict,
+                 distance_km: np.ndarray, economics: Dict = None, environmental: Dict = None,
+                 impacts: Callable = None):
+        self.waste_streams = waste_profile['waste_streams']
+        self.facility_location = waste_profile['location']
+        self.buyers = buyers
+
+        self.offsets = offsets.astype(np.int64)
+        self.buyer_index = buyer_index.astype(np.int32)
+        self.weights = weights.astype(np.float32)
+        self.breakdown = {key: breakdown[key].astype(np.float32) for key in BREAKDOWN_KEYS}
+        self.distance_km = distance_km.astype(np.float32)
+
+        # Money and tonnage figures keep full precision
+        self._economics = economics
+        self._environmental = environmental
+        self._impacts = impacts
+
+        self.stream_index = np.repeat(
+            np.arange(len(self.waste_streams), dtype=np.int32), np.diff(self.offsets)
+        )
+
+    @property
+    def economics(self) -> Dict:
+        """Economics arrays of all edges (computed on first access if lazy)"""
+        if self._economics is None:
+            self._economics, self._environmental = self._impacts(np.arange(self.num_edges))
+        return self._economics
+
+    @property
+    def environmental(self) -> Dict:
+        """Environmental arrays of all edges (computed on first access if lazy)"""
+        if self._environmental is None:
+            self._economics, self._environmental = self._impacts(np.arange(self.num_edges))
+        return self._environmental
+
+    @property
+    def num_edges(self) -> int:
+        return len(self.buyer_index)
+
+    @property
+    def num_nodes(self) -> int:
+        return len(self.waste_streams) + len(self.buyers)
+
+    def total_scores(self) -> np.ndarray:
+        """Edge total scores as float64, rounded back to 3 decimals"""
+        return np.round(self.weights.astype(np.float64), 3)
+
+    def breakdown_scores(self, key: str) -> np.ndarray:
+        """One score dimension for all edges, rounded back to 3 decimals"""
+        return np.round(self.breakdown[key].astype(np.float64), 3)
+
+    def edges(self, stream: int) -> range:
+        """Edge positions of one waste stream"""
+        return range(self.offsets[stream], self.offsets[stream + 1])
+
+    def edge_data(self, edge: int) -> Dict:
+        """Rebuild the score dict of one edge"""
+
+        if self._economics is not None:
+            economics, environmental, at = self._economics, self._environmental, edge
+        else:
+            economics, environmental = self._impacts(np.array([edge]))
+            at = 0
+
+        return {
+            'total_score': round(float(self.weights[edge]), 3),
+            'score_breakdown': {
+                key: round(float(self.breakdown[key][edge]), 3)
+                for key in BREAKDOWN_KEYS
+            },
+            'distance_km': round(float(self.distance_km[edge]), 1),
+            'economics': dict(
+                {key: values[at].item() for key, values in economics.items()},
+                currency='INR'
+            ),
+            'environmental': {
+                key: values[at].item() for key, values in environmental.items()
+            }
+        }
+
+    def waste_node(self, stream: int) -> str:
+        return f"waste_{stream}_{self.waste_streams[stream]['type']}"
+
+    def buyer_node(self, position: int) -> str:
+        return f"buyer_{self.buyers[position]['buyer_id']}"
+
+    def to_networkx(self) -> nx.DiGraph:
+        """Export as a networkx DiGraph (for visualization and debugging)"""
+
+        G = nx.DiGraph()
+
+        for i, waste in enumerate(self.waste_streams):
+            G.add_node(
+                self.waste_node(i),
+                node_type='waste',
+                waste_data=waste,
+                facility_location=self.facility_location
+            )
+
+        for j, buyer in enumerate(self.buyers):
+            G.add_node(self.buyer_node(j), node_type='buyer', buyer_data=buyer)
+
+        for i in range(len(self.waste_streams)):
+            for e in self.edges(i):
+                data = self.edge_data(e)
+                G.add_edge(
+                    self.waste_node(i),
+                    self.buyer_node(self.buyer_index[e]),
+                    weight=data['total_score'],
+                    **data
+                )
+
+        return G
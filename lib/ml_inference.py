@@ -1,14 +1,52 @@
 #File: lib/ml_inference.py
+import logging
 import pickle
 import numpy as np
+import os
 import pandas as pd
+from lib.feature_encoder import FeatureEncoder
+from lib.tree_ensemble import artifact_version, file_digest, load_compiled_models, source_digests
+from lib.tree_export import export_encoders
+from lib.waste_cascade import CASCADE_FILE, CASCADE_MODES, WasteTypeCascade
+
+logger = logging.getLogger(__name__)
 
 data = "data"
 model_dir= "models"
 
+# Fallbacks for waste types without a quantity / quality / contamination model
+MODEL_FALLBACKS = {'quantity': None, 'quality': 'Grade B', 'contamination': 10.0}
+
 
 class WastePredictor:
-    def __init__(self):
+    def __init__(self, unknown_category=None, cache=None, cascade_mode=None, use_compiled=True):
+        """
+        unknown_category: code used for categorical inputs the encoders
+        never saw (an int, or {feature: int}); None raises
+        UnknownCategoryError instead
+        cache: optional PredictionCache for predict / predict_batch
+        cascade_mode: 'gated', 'safety' or 'off' (see lib/waste_cascade);
+        defaults to 'off'. The other modes need model_dir/cascade.json
+        (scripts/build_cascade.py)
+        use_compiled: False always loads the pickled models, even when
+        up-to-date compiled models exist
+        """
+        
+        self.cache = cache
+        digests = source_digests(model_dir)
+        
+        # Compiled NumPy ensembles (scripts/compile_models.py) need neither
+        # xgboost nor sklearn; the pickles are only read without them
+        self.ensembles = None
+        compiled = self._load_compiled(digests) if use_compiled else None
+        if compiled is not None:
+            self.ensembles = compiled['ensembles']
+            self.encoders = compiled['encoders']
+            self.feature_encoder = FeatureEncoder(self.encoders, unknown=unknown_category)
+            cascade_version = self._load_cascade(cascade_mode, self.ensembles['classifiers'].names)
+            self.model_version = artifact_version(dict(compiled['sources'], **cascade_version))
+            return
+        
         # Load all models
         with open(model_dir+'/encoders.pkl', 'rb') as f:
             self.encoders = pickle.load(f)
@@ -24,8 +62,55 @@ class WastePredictor:
         
         with open(model_dir+'/contamination_models.pkl', 'rb') as f:
             self.contamination_models = pickle.load(f)
+        
+        # Encoders as lookup tables; sklearn's are not called per request
+        self.feature_encoder = FeatureEncoder(export_encoders(self.encoders), unknown=unknown_category)
+        
+        # Part of every cache key: retrained models never reuse predictions
+        cascade_version = self._load_cascade(cascade_mode, list(self.waste_classifiers))
+        self.model_version = artifact_version(dict(digests, **cascade_version))
+    
+    def _load_cascade(self, cascade_mode, waste_types):
+        """Set up the waste type cascade; returns its part of the model version"""
+        
+        path = os.path.join(model_dir, CASCADE_FILE)
+        cascade_mode = cascade_mode or 'off'
+        if cascade_mode not in CASCADE_MODES:
+            raise ValueError(f"cascade_mode must be one of {CASCADE_MODES}, got {cascade_mode!r}")
+        
+        self.cascade_mode = cascade_mode
+        self.cascade = None
+        if cascade_mode == 'off':
+            return {}
+        
+        self.cascade = WasteTypeCascade.load(path)
+        self.cascade.compile(self.feature_encoder.classes['industry'], self.feature_encoder.classes['process'],
+                             waste_types)
+        return {'cascade': f"{file_digest(path)}:{cascade_mode}"}
+    
+    def _load_compiled(self, digests):
+        """Compiled models from model_dir/compiled, unless missing or older than the pickles"""
+        
+        path = os.path.join(model_dir, 'compiled')
+        if not os.path.exists(os.path.join(path, 'manifest.json')):
+            return None
+        
+        try:
+            compiled = load_compiled_models(path)
+        except (OSError, ValueError, KeyError) as e:
+            print(f"⚠️ Ignoring compiled models in {path}: {e}")
+            return None
+        
+        stale = [name for name, digest in digests.items() if compiled['sources'].get(name) != digest]
+        if stale:
+            print(f"⚠️ Compiled models in {path} predate {', '.join(stale)}; "
+                  f"loading pickles (rerun scripts/compile_models.py)")
+            return None
+        
+        print(f"✅ Loaded compiled models from {path}")
+        return compiled
     
-    def predict(self, facility_input):
+    def predict(self, facility_input, use_cache=True):
         """
         Predict waste profile from facility operational data
         
@@ -42,6 +127,14 @@ class WastePredictor:
             dict with waste profile prediction
         """
         
+        if use_cache and self.cache is not None:
+            return self.cache.lookup(
+                self.model_version, facility_input, lambda facility: self.predict(facility, use_cache=False)
+            )
+        
+        if self.ensembles is not None or self.cascade is not None:
+            return self.predict_batch([facility_input], use_cache=False)[0]
+        
         # Encode features
         features = self._encode_features(facility_input)
         
@@ -65,16 +158,9 @@ class WastePredictor:
             waste_type = pred['type']
             
             # Quantity
+            avg_qty = None
             if waste_type in self.quantity_models:
-                qty_model = self.quantity_models[waste_type]
-                avg_qty = qty_model.predict(features)[0]
-                
-                # Add uncertainty range (±20%)
-                qty_min = avg_qty * 0.8
-                qty_max = avg_qty * 1.2
-            else:
-                # Fallback
-                qty_min, qty_max = 1.0, 5.0
+                avg_qty = self.quantity_models[waste_type].predict(features)[0]
             
             # Quality
             if waste_type in self.quality_models:
@@ -90,19 +176,182 @@ class WastePredictor:
             else:
                 contamination = 10.0
             
-            # Hazard classification (rule-based)
-            hazard = self._classify_hazard(waste_type, contamination)
+            waste_streams.append(
+                self._waste_stream(waste_type, pred['probability'], avg_qty, quality, contamination)
+            )
+        
+        return self._waste_profile(waste_streams)
+    
+    def predict_batch(self, facility_inputs, use_cache=True):
+        """
+        predict() for many facilities at once, with identical results
+        
+        All facilities are encoded into one feature matrix. Each waste-type
+        classifier runs once over all rows, and each quantity, quality and
+        contamination model runs once over the rows that predicted its
+        waste type.
+        
+        Returns:
+            list of waste profile dicts, in input order
+        """
+        
+        if len(facility_inputs) == 0:
+            return []
+        if use_cache and self.cache is not None:
+            return self.cache.lookup_batch(
+                self.model_version, facility_inputs, lambda facilities: self.predict_batch(facilities, use_cache=False)
+            )
+        
+        features = self._encode_features_batch(facility_inputs)
+        
+        # Cascade stage: candidate waste types per facility
+        mask = None if self.cascade is None else self.cascade.mask(features)
+        gate = mask if self.cascade_mode == 'gated' else None
+        
+        if self.ensembles is not None:
+            probabilities, details = self._compiled_outputs(features, gate)
+        else:
+            probabilities, details = self._model_outputs(features, gate)
+        
+        if mask is not None:
+            self._record_cascade(mask, gate, probabilities)
+        
+        profiles = []
+        for row in range(len(facility_inputs)):
+            predictions = [
+                (waste_type, float(prob[row]))
+                for waste_type, prob in probabilities.items() if prob[row] > 0.3
+            ]
+            predictions.sort(key=lambda x: x[1], reverse=True)
             
-            waste_streams.append({
-                'type': waste_type,
-                'category': self._get_category(waste_type),
-                'quantity_min_tons': round(qty_min, 2),
-                'quantity_max_tons': round(qty_max, 2),
-                'quality_grade': quality,
-                'contamination_pct': round(contamination, 1),
-                'hazard_class': hazard,
-                'confidence': round(pred['probability'], 2)
-            })
+            waste_streams = [
+                self._waste_stream(waste_type, probability, *details[waste_type, row])
+                for waste_type, probability in predictions
+            ]
+            profiles.append(self._waste_profile(waste_streams))
+        
+        return profiles
+    
+    def _model_outputs(self, features, gate=None):
+        """
+        Waste type probabilities ({type: per-row array}) and the
+        (quantity, quality, contamination) of each (type, row) above the
+        threshold, from the pickled models. With a gate (rows x types
+        mask), classifiers only score their candidate rows; the other
+        rows get probability 0.
+        """
+        
+        # Waste type probabilities, one classifier call each
+        probabilities = {}
+        for i, (waste_type, classifier) in enumerate(self.waste_classifiers.items()):
+            if gate is None:
+                probabilities[waste_type] = classifier.predict_proba(features)[:, 1]
+                continue
+            prob = np.zeros(len(features))
+            rows = np.flatnonzero(gate[:, i])
+            if len(rows):
+                prob[rows] = classifier.predict_proba(features[rows])[:, 1]
+            probabilities[waste_type] = prob
+        
+        # Per-type models only see the rows that include that type
+        details = {}
+        for waste_type, prob in probabilities.items():
+            rows = np.flatnonzero(prob > 0.3)
+            if len(rows) == 0:
+                continue
+            X = features[rows]
+            
+            if waste_type in self.quantity_models:
+                qty = self.quantity_models[waste_type].predict(X)
+            else:
+                qty = [None] * len(rows)
+            
+            if waste_type in self.quality_models:
+                qual_info = self.quality_models[waste_type]
+                quality = qual_info['encoder'].inverse_transform(qual_info['model'].predict(X))
+            else:
+                quality = ['Grade B'] * len(rows)
+            
+            if waste_type in self.contamination_models:
+                contamination = self.contamination_models[waste_type].predict(X)
+            else:
+                contamination = [10.0] * len(rows)
+            
+            for k, row in enumerate(rows):
+                details[waste_type, row] = (qty[k], quality[k], contamination[k])
+        
+        return probabilities, details
+    
+    def _compiled_outputs(self, features, gate=None):
+        """_model_outputs from the compiled ensembles, every waste type in one pass per group"""
+        
+        classifiers = self.ensembles['classifiers']
+        if gate is None:
+            grid = classifiers.predict(features)
+        else:
+            grid = np.zeros(gate.shape)
+            rows, types = np.nonzero(gate)
+            grid[rows, types] = classifiers.predict(features, rows, types)
+        probabilities = {waste_type: grid[:, i] for i, waste_type in enumerate(classifiers.names)}
+        rows, types = np.nonzero(grid > 0.3)
+        
+        outputs = {}
+        for group, fallback in MODEL_FALLBACKS.items():
+            ensemble = self.ensembles[group]
+            models = np.array([ensemble.index.get(classifiers.names[t], -1) for t in types], dtype=np.int64)
+            known = models >= 0
+            values = np.full(len(rows), fallback, dtype=object)
+            if known.any():
+                values[known] = list(ensemble.predict(features, rows[known], models[known]))
+            outputs[group] = values
+        
+        details = {
+            (classifiers.names[t], row): (outputs['quantity'][k], outputs['quality'][k], outputs['contamination'][k])
+            for k, (row, t) in enumerate(zip(rows, types))
+        }
+        return probabilities, details
+    
+    def _record_cascade(self, mask, gate, probabilities):
+        """Cascade counters: classifier calls made, and types found outside the candidates"""
+        
+        missed = {}
+        for i, (waste_type, prob) in enumerate(probabilities.items()):
+            count = int(np.count_nonzero((prob > 0.3) & ~mask[:, i]))
+            if count:
+                missed[waste_type] = count
+        
+        evaluated = int(mask.sum()) if gate is not None else mask.size
+        self.cascade.record(mask, evaluated, missed)
+        if missed:
+            logger.debug("Cascade missed %d predicted waste types: %s", sum(missed.values()), missed)
+    
+    def _waste_stream(self, waste_type, probability, avg_qty, quality, contamination):
+        """Waste stream dict from one waste type's model outputs"""
+        
+        if avg_qty is not None:
+            # Add uncertainty range (±20%)
+            qty_min = avg_qty * 0.8
+            qty_max = avg_qty * 1.2
+        else:
+            # Fallback
+            qty_min, qty_max = 1.0, 5.0
+        
+        # Hazard classification (rule-based)
+        hazard = self._classify_hazard(waste_type, contamination)
+        
+        return {
+            'type': waste_type,
+            'category': self._get_category(waste_type),
+            'quantity_min_tons': round(qty_min, 2),
+            'quantity_max_tons': round(qty_max, 2),
+            'quality_grade': quality,
+            'contamination_pct': round(contamination, 1),
+            'hazard_class': hazard,
+            'confidence': round(probability, 2)
+        }
+    
+    def _waste_profile(self, waste_streams):
+        """Profile dict around the sorted waste streams"""
         
         # Overall confidence (average of top 3 predictions)
         top_confidences = [w['confidence'] for w in waste_streams[:3]]
@@ -116,35 +365,11 @@ class WastePredictor:
     
     def _encode_features(self, facility_input):
         """Convert input dict to encoded feature vector"""
-        
-        # Normalize categorical inputs to lowercase
-        industry = facility_input['industry'].lower()
-        product = facility_input['product'].lower()
-        process = facility_input['process'].lower()
-        machinery = facility_input['machinery'].lower()
-        scale = facility_input['scale'].lower()
-        
-        # Encode categorical
-        industry_enc = self.encoders['industry'].transform([industry])[0]
-        product_enc = self.encoders['product'].transform([product])[0]
-        process_enc = self.encoders['process'].transform([process])[0]
-        machinery_enc = self.encoders['machinery'].transform([machinery])[0]
-        scale_enc = self.encoders['scale'].transform([scale])[0]
-        
-        # Scale units
-        units_scaled = self.encoders['scaler'].transform([[facility_input['units_per_month']]])[0][0]
-        
-        # Interaction features
-        industry_process = industry_enc * 100 + process_enc
-        process_machinery = process_enc * 100 + machinery_enc
-        
-        # Create feature array
-        features = np.array([[
-            industry_enc, product_enc, process_enc, machinery_enc, scale_enc,
-            units_scaled, industry_process, process_machinery
-        ]])
-        
-        return features
+        return self.feature_encoder.encode(facility_input)
+    
+    def _encode_features_batch(self, facility_inputs):
+        """_encode_features for many inputs: one row per facility"""
+        return self.feature_encoder.encode_batch(facility_inputs)
     
     def _get_category(self, waste_type):
         """Get waste category from waste type"""
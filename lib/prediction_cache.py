@@ -0,0 +1,125 @@
+import copy
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Dict, List, Tuple
+from lib.feature_encoder import CATEGORICAL_FEATURES
+
+# Facility inputs kept per cache
+PREDICTION_CACHE_SIZE = 4096
+
+# Seconds a cached prediction stays valid
+PREDICTION_CACHE_TTL = 3600
+
+
+class PredictionCache:
+    """
+    Bounded LRU cache of WastePredictor results with a time-to-live
+
+    Entries are keyed on the model version plus the lowercased categorical
+    inputs and units_per_month, so retrained models (a new version)
+    never see older predictions. units_digits=None keys on the exact
+    units; with n digits, units are rounded to n significant digits and
+    the prediction is made for the rounded value, so every facility in a
+    bucket gets the same cached result. Results are copied in and out,
+    since callers add fields to the profiles they receive.
+    """
+
+    def __init__(self, max_size: int = PREDICTION_CACHE_SIZE, ttl_seconds: float = PREDICTION_CACHE_TTL,
+                 units_digits: int = None):
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+        self.units_digits = units_digits
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def normalize(self, facility_input: Dict) -> Dict:
+        """The input a prediction is made for (units rounded when bucketing)"""
+
+        if self.units_digits is None:
+            return facility_input
+        units = facility_input['units_per_month']
+        return dict(facility_input, units_per_month=float(f"{units:.{self.units_digits}g}"))
+
+    def key(self, model_version: str, facility_input: Dict) -> Tuple:
+        facility_input = self.normalize(facility_input)
+        return (model_version,) + tuple(facility_input[name].lower() for name in CATEGORICAL_FEATURES) + (
+            facility_input['units_per_month'],
+        )
+
+    def get(self, key: Tuple):
+        """Cached result for key, or None (counted as a miss)"""
+
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and time.monotonic() - entry[0] > self.ttl_seconds:
+                del self._entries[key]
+                self.expirations += 1
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+        return copy.deepcopy(entry[1])
+
+    def put(self, key: Tuple, result):
+        with self._lock:
+            self._entries[key] = (time.monotonic(), copy.deepcopy(result))
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def lookup(self, model_version: str, facility_input: Dict, predict: Callable):
+        """Cached predict(normalized input), computing and storing it on a miss"""
+
+        key = self.key(model_version, facility_input)
+        result = self.get(key)
+        if result is None:
+            result = predict(self.normalize(facility_input))
+            self.put(key, result)
+        return result
+
+    def lookup_batch(self, model_version: str, facility_inputs: List[Dict], predict_batch: Callable) -> List:
+        """lookup() for many inputs; misses go to predict_batch in one call"""
+
+        keys = [self.key(model_version, facility_input) for facility_input in facility_inputs]
+        results = [self.get(key) for key in keys]
+
+        # Each distinct missing key is predicted once
+        missing = {}
+        for i, key in enumerate(keys):
+            if results[i] is None:
+                missing.setdefault(key, []).append(i)
+        if missing:
+            predicted = predict_batch([self.normalize(facility_inputs[rows[0]]) for rows in missing.values()])
+            for (key, rows), result in zip(missing.items(), predicted):
+                self.put(key, result)
+                for i in rows:
+                    results[i] = copy.deepcopy(result)
+
+        return results
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'size': len(self._entries),
+                'max_size': self.max_size,
+                'ttl_seconds': self.ttl_seconds,
+                'units_digits': self.units_digits,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': round(self.hits / lookups, 4) if lookups else 0.0,
+                'evictions': self.evictions,
+                'expirations': self.expirations
+            }
@@ -0,0 +1,128 @@
+import numpy as np
+
+EARTH_RADIUS_KM = 6371
+
+
+def haversine_km(lat1, lon1, lat2, lon2):
+    """Vectorized great-circle distance in km (same formula as BuyerDatabase)"""
+
+    lat1, lon1, lat2, lon2 = map(np.radians, [lat1, lon1, lat2, lon2])
+    dlat = lat2 - lat1
+    dlon = lon2 - lon1
+
+    a = np.sin(dlat/2)**2 + np.cos(lat1) * np.cos(lat2) * np.sin(dlon/2)**2
+    c = 2 * np.arcsin(np.sqrt(a))
+
+    return EARTH_RADIUS_KM * c
+
+
+class GridIndex:
+    """
+    Lat/lng grid over points for radius and nearest-neighbour queries
+
+    Points are bucketed into cells of cell_deg x cell_deg degrees and stored
+    cell by cell (CSR layout). A query only visits the cells overlapping the
+    search circle's bounding box, then refines candidates with exact
+    haversine distances. Rows with missing coordinates are never returned.
+    """
+
+    def __init__(self, lat: np.ndarray, lng: np.ndarray, cell_deg: float = 0.5):
+        self.lat = np.asarray(lat, dtype=np.float64)
+        self.lng = np.asarray(lng, dtype=np.float64)
+        self.cell_deg = cell_deg
+        self.num_rows = int(np.ceil(180 / cell_deg)) + 1
+        self.num_cols = int(np.ceil(360 / cell_deg))
+
+        valid = np.flatnonzero(np.isfinite(self.lat) & np.isfinite(self.lng))
+        keys = self._cell_keys(self.lat[valid], self.lng[valid])
+
+        order = np.argsort(keys, kind='stable')
+        self.rows = valid[order]
+        sorted_keys = keys[order]
+        self.cell_keys, starts = np.unique(sorted_keys, return_index=True)
+        self.cell_offsets = np.append(starts, len(sorted_keys))
+
+    def _cell_row(self, lat):
+        return np.clip(np.floor((lat + 90) / self.cell_deg), 0, self.num_rows - 1).astype(np.int64)
+
+    def _cell_col(self, lng):
+        return np.floor((np.asarray(lng) + 180) / self.cell_deg).astype(np.int64) % self.num_cols
+
+    def _cell_keys(self, lat, lng):
+        return self._cell_row(lat) * self.num_cols + self._cell_col(lng)
+
+    def _candidate_cells(self, lat: float, lng: float, radius_km: float):
+        """(start, count) in self.rows of the non-empty cells overlapping the circle's bounding box"""
+
+        angle = radius_km / EARTH_RADIUS_KM
+        margin = 1e-6
+        dlat = np.degrees(angle) + margin
+        lat_lo, lat_hi = lat - dlat, lat + dlat
+
+        # Longitude span of the circle, all longitudes if it covers a pole
+        if lat_lo <= -90 or lat_hi >= 90 or angle >= np.pi / 2:
+            cols = np.arange(self.num_cols)
+        else:
+            ratio = np.sin(angle) / np.cos(np.radians(lat))
+            dlng = 180.0 if ratio >= 1 else np.degrees(np.arcsin(ratio)) + margin
+            if dlng >= 180:
+                cols = np.arange(self.num_cols)
+            else:
+                first = int(np.floor((lng - dlng + 180) / self.cell_deg))
+                last = int(np.floor((lng + dlng + 180) / self.cell_deg))
+                cols = np.unique(np.arange(first, last + 1) % self.num_cols)
+
+        cell_rows = np.arange(self._cell_row(lat_lo), self._cell_row(lat_hi) + 1)
+        keys = (cell_rows[:, None] * self.num_cols + cols[None, :]).ravel()
+
+        # Keep only non-empty cells
+        pos = np.searchsorted(self.cell_keys, keys)
+        hit = pos < len(self.cell_keys)
+        hit[hit] = self.cell_keys[pos[hit]] == keys[hit]
+        pos = pos[hit]
+
+        starts = self.cell_offsets[pos]
+        return starts, self.cell_offsets[pos + 1] - starts
+
+    def _candidates(self, lat: float, lng: float, radius_km: float) -> np.ndarray:
+        """Rows in cells overlapping the circle's bounding box"""
+
+        starts, counts = self._candidate_cells(lat, lng, radius_km)
+        gather = np.repeat(starts - np.cumsum(counts) + counts, counts) + np.arange(counts.sum())
+        return self.rows[gather]
+
+    def candidate_count(self, lat: float, lng: float, radius_km: float) -> int:
+        """Upper bound on len(within_radius(...)), from cell counts only"""
+
+        return int(self._candidate_cells(lat, lng, radius_km)[1].sum())
+
+    def within_radius(self, lat: float, lng: float, radius_km: float) -> np.ndarray:
+        """Sorted rows within radius_km of (lat, lng), boundary included"""
+
+        rows = self._candidates(lat, lng, radius_km)
+        distances = haversine_km(lat, lng, self.lat[rows], self.lng[rows])
+        return np.sort(rows[distances <= radius_km])
+
+    def nearest(self, lat: float, lng: float, k: int):
+        """
+        k nearest rows to (lat, lng), closest first (ties by row)
+
+        Returns (rows, distances_km). The search radius doubles until it
+        holds k points, so every point inside it is a candidate.
+        """
+
+        total = len(self.rows)
+        k = min(k, total)
+        if k <= 0:
+            return np.zeros(0, dtype=np.int64), np.zeros(0)
+
+        radius = self.cell_deg * 111.0
+        while True:
+            rows = self._candidates(lat, lng, radius)
+            distances = haversine_km(lat, lng, self.lat[rows], self.lng[rows])
+            inside = distances <= radius
+            if inside.sum() >= k or radius >= np.pi * EARTH_RADIUS_KM:
+                rows, distances = rows[inside], distances[inside]
+                order = np.lexsort((rows, distances))[:k]
+                return rows[order], distances[order]
+            radius *= 2
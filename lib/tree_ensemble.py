@@ -0,0 +1,241 @@
+import hashlib
+import json
+import os
+import numpy as np
+from typing import Dict, List
+from lib.atomic_dir import atomic_replace_dir
+
+# Bumped whenever the compiled model layout changes
+COMPILED_FORMAT_VERSION = 1
+
+# (row, model) pairs traversed together; bounds the (pairs, trees) node matrix
+PAIR_CHUNK = 512
+
+# Pickled artifacts a compiled model directory is built from
+MODEL_FILES = ['encoders.pkl', 'waste_type_classifiers.pkl', 'quantity_models.pkl',
+               'quality_models.pkl', 'contamination_models.pkl']
+
+
+def file_digest(path: str) -> str:
+    """sha256 of a file's contents"""
+
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def source_digests(model_dir: str) -> Dict[str, str]:
+    """Digest of each pickled artifact present in model_dir"""
+    return {
+        name: file_digest(os.path.join(model_dir, name))
+        for name in MODEL_FILES if os.path.exists(os.path.join(model_dir, name))
+    }
+
+
+def artifact_version(digests: Dict[str, str]) -> str:
+    """Short hash identifying one set of model artifacts"""
+    return hashlib.sha256(json.dumps(digests, sort_keys=True).encode()).hexdigest()[:16]
+
+
+class TreeEnsemble:
+    """
+    Decision-tree ensembles for a group of models (one per waste type),
+    packed into flat node arrays and evaluated with NumPy only
+
+    Every tree of every model lives in the same node arrays, laid out so
+    that a split's right child directly follows its left child. Splits are
+    normalized to "x < threshold" on float32 features, which reproduces
+    both XGBoost's and scikit-learn's comparisons exactly, so one step is
+    node = left[node] + (x >= threshold[node]). Leaves have a NaN
+    threshold and point to themselves. All trees of all requested
+    (row, model) pairs descend together, and paths drop out as they
+    reach a leaf. Node 0 is an empty leaf that pads models with fewer
+    trees than the widest one.
+
+    kind decides how leaf values combine:
+        'logistic': sigmoid(base + sum), XGBoost binary classifiers
+        'mean':     sum / n_trees, random forest regressors
+        'vote':     class with the highest mean leaf probability, random
+                    forest classifiers; returned as its label
+    """
+
+    ARRAYS = ['feature', 'threshold', 'left', 'missing', 'value', 'roots', 'n_trees', 'base']
+
+    def __init__(self, kind: str, names: List[str], arrays: Dict[str, np.ndarray], labels: List[List] = None):
+        self.kind = kind
+        self.names = list(names)
+        self.index = {name: i for i, name in enumerate(self.names)}
+        for name in self.ARRAYS:
+            setattr(self, name, arrays[name])
+        self.labels = labels
+        self._labels = None if labels is None else np.array(
+            [list(row) + [None] * (self.value.shape[1] - len(row)) for row in labels], dtype=object
+        )
+        self.is_leaf = np.isnan(self.threshold)
+
+    @classmethod
+    def from_trees(cls, kind: str, models: Dict[str, Dict]) -> 'TreeEnsemble':
+        """
+        Pack exported models: {name: {'trees': [...], 'base': float,
+        'labels': [...]}}, each tree a dict of equal-length node lists
+        (feature, threshold, left, right, missing, value; children -1 at
+        leaves, value a list per node)
+        """
+
+        names = list(models)
+        width = max([len(tree['value'][0]) for model in models.values() for tree in model['trees']] or [1])
+        max_trees = max([len(model['trees']) for model in models.values()] or [0])
+
+        feature, threshold, left, missing = [0], [np.nan], [0], [0]
+        value = [[0.0] * width]
+        roots = np.zeros((len(names), max_trees), dtype=np.int32)
+
+        for m, name in enumerate(names):
+            for t, tree in enumerate(models[name]['trees']):
+                # Breadth-first renumbering: children get consecutive positions
+                offset = len(feature)
+                order, position = [0], {0: offset}
+                for node in order:
+                    if tree['left'][node] >= 0:
+                        for child in (tree['left'][node], tree['right'][node]):
+                            position[child] = offset + len(order)
+                            order.append(child)
+
+                roots[m, t] = offset
+                for node in order:
+                    leaf = tree['left'][node] < 0
+                    feature.append(0 if leaf else tree['feature'][node])
+                    threshold.append(np.nan if leaf else tree['threshold'][node])
+                    left.append(position[node] if leaf else position[tree['left'][node]])
+                    missing.append(position[node] if leaf else position[tree['missing'][node]])
+                    leaf_value = list(tree['value'][node]) if leaf else []
+                    value.append(leaf_value + [0.0] * (width - len(leaf_value)))
+
+        arrays = {
+            'feature': np.array(feature, dtype=np.int32),
+            'threshold': np.array(threshold, dtype=np.float32),
+            'left': np.array(left, dtype=np.int32),
+            'missing': np.array(missing, dtype=np.int32),
+            'value': np.array(value, dtype=np.float64),
+            'roots': roots,
+            'n_trees': np.array([len(models[name]['trees']) for name in names], dtype=np.int32),
+            'base': np.array([models[name].get('base', 0.0) for name in names], dtype=np.float64)
+        }
+        labels = [models[name]['labels'] for name in names] if kind == 'vote' else None
+        return cls(kind, names, arrays, labels)
+
+    def _leaves(self, X: np.ndarray, rows: np.ndarray, models: np.ndarray) -> np.ndarray:
+        """Leaf reached by row rows[i] in every tree of models[i]: (trees, pairs)"""
+
+        num_trees = self.roots.shape[1]
+        node = self.roots[models].ravel()
+        offsets = np.repeat((rows * X.shape[1]).astype(np.int32), num_trees)
+        values = X.ravel()
+        has_nan = np.isnan(values).any()
+
+        active = np.flatnonzero(~self.is_leaf[node]).astype(np.int32)
+        while len(active):
+            current = node.take(active)
+            x = values.take(offsets.take(active) + self.feature.take(current))
+            step = self.left.take(current) + (x >= self.threshold.take(current))
+            if has_nan:
+                step = np.where(np.isnan(x), self.missing.take(current), step)
+            node[active] = step
+            active = active[~self.is_leaf.take(step)]
+
+        return np.ascontiguousarray(node.reshape(len(rows), num_trees).T)
+
+    def predict(self, X: np.ndarray, rows: np.ndarray = None, models: np.ndarray = None) -> np.ndarray:
+        """
+        Model outputs for (row, model) pairs of feature matrix X
+
+        rows / models are equal-length arrays of row positions and model
+        positions (see .index). Without them every model scores every
+        row and the result has shape (len(X), len(names)).
+        """
+
+        X = np.asarray(X, dtype=np.float32)
+        grid = rows is None
+        if grid:
+            rows = np.repeat(np.arange(len(X)), len(self.names))
+            models = np.tile(np.arange(len(self.names)), len(X))
+        rows, models = np.asarray(rows, dtype=np.int64), np.asarray(models, dtype=np.int64)
+
+        # Leaf values are added tree by tree, in the same order (and, for
+        # XGBoost, the same float32 precision) as the original libraries
+        logistic = self.kind == 'logistic'
+        totals = np.zeros((len(rows), self.value.shape[1]), dtype=np.float32 if logistic else np.float64)
+        for start in range(0, len(rows), PAIR_CHUNK):
+            chunk = slice(start, start + PAIR_CHUNK)
+            leaves = self.value[self._leaves(X, rows[chunk], models[chunk])]
+            if logistic:
+                base = self.base[models[chunk], None].astype(np.float32)
+                leaves = np.concatenate([base[None], leaves.astype(np.float32)])
+            totals[chunk] = leaves.sum(axis=0)
+
+        if logistic:
+            result = 1 / (1 + np.exp(-totals[:, 0]))
+        elif self.kind == 'mean':
+            result = totals[:, 0] / self.n_trees[models]
+        else:
+            result = self._labels[models, (totals / self.n_trees[models, None]).argmax(axis=1)]
+
+        return result.reshape(len(X), len(self.names)) if grid else result
+
+
+def save_compiled_models(path: str, ensembles: Dict[str, TreeEnsemble], encoders: Dict, sources: Dict[str, str]):
+    """
+    Write ensembles and encoder tables as a directory of .npy arrays plus
+    manifest.json (replaced atomically). encoders maps each categorical
+    feature to its class list and 'scaler' to {'mean', 'scale'}. sources
+    records the digests of the pickles they were compiled from.
+    """
+
+    atomic_replace_dir(path, lambda tmp_path: _write_compiled_models(tmp_path, ensembles, encoders, sources))
+
+
+def _write_compiled_models(tmp_path: str, ensembles: Dict[str, TreeEnsemble], encoders: Dict,
+                           sources: Dict[str, str]):
+    """Arrays and manifest of save_compiled_models(), written into the empty directory tmp_path"""
+
+    groups = {}
+    for group, ensemble in ensembles.items():
+        arrays = {}
+        for name in TreeEnsemble.ARRAYS:
+            arrays[name] = f'{group}_{name}'
+            np.save(os.path.join(tmp_path, arrays[name] + '.npy'), getattr(ensemble, name))
+        groups[group] = {'kind': ensemble.kind, 'names': ensemble.names, 'arrays': arrays, 'labels': ensemble.labels}
+
+    manifest = {
+        'format_version': COMPILED_FORMAT_VERSION,
+        'groups': groups,
+        'encoders': encoders,
+        'sources': sources
+    }
+    with open(os.path.join(tmp_path, 'manifest.json'), 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, ensure_ascii=False)
+
+
+def load_compiled_models(path: str) -> Dict:
+    """
+    Compiled models written by save_compiled_models():
+    {'ensembles': {group: TreeEnsemble}, 'encoders': exported encoder
+    spec (see save_compiled_models), 'sources': {pickle: digest}}
+    """
+
+    with open(os.path.join(path, 'manifest.json'), encoding='utf-8') as f:
+        manifest = json.load(f)
+    if manifest.get('format_version') != COMPILED_FORMAT_VERSION:
+        raise ValueError(
+            f"Compiled models {path} have format {manifest.get('format_version')}, "
+            f"expected {COMPILED_FORMAT_VERSION}; rerun scripts/compile_models.py"
+        )
+
+    ensembles = {}
+    for group, spec in manifest['groups'].items():
+        arrays = {name: np.load(os.path.join(path, file + '.npy')) for name, file in spec['arrays'].items()}
+        ensembles[group] = TreeEnsemble(spec['kind'], spec['names'], arrays, spec['labels'])
+
+    return {'ensembles': ensembles, 'encoders': manifest['encoders'], 'sources': manifest['sources']}
@@ -0,0 +1,113 @@
+import json
+import numpy as np
+from typing import Dict, List
+from lib.tree_ensemble import TreeEnsemble
+
+
+def _sklearn_threshold(threshold: float) -> float:
+    """
+    float32 t with (x <= threshold) == (x < t) for every float32 x:
+    scikit-learn compares float32 features against float64 thresholds
+    """
+
+    t = np.float32(threshold)
+    if t > threshold:
+        t = np.nextafter(t, np.float32(-np.inf))
+    return float(np.nextafter(t, np.float32(np.inf)))
+
+
+def sklearn_trees(forest, normalize: bool = False) -> List[Dict]:
+    """Node lists of every tree in a scikit-learn forest"""
+
+    trees = []
+    for estimator in forest.estimators_:
+        tree = estimator.tree_
+        value = tree.value[:, 0, :]
+        if normalize:
+            totals = value.sum(axis=1, keepdims=True)
+            value = value / np.where(totals == 0, 1, totals)
+        go_left = getattr(tree, 'missing_go_to_left', np.zeros(tree.node_count, dtype=bool))
+        trees.append({
+            'feature': tree.feature.tolist(),
+            'threshold': [_sklearn_threshold(t) for t in tree.threshold],
+            'left': tree.children_left.tolist(),
+            'right': tree.children_right.tolist(),
+            'missing': np.where(go_left, tree.children_left, tree.children_right).tolist(),
+            'value': value.tolist()
+        })
+    return trees
+
+
+def xgboost_trees(classifier) -> Dict:
+    """Trees and base margin of a binary:logistic XGBoost classifier"""
+
+    model = json.loads(classifier.get_booster().save_raw('json'))['learner']
+    if model['objective']['name'] != 'binary:logistic' or model['gradient_booster']['name'] != 'gbtree':
+        raise ValueError(f"Unsupported XGBoost model: {model['objective']['name']} / {model['gradient_booster']['name']}")
+
+    base_score = float(str(model['learner_model_param']['base_score']).strip('[]'))
+    booster = model['gradient_booster']['model']['trees']
+
+    # predict_proba stops at the best iteration after early stopping
+    best = getattr(classifier, 'best_iteration', None)
+    if best is not None:
+        booster = booster[:best + 1]
+
+    trees = []
+    for tree in booster:
+        if any(tree.get('split_type', [])):
+            raise ValueError("Categorical XGBoost splits are not supported")
+        trees.append({
+            'feature': tree['split_indices'],
+            'threshold': tree['split_conditions'],
+            'left': tree['left_children'],
+            'right': tree['right_children'],
+            'missing': [
+                left if default_left else right
+                for left, right, default_left in zip(tree['left_children'], tree['right_children'], tree['default_left'])
+            ],
+            'value': [[leaf] for leaf in tree['split_conditions']]
+        })
+    return {'trees': trees, 'base': float(np.log(base_score / (1 - base_score)))}
+
+
+def compile_ensembles(waste_classifiers: Dict, quantity_models: Dict,
+                      quality_models: Dict, contamination_models: Dict) -> Dict[str, TreeEnsemble]:
+    """Pack the unpickled model dicts into one TreeEnsemble per group"""
+
+    quality = {}
+    for waste_type, info in quality_models.items():
+        forest = info['model']
+        quality[waste_type] = {
+            'trees': sklearn_trees(forest, normalize=True),
+            'labels': [str(label) for label in info['encoder'].inverse_transform(forest.classes_)]
+        }
+
+    return {
+        'classifiers': TreeEnsemble.from_trees('logistic', {
+            waste_type: xgboost_trees(classifier) for waste_type, classifier in waste_classifiers.items()
+        }),
+        'quantity': TreeEnsemble.from_trees('mean', {
+            waste_type: {'trees': sklearn_trees(model)} for waste_type, model in quantity_models.items()
+        }),
+        'quality': TreeEnsemble.from_trees('vote', quality),
+        'contamination': TreeEnsemble.from_trees('mean', {
+            waste_type: {'trees': sklearn_trees(model)} for waste_type, model in contamination_models.items()
+        })
+    }
+
+
+def export_encoders(encoders: Dict) -> Dict:
+    """Class lists of the LabelEncoders and the StandardScaler's constants"""
+
+    exported = {}
+    for name, encoder in encoders.items():
+        if name == 'scaler':
+            mean, scale = np.atleast_1d(encoder.mean_), np.atleast_1d(encoder.scale_)
+            exported[name] = {
+                'mean': mean.tolist() if encoder.with_mean else np.zeros(len(mean)).tolist(),
+                'scale': scale.tolist() if encoder.with_std else np.ones(len(scale)).tolist()
+            }
+        else:
+            exported[name] = [str(c) for c in encoder.classes_]
+    return exported
@@ -0,0 +1,130 @@
+import json
+import threading
+import numpy as np
+import pandas as pd
+from collections import Counter
+from typing import Dict, List
+
+# Cascade learned by scripts/build_cascade.py, stored with the models
+CASCADE_FILE = 'cascade.json'
+
+# Training facilities a waste type needs in a group to become a candidate
+MIN_SUPPORT = 1
+
+# 'gated' evaluates only candidate classifiers; 'safety' evaluates all of
+# them, returns the full result and counts what the gate would have missed
+CASCADE_MODES = ['off', 'gated', 'safety']
+
+
+class WasteTypeCascade:
+    """
+    First stage of waste type prediction: candidate waste types per
+    (industry, process), learned from the training facilities
+
+    Only the candidates' classifiers need to run. A pair never seen in
+    training falls back to every type seen for its industry, and an
+    unknown industry to all waste types, so the gate only narrows the
+    search where the training data covers the input.
+    """
+
+    def __init__(self, groups: Dict[str, Dict[str, List[str]]], industries: Dict[str, List[str]]):
+        self.groups = groups
+        self.industries = industries
+        self._masks = {}
+        self._lock = threading.Lock()
+        self.reset_stats()
+
+    @classmethod
+    def learn(cls, df: pd.DataFrame, min_support: int = MIN_SUPPORT) -> 'WasteTypeCascade':
+        """Cascade from training rows (industry, process, waste_streams JSON)"""
+
+        group_counts, industry_types = {}, {}
+        for industry, process, streams in zip(df['industry'].str.lower(), df['process'].str.lower(),
+                                              df['waste_streams']):
+            types = {stream['type'] for stream in json.loads(streams)}
+            group_counts.setdefault(industry, {}).setdefault(process, Counter()).update(types)
+            industry_types.setdefault(industry, set()).update(types)
+
+        groups = {
+            industry: {
+                process: sorted(t for t, count in counts.items() if count >= min_support)
+                for process, counts in sorted(processes.items())
+            }
+            for industry, processes in sorted(group_counts.items())
+        }
+        industries = {industry: sorted(types) for industry, types in sorted(industry_types.items())}
+        return cls(groups, industries)
+
+    def save(self, path: str):
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump({'groups': self.groups, 'industries': self.industries}, f, indent=2)
+
+    @classmethod
+    def load(cls, path: str) -> 'WasteTypeCascade':
+        with open(path, encoding='utf-8') as f:
+            spec = json.load(f)
+        return cls(spec['groups'], spec['industries'])
+
+    def candidates(self, industry: str, process: str) -> List[str]:
+        """Candidate waste types for one facility, or None for all of them"""
+
+        processes = self.groups.get(industry)
+        if processes is None:
+            return None
+        return processes.get(process, self.industries[industry])
+
+    def compile(self, industry_classes: List[str], process_classes: List[str], waste_types: List[str]):
+        """Index candidates by encoded industry / process against the classifier order"""
+
+        position = {waste_type: i for i, waste_type in enumerate(waste_types)}
+        self._num_types = len(waste_types)
+        self._masks = {}
+        for i, industry in enumerate(industry_classes):
+            for p, process in enumerate(process_classes):
+                types = self.candidates(industry, process)
+                if types is None:
+                    continue
+                mask = np.zeros(len(waste_types), dtype=bool)
+                mask[[position[t] for t in types if t in position]] = True
+                self._masks[i, p] = mask
+
+    def mask(self, features: np.ndarray) -> np.ndarray:
+        """(rows, waste types) candidate mask for an encoded feature matrix"""
+
+        everything = np.ones(self._num_types, dtype=bool)
+        return np.array([
+            self._masks.get((int(industry), int(process)), everything)
+            for industry, process in zip(features[:, 0], features[:, 2])
+        ], dtype=bool).reshape(len(features), self._num_types)
+
+    def record(self, mask: np.ndarray, evaluated: int, missed: Dict[str, int]):
+        """Count one batch: rows, classifier calls made, types the gate missed"""
+
+        with self._lock:
+            self.rows += len(mask)
+            self.evaluated += evaluated
+            self.candidate_calls += int(mask.sum())
+            self.full_calls += mask.size
+            for waste_type, count in missed.items():
+                self.missed[waste_type] += count
+                self.disagreements += count
+
+    def reset_stats(self):
+        self.rows = 0
+        self.evaluated = 0
+        self.candidate_calls = 0
+        self.full_calls = 0
+        self.disagreements = 0
+        self.missed = Counter()
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {
+                'rows': self.rows,
+                'classifier_calls': self.evaluated,
+                'candidate_calls': self.candidate_calls,
+                'full_calls': self.full_calls,
+                'reduction': round(self.full_calls / self.candidate_calls, 2) if self.candidate_calls else None,
+                'disagreements': self.disagreements,
+                'missed_types': dict(self.missed.most_common())
+            }
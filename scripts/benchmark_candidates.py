@@ -0,0 +1,99 @@
+#File: scripts/benchmark_candidates.py
+# Compares candidate generators against a full scan: candidates scored per
+# request, time, and recall of the full-scan top-k.
+# Usage: python scripts/benchmark_candidates.py
+
+import contextlib
+import io
+import os
+import sys
+import time
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from lib.buyer_database import BuyerDatabase
+from lib.buyer_table import QUALITY_HIERARCHY
+from lib.candidates import NearestCandidates, IndexCandidates, default_candidates
+from lib.graph_matching import GraphMatcher
+
+BUYERS_CSV = "data/waste_buyers_india_updated_cities.csv"
+NUM_BUYERS = 200_000
+NUM_PROFILES = 30
+K = 10
+
+GENERATORS = {
+    'nearest 256': NearestCandidates(k=256),
+    'nearest 2000': NearestCandidates(k=2000),
+    'index hits': IndexCandidates(),
+    'index hits <= 800 km': IndexCandidates(max_distance_km=800),
+    'default': default_candidates()
+}
+
+
+def synthetic_database(rng):
+    """The sample buyers resampled to NUM_BUYERS, spread over India"""
+
+    db = BuyerDatabase(BUYERS_CSV)
+    df = db.df.iloc[rng.integers(0, len(db.df), NUM_BUYERS)].reset_index(drop=True)
+    df['lat'] = rng.uniform(8, 34, NUM_BUYERS)
+    df['lng'] = rng.uniform(68, 97, NUM_BUYERS)
+    df['buyer_id'] = [f"B{i + 1:03d}" for i in range(NUM_BUYERS)]
+    db._build_indexes(df)
+    return db
+
+
+def synthetic_profile(db, rng):
+    """1-4 streams of types some buyer accepts, at a random facility"""
+
+    streams = []
+    for _ in range(rng.integers(1, 5)):
+        buyer = db.snapshot.record(int(rng.integers(db.snapshot.size)))
+        low = float(rng.uniform(0.5, 200))
+        streams.append({
+            'type': str(rng.choice(buyer['accepted_waste_types'])),
+            'category': str(rng.choice(buyer['accepted_categories'])),
+            'quantity_min_tons': low,
+            'quantity_max_tons': low * 1.5,
+            'quality_grade': str(rng.choice(list(QUALITY_HIERARCHY))),
+            'hazard_class': 'Hazardous - Class 2' if rng.random() < 0.2 else 'Non-hazardous'
+        })
+    return {
+        'waste_streams': streams,
+        'location': {'lat': float(rng.uniform(10, 32)), 'lng': float(rng.uniform(70, 95))}
+    }
+
+
+def top_ids(matcher, profile):
+    with contextlib.redirect_stdout(io.StringIO()):
+        start = time.perf_counter()
+        matches = matcher.find_optimal_matches(profile, K)
+        elapsed = time.perf_counter() - start
+    return [m['id'] for m in matches], elapsed, matcher.search_stats['candidates']
+
+
+if __name__ == "__main__":
+    rng = np.random.default_rng(19)
+    db = synthetic_database(rng)
+    profiles = [synthetic_profile(db, rng) for _ in range(NUM_PROFILES)]
+
+    full = GraphMatcher(db)
+    expected = [top_ids(full, profile) for profile in profiles]
+    full_ms = np.mean([elapsed for _, elapsed, _ in expected]) * 1000
+
+    print(f"{NUM_BUYERS:,} buyers, {NUM_PROFILES} facilities, top-{K}\n")
+    print(f"{'generator':<26} {'candidates':>11} {'ms':>8} {'recall':>8} {'exact':>7}")
+    print(f"{'full scan':<26} {NUM_BUYERS:>11,} {full_ms:>8.1f} {1:>8.3f} {1:>7.2f}")
+
+    for label, generator in GENERATORS.items():
+        matcher = GraphMatcher(db, candidates=generator)
+        found = [top_ids(matcher, profile) for profile in profiles]
+
+        recall = np.mean([
+            len(set(ids) & set(exact)) / max(len(exact), 1)
+            for (ids, _, _), (exact, _, _) in zip(found, expected)
+        ])
+        identical = np.mean([ids == exact for (ids, _, _), (exact, _, _) in zip(found, expected)])
+        candidates = np.mean([count for _, _, count in found])
+        ms = np.mean([elapsed for _, elapsed, _ in found]) * 1000
+        print(f"{label:<26} {candidates:>11,.0f} {ms:>8.1f} {recall:>8.3f} {identical:>7.2f}")
@@ -0,0 +1,55 @@
+#File: scripts/benchmark_predictor.py
+# Compares the original per-row predictor (pickled sklearn / XGBoost models,
+# no cascade) against WastePredictor.predict_batch on the fastest available
+# models: rows per second at batch sizes 1, 100 and 10k, and a check that
+# both return the same profiles.
+# Usage: python scripts/benchmark_predictor.py
+
+import os
+import sys
+import time
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from lib.ml_inference import WastePredictor
+
+TRAINING_CSV = "data/training_data.csv"
+BATCH_SIZES = [1, 100, 10_000]
+
+# Rows timed with the per-row loop; larger batches are extrapolated
+LOOP_SAMPLE = 200
+
+INPUT_COLUMNS = ['industry', 'product', 'process', 'machinery', 'scale', 'units_per_month']
+
+
+def facility_inputs(n):
+    """n facility inputs, cycling through the training facilities"""
+
+    df = pd.read_csv(TRAINING_CSV, usecols=INPUT_COLUMNS)
+    records = df.to_dict('records')
+    return [dict(records[i % len(records)]) for i in range(n)]
+
+
+if __name__ == "__main__":
+    # predict() itself goes through predict_batch with compiled models, so
+    # the reference is a separate predictor on the pickles
+    reference = WastePredictor(cascade_mode='off', use_compiled=False)
+    predictor = WastePredictor(cascade_mode='off')
+    inputs = facility_inputs(max(BATCH_SIZES))
+
+    print(f"{'batch':>7} {'predict rows/s':>15} {'batch rows/s':>13} {'speedup':>8}")
+    for size in BATCH_SIZES:
+        batch = inputs[:size]
+
+        sample = batch[:LOOP_SAMPLE]
+        start = time.perf_counter()
+        expected = [reference.predict(facility) for facility in sample]
+        loop_rate = len(sample) / (time.perf_counter() - start)
+
+        start = time.perf_counter()
+        profiles = predictor.predict_batch(batch)
+        batch_rate = size / (time.perf_counter() - start)
+
+        assert profiles[:len(sample)] == expected, "predict_batch differs from the per-row pickle path"
+        print(f"{size:>7,} {loop_rate:>15,.0f} {batch_rate:>13,.0f} {batch_rate / loop_rate:>7.1f}x")
@@ -0,0 +1,62 @@
+#File: scripts/benchmark_spatial_index.py
+# Compares GridIndex radius / nearest queries with a full haversine scan.
+# Usage: python scripts/benchmark_spatial_index.py
+
+import os
+import sys
+import time
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from lib.spatial_index import GridIndex, haversine_km
+
+NUM_BUYERS = 1_000_000
+NUM_QUERIES = 50
+RADII_KM = [50, 200, 500]
+K = 10
+
+
+def average_ms(fn, queries):
+    start = time.perf_counter()
+    results = [fn(lat, lng) for lat, lng in queries]
+    return (time.perf_counter() - start) / len(queries) * 1000, results
+
+
+if __name__ == "__main__":
+    rng = np.random.default_rng(7)
+
+    # Buyers spread over India's bounding box
+    lat = rng.uniform(8, 34, NUM_BUYERS)
+    lng = rng.uniform(68, 97, NUM_BUYERS)
+    queries = list(zip(rng.uniform(10, 32, NUM_QUERIES), rng.uniform(70, 95, NUM_QUERIES)))
+
+    start = time.perf_counter()
+    index = GridIndex(lat, lng)
+    print(f"Built grid over {NUM_BUYERS:,} buyers in {(time.perf_counter() - start) * 1000:.0f} ms")
+
+    print(f"\n{'query':>14} {'scan ms':>9} {'index ms':>9} {'speedup':>8} {'avg hits':>9}")
+
+    for radius in RADII_KM:
+        scan_ms, expected = average_ms(
+            lambda a, b: np.flatnonzero(haversine_km(a, b, lat, lng) <= radius), queries
+        )
+        index_ms, found = average_ms(lambda a, b: index.within_radius(a, b, radius), queries)
+
+        assert all(np.array_equal(e, f) for e, f in zip(expected, found))
+        hits = np.mean([len(f) for f in found])
+        print(f"{f'radius {radius} km':>14} {scan_ms:>9.2f} {index_ms:>9.2f} "
+              f"{scan_ms / index_ms:>7.1f}x {hits:>9.0f}")
+
+    def scan_nearest(a, b):
+        distances = haversine_km(a, b, lat, lng)
+        top = np.argpartition(distances, K)[:K]
+        return top[np.lexsort((top, distances[top]))]
+
+    scan_ms, expected = average_ms(scan_nearest, queries)
+    index_ms, found = average_ms(lambda a, b: index.nearest(a, b, K)[0], queries)
+
+    assert all(np.array_equal(e, f) for e, f in zip(expected, found))
+    print(f"{f'{K} nearest':>14} {scan_ms:>9.2f} {index_ms:>9.2f} {scan_ms / index_ms:>7.1f}x {K:>9}")
+
+    print("\n✅ Index results identical to the full scan")
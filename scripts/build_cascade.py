@@ -0,0 +1,59 @@
+#File: scripts/build_cascade.py
+# Learns the industry / process -> candidate waste type cascade from the
+# training data (model_dir/cascade.json), then runs WastePredictor in safety
+# mode over the training facilities to report classifier calls saved and
+# waste types the gate would have missed.
+# Usage: python scripts/build_cascade.py [training_data.csv] [model_dir]
+
+import contextlib
+import io
+import os
+import sys
+import time
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+import lib.ml_inference as ml_inference
+from lib.ml_inference import WastePredictor
+from lib.waste_cascade import CASCADE_FILE, WasteTypeCascade
+
+TRAINING_CSV = "data/training_data.csv"
+INPUT_COLUMNS = ['industry', 'product', 'process', 'machinery', 'scale', 'units_per_month']
+
+
+if __name__ == "__main__":
+    csv_path = sys.argv[1] if len(sys.argv) > 1 else TRAINING_CSV
+    if len(sys.argv) > 2:
+        ml_inference.model_dir = sys.argv[2]
+    cascade_path = os.path.join(ml_inference.model_dir, CASCADE_FILE)
+    df = pd.read_csv(csv_path)
+
+    cascade = WasteTypeCascade.learn(df)
+    cascade.save(cascade_path)
+    sizes = [len(types) for processes in cascade.groups.values() for types in processes.values()]
+    print(f"Learned {len(sizes)} industry/process groups from {len(df):,} facilities "
+          f"({min(sizes)}-{max(sizes)} candidate types each) into {cascade_path}")
+
+    inputs = df[INPUT_COLUMNS].to_dict('records')
+    timings = {}
+    for mode in ['off', 'gated', 'safety']:
+        predictor = WastePredictor(cascade_mode=mode)
+        with contextlib.redirect_stdout(io.StringIO()):
+            start = time.perf_counter()
+            predictor.predict_batch(inputs)
+            timings[mode] = time.perf_counter() - start
+            start = time.perf_counter()
+            for facility_input in inputs[:100]:
+                predictor.predict(facility_input)
+            timings[mode, 'predict'] = (time.perf_counter() - start) / 100
+        if mode == 'safety':
+            stats = predictor.cascade.stats()
+
+    print(f"Classifier calls: {stats['candidate_calls']:,} gated vs {stats['full_calls']:,} "
+          f"({stats['reduction']}x fewer)")
+    print(f"Gate disagreements: {stats['disagreements']}" +
+          (f" {stats['missed_types']}" if stats['missed_types'] else ''))
+    for mode in ['off', 'gated']:
+        print(f"  {mode:<6} predict {timings[mode, 'predict'] * 1000:7.2f} ms   "
+              f"batch of {len(inputs):,} {timings[mode] * 1000:8.0f} ms")
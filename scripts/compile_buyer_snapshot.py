@@ -0,0 +1,28 @@
+#File: scripts/compile_buyer_snapshot.py
+# Compiles the buyer CSV into a memory-mapped binary snapshot for fast startup.
+# Usage: python scripts/compile_buyer_snapshot.py [buyers.csv] [snapshot_dir]
+
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from lib.buyer_database import BuyerDatabase
+
+DEFAULT_CSV = "data/waste_buyers_india_updated_cities.csv"
+DEFAULT_SNAPSHOT = "data/waste_buyers.snapshot"
+
+
+if __name__ == "__main__":
+    csv_path = sys.argv[1] if len(sys.argv) > 1 else DEFAULT_CSV
+    snapshot_path = sys.argv[2] if len(sys.argv) > 2 else DEFAULT_SNAPSHOT
+
+    start = time.perf_counter()
+    db = BuyerDatabase.compile_snapshot(csv_path, snapshot_path)
+    print(f"Compiled {db.snapshot.size:,} buyers into {snapshot_path} "
+          f"in {(time.perf_counter() - start) * 1000:.0f} ms")
+
+    start = time.perf_counter()
+    BuyerDatabase(snapshot_path).snapshot
+    print(f"Snapshot opens in {(time.perf_counter() - start) * 1000:.1f} ms")
@@ -0,0 +1,94 @@
+#File: scripts/compile_models.py
+# Compiles the pickled XGBoost / scikit-learn models into NumPy node arrays
+# (models/compiled) that WastePredictor evaluates without either library,
+# then checks the compiled predictions against the originals.
+# Usage: python scripts/compile_models.py [model_dir]
+
+import os
+import pickle
+import sys
+import time
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from lib.tree_ensemble import load_compiled_models, save_compiled_models, source_digests
+from lib.tree_export import compile_ensembles, export_encoders
+
+TRAINING_CSV = "data/training_data.csv"
+TOLERANCE = 1e-5
+
+
+def load_pickles(model_dir):
+    models = {}
+    for name in ['encoders', 'waste_type_classifiers', 'quantity_models', 'quality_models', 'contamination_models']:
+        with open(os.path.join(model_dir, name + '.pkl'), 'rb') as f:
+            models[name] = pickle.load(f)
+    return models
+
+
+def training_features(encoders):
+    """Encoded feature matrix of the training facilities (as in WastePredictor)"""
+
+    df = pd.read_csv(TRAINING_CSV)
+    columns = {name: encoders[name].transform(df[name].str.lower()) for name in
+               ['industry', 'product', 'process', 'machinery', 'scale']}
+    units = encoders['scaler'].transform(df[['units_per_month']].values)[:, 0]
+    return np.column_stack([
+        columns['industry'], columns['product'], columns['process'], columns['machinery'], columns['scale'],
+        units, columns['industry'] * 100 + columns['process'], columns['process'] * 100 + columns['machinery']
+    ])
+
+
+def check(models, compiled, X):
+    """Largest deviation of each compiled group from the original models"""
+
+    ensembles = compiled['ensembles']
+    report = {}
+
+    classifiers = ensembles['classifiers']
+    expected = np.column_stack([models['waste_type_classifiers'][name].predict_proba(X)[:, 1]
+                                for name in classifiers.names])
+    report['classifiers'] = np.abs(classifiers.predict(X) - expected).max()
+
+    for group, key in [('quantity', 'quantity_models'), ('contamination', 'contamination_models')]:
+        ensemble = ensembles[group]
+        expected = np.column_stack([models[key][name].predict(X) for name in ensemble.names])
+        scale = np.maximum(np.abs(expected), 1)
+        report[group] = (np.abs(ensemble.predict(X) - expected) / scale).max()
+
+    quality = ensembles['quality']
+    expected = np.column_stack([
+        models['quality_models'][name]['encoder'].inverse_transform(models['quality_models'][name]['model'].predict(X))
+        for name in quality.names
+    ])
+    report['quality'] = np.mean(quality.predict(X) != expected)
+
+    return report
+
+
+if __name__ == "__main__":
+    model_dir = sys.argv[1] if len(sys.argv) > 1 else "models"
+    compiled_path = os.path.join(model_dir, 'compiled')
+
+    start = time.perf_counter()
+    models = load_pickles(model_dir)
+    ensembles = compile_ensembles(models['waste_type_classifiers'], models['quantity_models'],
+                                  models['quality_models'], models['contamination_models'])
+    save_compiled_models(compiled_path, ensembles, export_encoders(models['encoders']), source_digests(model_dir))
+    print(f"Compiled models into {compiled_path} in {(time.perf_counter() - start) * 1000:.0f} ms")
+    for group, ensemble in ensembles.items():
+        print(f"  {group:<14} {len(ensemble.names):>3} models {int(ensemble.n_trees.sum()):>6} trees "
+              f"{len(ensemble.left):>8,} nodes")
+
+    compiled = load_compiled_models(compiled_path)
+    report = check(models, compiled, training_features(models['encoders']))
+    for group, error in report.items():
+        label = 'mismatched labels' if group == 'quality' else 'max error'
+        print(f"  {group:<14} {label}: {error:.2e}")
+
+    if max(report.values()) > TOLERANCE:
+        print(f"⚠️ Compiled predictions differ from the originals by more than {TOLERANCE}")
+        sys.exit(1)
+    print("✅ Compiled predictions match the originals")
@@ -0,0 +1,25 @@
+#File: scripts/import_buyers_sqlite.py
+# Imports the buyer CSV into a local SQLite registry (see lib/buyer_store.py).
+# Usage: python scripts/import_buyers_sqlite.py [buyers.csv] [buyers.db]
+
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from lib.buyer_store import BuyerStore
+
+DEFAULT_CSV = "data/waste_buyers_india_updated_cities.csv"
+DEFAULT_DB = "data/waste_buyers.db"
+
+
+if __name__ == "__main__":
+    csv_path = sys.argv[1] if len(sys.argv) > 1 else DEFAULT_CSV
+    db_path = sys.argv[2] if len(sys.argv) > 2 else DEFAULT_DB
+
+    if os.path.exists(db_path):
+        sys.exit(f"{db_path} already exists; remove it to re-import")
+
+    store = BuyerStore(db_path)
+    store.import_csv(csv_path)
+    print(f"✅ {len(store.search())} buyers in {db_path}")
@@ -0,0 +1,44 @@
+#File: scripts/publish_buyer_snapshot.py
+# Publishes the buyer source as a new shared snapshot generation that every
+# API worker attaches to read-only (BuyerSnapshotManager shared_root).
+# Usage: python scripts/publish_buyer_snapshot.py [source] [shared_root] [--watch]
+
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from lib.buyer_database import BuyerDatabase, source_signature
+from lib.buyer_snapshots import publish_snapshot, latest_generation
+
+DEFAULT_SOURCE = "data/waste_buyers_india_updated_cities.csv"
+DEFAULT_SHARED_ROOT = "data/waste_buyers.shared"
+POLL_SECONDS = 2.0
+
+
+def published_signature(shared_root):
+    """Source signature the newest generation was compiled from"""
+    path = latest_generation(shared_root)[1]
+    return BuyerDatabase(path).source_signature if path else None
+
+
+if __name__ == "__main__":
+    args = [arg for arg in sys.argv[1:] if arg != '--watch']
+    source = args[0] if len(args) > 0 else DEFAULT_SOURCE
+    shared_root = args[1] if len(args) > 1 else DEFAULT_SHARED_ROOT
+
+    start = time.perf_counter()
+    generation = publish_snapshot(source, shared_root)
+    if generation is None:
+        print(f"⚠️ Another process is publishing to {shared_root}")
+    else:
+        print(f"Generation {generation} published in {(time.perf_counter() - start) * 1000:.0f} ms")
+
+    # Loader mode: publish again whenever the source changes
+    while '--watch' in sys.argv:
+        time.sleep(POLL_SECONDS)
+        if source_signature(source) != published_signature(shared_root):
+            generation = publish_snapshot(source, shared_root)
+            if generation is not None:
+                print(f"Generation {generation} published")
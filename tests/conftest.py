@@ -0,0 +1,146 @@
+import json
+import os
+import pickle
+import shutil
+import sys
+import numpy as np
+import pandas as pd
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from lib.buyer_database import BuyerDatabase
+
+DATA_DIR = os.path.join(os.path.dirname(__file__), '..', 'data')
+BUYERS_CSV = os.path.join(DATA_DIR, 'waste_buyers_india_updated_cities.csv')
+TRAINING_CSV = os.path.join(DATA_DIR, 'training_data.csv')
+
+# Facilities from the training data used as match queries
+NUM_PROFILES = 60
+
+# Buyers in the resampled table used where pruning needs a larger search space
+NUM_LARGE_BUYERS = 3000
+
+# Trees per model in the test models (scripts/train_model.py trains 50-100)
+TEST_TREES = 10
+
+
+def as_json(value) -> str:
+    """Canonical JSON, so 0 and 0.0 or reordered keys count as different output"""
+    return json.dumps(value, sort_keys=True)
+
+
+@pytest.fixture(scope='session')
+def training_df() -> pd.DataFrame:
+    return pd.read_csv(TRAINING_CSV)
+
+
+@pytest.fixture
+def buyer_db() -> BuyerDatabase:
+    return BuyerDatabase(BUYERS_CSV)
+
+
+@pytest.fixture
+def large_buyer_db(tmp_path) -> BuyerDatabase:
+    """The buyer CSV resampled to NUM_LARGE_BUYERS buyers spread across India"""
+
+    rng = np.random.default_rng(0)
+    df = pd.read_csv(BUYERS_CSV)
+    df = df.iloc[rng.integers(0, len(df), NUM_LARGE_BUYERS)].reset_index(drop=True)
+    df['lat'] = rng.uniform(8, 34, len(df))
+    df['lng'] = rng.uniform(68, 97, len(df))
+    df['buyer_id'] = [f"B{i + 1:04d}" for i in range(len(df))]
+    path = tmp_path / 'buyers.csv'
+    df.to_csv(path, index=False)
+    return BuyerDatabase(str(path))
+
+
+@pytest.fixture(scope='session')
+def profiles(training_df):
+    """Training facilities' waste streams at random locations across India"""
+
+    rng = np.random.default_rng(0)
+    return [
+        {
+            'waste_streams': json.loads(streams),
+            'location': {'name': 'Test', 'lat': float(rng.uniform(8, 34)), 'lng': float(rng.uniform(68, 97))}
+        }
+        for streams in training_df['waste_streams'][:NUM_PROFILES]
+    ]
+
+
+def training_features(df: pd.DataFrame, encoders) -> np.ndarray:
+    """Feature matrix of the training facilities, as scripts/train_model.py builds it"""
+
+    columns = {name: encoders[name].transform(df[name]) for name in
+               ['industry', 'product', 'process', 'machinery', 'scale']}
+    units = encoders['scaler'].transform(df[['units_per_month']].values)[:, 0]
+    return np.column_stack([
+        columns['industry'], columns['product'], columns['process'], columns['machinery'], columns['scale'],
+        units, columns['industry'] * 100 + columns['process'], columns['process'] * 100 + columns['machinery']
+    ])
+
+
+@pytest.fixture(scope='session')
+def trained_model_dir(training_df, tmp_path_factory):
+    """Small versions of the five pickled model sets, trained like scripts/train_model.py"""
+
+    xgb = pytest.importorskip('xgboost')
+    ensemble = pytest.importorskip('sklearn.ensemble')
+    preprocessing = pytest.importorskip('sklearn.preprocessing')
+
+    encoders = {name: preprocessing.LabelEncoder().fit(training_df[name])
+                for name in ['industry', 'product', 'process', 'machinery', 'scale']}
+    encoders['scaler'] = preprocessing.StandardScaler().fit(training_df[['units_per_month']].values)
+    X = training_features(training_df, encoders)
+
+    streams = [json.loads(s) for s in training_df['waste_streams']]
+    waste_types = sorted({waste['type'] for row in streams for waste in row})
+    models = {'encoders': encoders, 'waste_type_classifiers': {}, 'quantity_models': {},
+              'quality_models': {}, 'contamination_models': {}}
+    for waste_type in waste_types:
+        y = np.array([any(waste['type'] == waste_type for waste in row) for row in streams], dtype=int)
+        models['waste_type_classifiers'][waste_type] = xgb.XGBClassifier(
+            n_estimators=TEST_TREES, max_depth=4, learning_rate=0.3, random_state=42
+        ).fit(X, y)
+
+        rows = [(i, waste) for i, row in enumerate(streams) for waste in row if waste['type'] == waste_type]
+        if len(rows) <= 10:
+            continue
+        X_type = X[[i for i, _ in rows]]
+        models['quantity_models'][waste_type] = ensemble.RandomForestRegressor(
+            n_estimators=TEST_TREES, max_depth=6, random_state=42
+        ).fit(X_type, [(waste['quantity_min_tons'] + waste['quantity_max_tons']) / 2 for _, waste in rows])
+        quality_encoder = preprocessing.LabelEncoder()
+        quality = quality_encoder.fit_transform([waste['quality_grade'] for _, waste in rows])
+        models['quality_models'][waste_type] = {
+            'model': ensemble.RandomForestClassifier(n_estimators=TEST_TREES, random_state=42).fit(X_type, quality),
+            'encoder': quality_encoder
+        }
+        models['contamination_models'][waste_type] = ensemble.RandomForestRegressor(
+            n_estimators=TEST_TREES, random_state=42
+        ).fit(X_type, [waste['contamination_pct'] for _, waste in rows])
+
+    path = tmp_path_factory.mktemp('trained_models')
+    for name, value in models.items():
+        with open(path / f'{name}.pkl', 'wb') as f:
+            pickle.dump(value, f)
+    return path
+
+
+@pytest.fixture
+def model_dir(trained_model_dir, tmp_path, monkeypatch):
+    """A private copy of the trained models, set as lib.ml_inference.model_dir"""
+
+    import lib.ml_inference as ml_inference
+
+    path = tmp_path / 'models'
+    shutil.copytree(trained_model_dir, path)
+    monkeypatch.setattr(ml_inference, 'model_dir', str(path))
+    return path
+
+
+@pytest.fixture(scope='session')
+def facility_inputs(training_df):
+    columns = ['industry', 'product', 'process', 'machinery', 'scale', 'units_per_month']
+    return training_df[columns].to_dict('records')
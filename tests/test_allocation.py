@@ -0,0 +1,53 @@
+import numpy as np
+import pytest
+from lib.allocation import allocate_capacity
+
+linprog = pytest.importorskip('scipy.optimize').linprog
+
+
+def random_instance(rng, num_streams=4, num_buyers=30):
+    buyers = [np.sort(rng.choice(num_buyers, rng.integers(1, num_buyers), replace=False))
+              for _ in range(num_streams)]
+    offsets = np.concatenate([[0], np.cumsum([len(b) for b in buyers])])
+    buyer_index = np.concatenate(buyers)
+    scores = rng.uniform(0.3, 1.0, len(buyer_index))
+    supply = rng.uniform(5, 50, num_streams)
+    capacity = rng.uniform(1, 20, num_buyers)
+    capacity[rng.random(num_buyers) < 0.1] = np.nan
+    return offsets, buyer_index, scores, supply, capacity
+
+
+def reference_optimum(offsets, buyer_index, scores, supply, capacity):
+    """(max tons shipped, max score-weighted tons at that tonnage) by linear programming"""
+
+    num_edges = len(buyer_index)
+    stream_of = np.searchsorted(offsets, np.arange(num_edges), side='right') - 1
+    rows = [stream_of == i for i in range(len(supply))]
+    bounds = list(supply)
+    for j in np.unique(buyer_index):
+        if np.isfinite(capacity[j]):
+            rows.append(buyer_index == j)
+            bounds.append(capacity[j])
+    A = np.array(rows, dtype=np.float64)
+
+    shipped = -linprog(-np.ones(num_edges), A_ub=A, b_ub=bounds).fun
+    weighted = -linprog(-scores, A_ub=A, b_ub=bounds, A_eq=np.ones((1, num_edges)), b_eq=[shipped]).fun
+    return shipped, weighted
+
+
+@pytest.mark.parametrize('seed', range(20))
+def test_allocation_matches_linear_program(seed):
+    offsets, buyer_index, scores, supply, capacity = random_instance(np.random.default_rng(seed))
+    result = allocate_capacity(offsets, buyer_index, scores, supply, capacity)
+    edges, tons = result['edges'], result['tons']
+
+    stream_of = np.searchsorted(offsets, edges, side='right') - 1
+    shipped_per_stream = np.bincount(stream_of, tons, minlength=len(supply))
+    assert np.all(shipped_per_stream <= supply + 1e-6)
+    assert np.allclose(shipped_per_stream + result['unallocated'], supply)
+    received = np.bincount(buyer_index[edges], tons, minlength=len(capacity))
+    assert np.all(received <= np.nan_to_num(capacity, nan=np.inf) + 1e-6)
+
+    shipped, weighted = reference_optimum(offsets, buyer_index, scores, supply, capacity)
+    assert tons.sum() == pytest.approx(shipped, rel=1e-6)
+    assert (scores[edges] * tons).sum() == pytest.approx(weighted, rel=1e-6)
@@ -0,0 +1,33 @@
+import os
+import pytest
+from lib.atomic_dir import atomic_replace_dir
+
+
+def write_file(name, text):
+    def write(tmp_path):
+        with open(os.path.join(tmp_path, name), 'w') as f:
+            f.write(text)
+    return write
+
+
+def test_replaces_the_directory(tmp_path):
+    path = str(tmp_path / 'out')
+    atomic_replace_dir(path, write_file('a.txt', 'first'))
+    atomic_replace_dir(path, write_file('b.txt', 'second'))
+
+    assert os.listdir(path) == ['b.txt']
+    assert os.listdir(tmp_path) == ['out']
+
+
+def test_failed_write_keeps_the_old_directory(tmp_path):
+    path = str(tmp_path / 'out')
+    atomic_replace_dir(path, write_file('a.txt', 'first'))
+
+    def broken(tmp_path):
+        write_file('b.txt', 'partial')(tmp_path)
+        raise OSError('disk full')
+
+    with pytest.raises(OSError, match='disk full'):
+        atomic_replace_dir(path, broken)
+    assert os.listdir(path) == ['a.txt']
+    assert os.listdir(tmp_path) == ['out']
@@ -0,0 +1,125 @@
+import itertools
+import threading
+import numpy as np
+import pandas as pd
+from conftest import BUYERS_CSV
+
+
+def test_add_buyer_replaces_the_snapshot(buyer_db):
+    before = buyer_db.snapshot
+    size = before.size
+    buyer = pd.read_csv(BUYERS_CSV).iloc[0].to_dict()
+    waste_type = buyer['accepted_waste_types'].split(',')[0].strip()
+    buyer_db.add_buyer(dict(buyer, buyer_id='B999', lat=buyer['lat'] + 0.5))
+
+    after = buyer_db.snapshot
+    assert after is not before
+    assert before.size == size and size not in before.type_index[waste_type]
+    assert after.size == size + 1 and size in after.type_index[waste_type]
+    assert after.records_at(np.array([size]))[0]['buyer_id'] == 'B999'
+    assert buyer_db.nearest_buyers(buyer['lat'] + 0.5, buyer['lng'], k=1)[0]['buyer_id'] == 'B999'
+
+
+def new_buyer(i):
+    buyer = pd.read_csv(BUYERS_CSV).iloc[0].to_dict()
+    return dict(buyer, buyer_id=f'N{i:03d}', lat=buyer['lat'] + 0.01 * (i + 1))
+
+
+def test_snapshot_built_during_add_buyer_is_not_kept(buyer_db, monkeypatch):
+    from lib import buyer_database
+
+    size = len(buyer_db.df)
+    building, release = threading.Event(), threading.Event()
+    from_frame = buyer_database.BuyerTable.from_frame
+
+    def slow_from_frame(df, **indexes):
+        building.set()
+        release.wait()
+        return from_frame(df, **indexes)
+
+    monkeypatch.setattr(buyer_database.BuyerTable, 'from_frame', slow_from_frame)
+    result = {}
+    reader = threading.Thread(target=lambda: result.update(table=buyer_db.snapshot))
+    reader.start()
+    building.wait()
+    buyer_db.add_buyer(new_buyer(0))
+    release.set()
+    reader.join()
+
+    # The reader gets the buyers it started from, later readers the new row
+    assert result['table'].size == size
+    assert buyer_db.snapshot.size == size + 1
+    assert buyer_db.snapshot.record(size)['buyer_id'] == 'N000'
+
+
+def test_concurrent_readers_see_consistent_snapshots(buyer_db):
+    size = len(buyer_db.df)
+    added = 40
+    errors = []
+    done = threading.Event()
+
+    def read():
+        while not done.is_set():
+            try:
+                table = buyer_db.snapshot
+                for rows in list(table.type_index.values()) + list(table.category_index.values()):
+                    assert len(rows) == 0 or rows[-1] < table.size
+                buyers = buyer_db.nearest_buyers(0, 0, k=5)
+                assert len(buyers) == 5
+                buyer_db.search_buyers(waste_type='metal_scrap_steel', location={'lat': 20, 'lng': 78},
+                                       max_distance_km=2000)
+            except Exception as e:
+                errors.append(e)
+                return
+
+    readers = [threading.Thread(target=read) for _ in range(4)]
+    for reader in readers:
+        reader.start()
+    for i in range(added):
+        buyer_db.add_buyer(new_buyer(i))
+    done.set()
+    for reader in readers:
+        reader.join()
+
+    assert not errors
+    table = buyer_db.snapshot
+    assert table.size == size + added
+    assert [table.record(size + i)['buyer_id'] for i in range(added)] == [f'N{i:03d}' for i in range(added)]
+    assert len(buyer_db.spatial_index.within_radius(0, 0, 20000)) == size + added
+
+
+def scan_rows(df, waste_type, category=None):
+    """candidate_rows as the DataFrame filters it replaced"""
+    accepts = df['accepted_waste_types'].apply(lambda x: waste_type in x)
+    if category:
+        accepts |= df['accepted_categories'].apply(lambda x: category in x)
+    return np.flatnonzero(accepts.to_numpy())
+
+
+def test_candidate_rows_match_the_scan(buyer_db, large_buyer_db):
+    for db in [buyer_db, large_buyer_db]:
+        df = db.df
+        waste_types = sorted(set().union(*df['accepted_waste_types'])) + ['no_such_type']
+        categories = sorted(set().union(*df['accepted_categories'])) + ['no_such_category', None]
+        for waste_type in waste_types:
+            assert np.array_equal(db.candidate_rows(waste_type), scan_rows(df, waste_type))
+        for waste_type, category in itertools.product(waste_types, categories):
+            assert np.array_equal(db.candidate_rows(waste_type, category), scan_rows(df, waste_type, category))
+        for category in categories[:-1]:
+            expected = np.flatnonzero(df['accepted_categories'].apply(lambda x: category in x).to_numpy())
+            assert np.array_equal(db.category_index.get(category, []), expected)
+
+
+def test_add_buyer_indexes_new_types(buyer_db):
+    buyer = pd.read_csv(BUYERS_CSV).iloc[0].to_dict()
+    row = len(buyer_db.df)
+    buyer_db.add_buyer(dict(buyer, buyer_id='B999', accepted_waste_types='graphene_offcuts, graphene_offcuts, ' +
+                            buyer['accepted_waste_types'], accepted_categories='nanomaterial'))
+
+    df = buyer_db.df
+    assert buyer_db.candidate_rows('graphene_offcuts').tolist() == [row]
+    assert buyer_db.candidate_rows('no_such_type', 'nanomaterial').tolist() == [row]
+    for waste_type in set().union(*df['accepted_waste_types']):
+        assert np.array_equal(buyer_db.candidate_rows(waste_type, 'nanomaterial'),
+                              scan_rows(df, waste_type, 'nanomaterial'))
+    assert buyer_db.snapshot.type_index['graphene_offcuts'].tolist() == [row]
@@ -0,0 +1,86 @@
+import os
+import shutil
+import time
+import pandas as pd
+import pytest
+from conftest import BUYERS_CSV
+import lib.buyer_snapshots as buyer_snapshots
+from lib.buyer_snapshots import (
+    BuyerSnapshotManager, KEEP_GENERATIONS, PUBLISH_LOCK_TIMEOUT, latest_generation, publish_snapshot
+)
+
+
+@pytest.fixture
+def buyers_csv(tmp_path):
+    path = tmp_path / 'buyers.csv'
+    shutil.copy(BUYERS_CSV, path)
+    return str(path)
+
+
+@pytest.fixture
+def shared_root(tmp_path):
+    return str(tmp_path / 'shared')
+
+
+def change_source(path):
+    df = pd.read_csv(path)
+    df.iloc[[0]].assign(buyer_id=f'B{len(df) + 1:03d}').to_csv(path, mode='a', header=False, index=False)
+
+
+def generations(shared_root):
+    return sorted(name for name in os.listdir(shared_root) if name.startswith('gen-'))
+
+
+def test_generations_are_numbered_in_order(buyers_csv, shared_root):
+    assert latest_generation(shared_root) == (0, None)
+    assert publish_snapshot(buyers_csv, shared_root) == 1
+
+    # An unchanged source is not published again
+    assert publish_snapshot(buyers_csv, shared_root) == 1
+    change_source(buyers_csv)
+    assert publish_snapshot(buyers_csv, shared_root) == 2
+    assert latest_generation(shared_root) == (2, os.path.join(shared_root, 'gen-000002'))
+    assert generations(shared_root) == ['gen-000001', 'gen-000002']
+    assert sorted(os.listdir(shared_root)) == ['gen-000001', 'gen-000002']
+
+
+def test_old_generations_are_pruned(buyers_csv, shared_root):
+    for _ in range(KEEP_GENERATIONS + 2):
+        publish_snapshot(buyers_csv, shared_root)
+        change_source(buyers_csv)
+
+    assert generations(shared_root) == [
+        f'gen-{g:06d}' for g in range(3, KEEP_GENERATIONS + 3)
+    ]
+    assert publish_snapshot(buyers_csv, shared_root, keep=1) == KEEP_GENERATIONS + 3
+    assert generations(shared_root) == [f'gen-{KEEP_GENERATIONS + 3:06d}']
+
+
+def test_stale_publish_lock_is_taken_over(buyers_csv, shared_root):
+    os.makedirs(shared_root)
+    lock_path = os.path.join(shared_root, 'publish.lock')
+    open(lock_path, 'w').close()
+
+    # A live publisher holds the lock
+    assert publish_snapshot(buyers_csv, shared_root) is None
+    assert generations(shared_root) == []
+
+    abandoned = time.time() - PUBLISH_LOCK_TIMEOUT - 1
+    os.utime(lock_path, (abandoned, abandoned))
+    assert publish_snapshot(buyers_csv, shared_root) == 1
+    assert not os.path.exists(lock_path)
+
+
+def test_second_manager_attaches_without_republishing(buyers_csv, shared_root, monkeypatch):
+    first = BuyerSnapshotManager(buyers_csv, shared_root=shared_root)
+    assert first.generation == 1
+
+    def publish(*args, **kwargs):
+        raise AssertionError('published again')
+
+    monkeypatch.setattr(buyer_snapshots, 'publish_snapshot', publish)
+    second = BuyerSnapshotManager(buyers_csv, shared_root=shared_root)
+    assert second.generation == 1
+    assert second.current.snapshot_path == os.path.join(shared_root, 'gen-000001')
+    assert second.current.get_all_buyers() == first.current.get_all_buyers()
+    assert generations(shared_root) == ['gen-000001']
@@ -0,0 +1,133 @@
+import itertools
+import pytest
+from lib.buyer_database import BuyerDatabase
+
+QUALITY_HIERARCHY = {'Grade A': 4, 'Clean': 3, 'Grade B': 2, 'Grade C': 1, 'Mixed': 1, 'As-Is': 0}
+HAZMAT_CERTIFICATIONS = ['CPCB', 'SPCB', 'MoEFCC', 'Hazardous_Waste_Authorization']
+
+
+def has_hazmat_cert(certifications):
+    """The per-pair scorer's check before certifications became bitmasks"""
+
+    certs_str = ' '.join(certifications).upper()
+    return any(cert.upper().replace('_', '') in certs_str.replace('_', '') for cert in HAZMAT_CERTIFICATIONS)
+
+
+def scan_search(df, waste_type=None, category=None, location=None, max_distance_km=None,
+                quality_grade=None, min_volume_tons=None, max_volume_tons=None, hazmat_certified=None):
+    """search_buyers as DataFrame .apply filters, as before the query planner"""
+
+    filtered = df.copy()
+    if waste_type:
+        filtered = filtered[filtered['accepted_waste_types'].apply(lambda x: waste_type in x)]
+    if category:
+        filtered = filtered[filtered['accepted_categories'].apply(lambda x: category in x)]
+    if location and max_distance_km:
+        distances = filtered.apply(
+            lambda row: BuyerDatabase._haversine_distance(location['lat'], location['lng'], row['lat'], row['lng']),
+            axis=1
+        )
+        filtered = filtered[distances <= max_distance_km]
+    if quality_grade:
+        level = QUALITY_HIERARCHY.get(quality_grade, 2)
+        filtered = filtered[filtered['min_quality_grade'].apply(lambda g: QUALITY_HIERARCHY.get(g, 1) <= level)]
+    if min_volume_tons is not None:
+        filtered = filtered[filtered['max_monthly_volume_tons'] >= min_volume_tons]
+    if max_volume_tons is not None:
+        filtered = filtered[filtered['min_monthly_volume_tons'] <= max_volume_tons]
+    if hazmat_certified is not None:
+        filtered = filtered[filtered['certifications'].apply(has_hazmat_cert) == hazmat_certified]
+    return filtered.to_dict('records')
+
+
+def filter_sets(db):
+    df = db.df
+    waste_types = sorted(set().union(*df['accepted_waste_types']))[:6] + ['no_such_type']
+    categories = sorted(set().union(*df['accepted_categories']))[:3]
+    locations = [{'lat': 28.6, 'lng': 77.2}, {'lat': 19.0, 'lng': 72.9}]
+
+    yield {}
+    for waste_type, category in itertools.product(waste_types + [None], categories + [None]):
+        yield {'waste_type': waste_type, 'category': category}
+    for waste_type, location, radius in itertools.product(waste_types[:3] + [None], locations, [100, 800]):
+        yield {'waste_type': waste_type, 'location': location, 'max_distance_km': radius}
+    for grade in QUALITY_HIERARCHY:
+        yield {'quality_grade': grade}
+        yield {'waste_type': waste_types[0], 'quality_grade': grade}
+    for low, high in [(300, None), (None, 4), (100, 200), (5000, None)]:
+        yield {'min_volume_tons': low, 'max_volume_tons': high}
+        yield {'category': categories[0], 'min_volume_tons': low, 'max_volume_tons': high}
+    for hazmat in [True, False]:
+        yield {'hazmat_certified': hazmat}
+        yield {'category': categories[0], 'location': locations[0], 'max_distance_km': 1500,
+               'quality_grade': 'Grade B', 'min_volume_tons': 10, 'hazmat_certified': hazmat}
+
+
+def test_search_buyers_matches_the_scan(buyer_db, large_buyer_db):
+    for filters in filter_sets(buyer_db):
+        assert buyer_db.search_buyers(**filters) == scan_search(buyer_db.df, **filters), filters
+
+    # Every fourth filter set on the larger table, where the planner's choices differ
+    for filters in itertools.islice(filter_sets(large_buyer_db), 0, None, 4):
+        assert large_buyer_db.search_buyers(**filters) == scan_search(large_buyer_db.df, **filters), filters
+
+
+def test_each_new_filter_narrows_the_result(buyer_db):
+    # Every sample buyer holds a hazmat authorization; add one that does not
+    buyer = dict(buyer_db.get_all_buyers()[0], buyer_id='B999', certifications=['ISO_14001', 'GPCB_Consent'])
+    buyer_db.add_buyer(buyer)
+
+    total = len(buyer_db.df)
+    for filters in [{'quality_grade': 'Grade C'}, {'min_volume_tons': 300}, {'max_volume_tons': 4},
+                    {'hazmat_certified': True}]:
+        assert 0 < len(buyer_db.search_buyers(**filters)) < total, filters
+        assert buyer_db.search_buyers(**filters) == scan_search(buyer_db.df, **filters), filters
+
+    assert [b['buyer_id'] for b in buyer_db.search_buyers(hazmat_certified=False)] == ['B999']
+    assert all(has_hazmat_cert(b['certifications']) for b in buyer_db.search_buyers(hazmat_certified=True))
+
+
+def test_explain_search_reports_the_driver_and_row_counts(large_buyer_db):
+    db = large_buyer_db
+    waste_type = 'metal_scrap_steel'
+    location = {'lat': 20.0, 'lng': 78.0}
+    filters = {'waste_type': waste_type, 'location': location, 'max_distance_km': 150,
+               'quality_grade': 'Grade B', 'hazmat_certified': True}
+    plan = db.explain_search(**filters)
+
+    # The small radius beats the type index as the driving step
+    assert len(db.type_index[waste_type]) > db.spatial_index.candidate_count(20.0, 78.0, 150)
+    assert plan.total == db.snapshot.size
+    assert plan.steps[0]['method'] == 'grid query'
+    assert [step['method'] for step in plan.steps[1:]].count('column mask') == 2
+
+    nearby = {buyer['buyer_id'] for buyer in scan_search(db.df, location=location, max_distance_km=150)}
+    rows = db.df
+    for step in plan.steps:
+        if step['kind'] == 'radius':
+            rows = rows[rows['buyer_id'].isin(nearby)]
+        elif step['kind'] == 'index':
+            rows = rows[rows['accepted_waste_types'].apply(lambda x: waste_type in x)]
+        elif step['filter'].startswith('accepts'):
+            rows = rows[rows['min_quality_grade'].apply(lambda g: QUALITY_HIERARCHY.get(g, 1) <= 2)]
+        else:
+            rows = rows[rows['certifications'].apply(has_hazmat_cert)]
+        assert step['rows'] == len(rows), step['filter']
+    assert plan.steps[-1]['rows'] == len(db.search_buyers(**filters))
+    assert 'grid query' in str(plan)
+
+    # Without a location the type index drives
+    plan = db.explain_search(waste_type=waste_type, quality_grade='Grade B')
+    assert (plan.steps[0]['kind'], plan.steps[0]['method']) == ('index', 'index lookup')
+    assert plan.steps[0]['rows'] == len(db.type_index[waste_type])
+
+    plan = db.explain_search(hazmat_certified=True)
+    assert plan.steps[0]['method'] == 'scan' and plan.steps[0]['rows'] == db.snapshot.size
+
+
+def test_search_rows_are_ascending_positions(large_buyer_db):
+    rows = large_buyer_db.search_rows(category='metal', location={'lat': 20.0, 'lng': 78.0}, max_distance_km=500)
+    assert len(rows) and list(rows) == sorted(rows)
+    records = large_buyer_db.snapshot.records_at(rows)
+    assert records == large_buyer_db.search_buyers(category='metal', location={'lat': 20.0, 'lng': 78.0},
+                                                    max_distance_km=500)
@@ -0,0 +1,119 @@
+import logging
+import os
+import shutil
+import threading
+import pandas as pd
+import pytest
+from conftest import BUYERS_CSV
+from lib.buyer_snapshots import BuyerSnapshotManager
+
+
+@pytest.fixture
+def buyers_csv(tmp_path):
+    path = tmp_path / 'buyers.csv'
+    shutil.copy(BUYERS_CSV, path)
+    return str(path)
+
+
+def new_buyer(buyer_id):
+    buyer = pd.read_csv(BUYERS_CSV).iloc[0].to_dict()
+    return dict(buyer, buyer_id=buyer_id, lat=buyer['lat'] + 0.5)
+
+
+def append_row(path, buyer_id):
+    pd.DataFrame([new_buyer(buyer_id)]).to_csv(path, mode='a', header=False, index=False)
+
+
+def wait_for_reloads(manager):
+    # A finished reload has already started any follow-up reload it needs
+    thread = manager._reloading
+    while thread is not None:
+        thread.join()
+        thread = manager._reloading
+
+
+def buyer_ids(db):
+    return [buyer['buyer_id'] for buyer in db.get_all_buyers()]
+
+
+def test_touching_the_csv_swaps_in_a_new_database(buyers_csv):
+    manager = BuyerSnapshotManager(buyers_csv, poll_interval=0)
+    db = manager.current
+    assert manager.version == 1
+    assert not manager.check()
+
+    stat = os.stat(buyers_csv)
+    os.utime(buyers_csv, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10 ** 9))
+    assert manager.check()
+    wait_for_reloads(manager)
+
+    assert manager.version == 2
+    assert manager.current is not db
+    assert buyer_ids(manager.current) == buyer_ids(db)
+    assert not manager.check()
+
+
+def test_readers_keep_their_database_across_a_swap(buyers_csv):
+    manager = BuyerSnapshotManager(buyers_csv, poll_interval=0)
+    db = manager.current
+    before = db.get_all_buyers()
+
+    append_row(buyers_csv, 'B900')
+    manager.reload()
+
+    assert db.get_all_buyers() == before
+    assert db.snapshot.size == len(before)
+    assert buyer_ids(manager.current) == buyer_ids(db) + ['B900']
+
+
+def test_add_buyer_during_a_reload_reaches_the_new_database(buyers_csv, monkeypatch):
+    manager = BuyerSnapshotManager(buyers_csv, poll_interval=60)
+    opened, release = threading.Event(), threading.Event()
+    open_db = BuyerSnapshotManager._open
+
+    def slow_open(self, signature):
+        # The file is read before the buyer is added, then the swap waits
+        db = open_db(self, signature)
+        if not opened.is_set():
+            opened.set()
+            release.wait()
+        return db
+
+    monkeypatch.setattr(BuyerSnapshotManager, '_open', slow_open)
+    append_row(buyers_csv, 'B900')
+    assert manager.check()
+    opened.wait()
+
+    record = manager.add_buyer(new_buyer(None))
+    assert record['buyer_id'] == 'B101'
+    assert buyer_ids(manager.current)[-1] == 'B101'
+    release.set()
+    wait_for_reloads(manager)
+
+    # The swapped-in reload missed the add, so it re-checked and reloaded again
+    assert buyer_ids(manager.current)[-2:] == ['B900', 'B101']
+    assert manager.version == 4
+    assert not manager.check()
+
+
+def test_failed_reload_keeps_the_current_version(buyers_csv, monkeypatch, caplog):
+    manager = BuyerSnapshotManager(buyers_csv, poll_interval=60)
+    db = manager.current
+
+    def broken_open(self, signature):
+        raise ValueError('bad row')
+
+    monkeypatch.setattr(BuyerSnapshotManager, '_open', broken_open)
+    append_row(buyers_csv, 'B900')
+    with caplog.at_level(logging.WARNING, logger='lib.buyer_snapshots'):
+        assert manager.check()
+        wait_for_reloads(manager)
+
+    assert manager.version == 1
+    assert manager.current is db
+    assert 'keeping version 1: bad row' in caplog.text
+
+    monkeypatch.undo()
+    manager.reload()
+    assert manager.version == 2
+    assert buyer_ids(manager.current)[-1] == 'B900'
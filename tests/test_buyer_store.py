@@ -0,0 +1,58 @@
+import hashlib
+import os
+import sqlite3
+import pytest
+from conftest import BUYERS_CSV
+from lib.buyer_database import BuyerDatabase, source_signature
+from lib.buyer_store import BuyerStore, registry_version
+
+
+@pytest.fixture
+def registry(tmp_path):
+    path = str(tmp_path / 'buyers.db')
+    BuyerStore(path).import_csv(BUYERS_CSV)
+    return path
+
+
+def file_state(path):
+    with open(path, 'rb') as f:
+        return os.stat(path).st_mtime_ns, hashlib.sha256(f.read()).hexdigest()
+
+
+def test_registry_loads_like_the_csv(registry):
+    assert BuyerDatabase(registry).get_all_buyers() == BuyerDatabase(BUYERS_CSV).get_all_buyers()
+
+
+def test_version_polling_is_read_only(registry):
+    before = file_state(registry)
+    assert source_signature(registry) == ('sqlite', 1)
+    assert file_state(registry) == before
+
+    with pytest.raises(sqlite3.OperationalError):
+        registry_version(registry + '.missing')
+    assert not os.path.exists(registry + '.missing')
+
+
+def test_inserts_bump_the_version_and_connections_are_closed(registry, monkeypatch):
+    opened = []
+    connect = BuyerStore._connect
+    monkeypatch.setattr(BuyerStore, '_connect', lambda self: opened.append(connect(self)) or opened[-1])
+
+    store = BuyerStore(registry)
+    buyer_id = store.insert_buyer(store.load_frame().iloc[0].to_dict())
+    assert buyer_id == 'B101'
+    assert store.search(waste_type='metal_scrap_steel')
+    assert store.version() == 2
+
+    assert len(opened) == 4
+    for conn in opened:
+        with pytest.raises(sqlite3.ProgrammingError):
+            conn.execute("SELECT 1")
+
+
+def test_missing_registry_has_version_zero(tmp_path):
+    path = str(tmp_path / 'new.db')
+    assert source_signature(path) == ('sqlite', 0)
+    assert not os.path.exists(path)
+    BuyerStore(path)
+    assert source_signature(path) == ('sqlite', 0)
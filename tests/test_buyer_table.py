@@ -0,0 +1,215 @@
+import json
+import os
+import shutil
+import numpy as np
+import pandas as pd
+import pytest
+from conftest import BUYERS_CSV, as_json
+from lib.buyer_database import BuyerDatabase
+from lib.buyer_table import (
+    BuyerTable, CERTIFICATION_BITS, DERIVED_ARRAYS, FALLBACK_COLLECTION_FEE, FALLBACK_PRICE, HAZMAT_MASK,
+    certification_mask, parse_pricing, price_per_ton
+)
+
+
+@pytest.fixture
+def buyers_csv(tmp_path):
+    path = tmp_path / 'buyers.csv'
+    shutil.copy(BUYERS_CSV, path)
+    return str(path)
+
+
+@pytest.fixture
+def snapshot_path(buyers_csv, tmp_path):
+    path = str(tmp_path / 'snapshot')
+    BuyerDatabase.compile_snapshot(buyers_csv, path)
+    return path
+
+
+def test_snapshot_loads_like_the_csv(buyers_csv, snapshot_path):
+    from_csv = BuyerDatabase(buyers_csv)
+    from_snapshot = BuyerDatabase(snapshot_path)
+
+    assert as_json(from_snapshot.get_all_buyers()) == as_json(from_csv.get_all_buyers())
+    assert from_snapshot.snapshot.size == from_csv.snapshot.size
+    for name in DERIVED_ARRAYS:
+        assert np.array_equal(getattr(from_snapshot.snapshot, name), getattr(from_csv.snapshot, name)), name
+    for key in ['type_index', 'category_index']:
+        loaded, built = getattr(from_snapshot, key), getattr(from_csv, key)
+        assert set(loaded) == set(built)
+        assert all(np.array_equal(loaded[k], built[k]) for k in built)
+
+    # The frame is only rebuilt on demand, and then equals the CSV's
+    pd.testing.assert_frame_equal(from_snapshot.df, from_csv.df)
+    assert from_snapshot.pricing_errors == from_csv.pricing_errors
+    assert from_snapshot.certification_errors == from_csv.certification_errors
+
+
+def test_snapshot_arrays_are_memory_mapped(snapshot_path):
+    table = BuyerTable.load(snapshot_path)
+    for name in DERIVED_ARRAYS:
+        assert isinstance(getattr(table, name), np.memmap), name
+    assert all(isinstance(values, np.memmap) for values in table._numeric.values())
+    assert all(isinstance(bits, np.memmap) for bits in table._bits.values())
+    assert all(isinstance(rows, np.memmap) for rows in table.type_index.values())
+    with pytest.raises(ValueError):
+        table.lat[0] = 0
+
+
+def test_wrong_format_version_is_rejected(snapshot_path):
+    manifest_path = os.path.join(snapshot_path, 'manifest.json')
+    with open(manifest_path, encoding='utf-8') as f:
+        manifest = json.load(f)
+    manifest['format_version'] += 1
+    with open(manifest_path, 'w', encoding='utf-8') as f:
+        json.dump(manifest, f)
+
+    with pytest.raises(ValueError, match='recompile'):
+        BuyerDatabase(snapshot_path)
+
+
+def test_stale_snapshot_is_reported(buyers_csv, snapshot_path, capsys):
+    BuyerDatabase(snapshot_path)
+    assert 'older than' not in capsys.readouterr().out
+
+    with open(buyers_csv, 'a', encoding='utf-8') as f:
+        f.write('\n')
+    db = BuyerDatabase(snapshot_path)
+    assert 'older than' in capsys.readouterr().out
+    assert db.source_signature != (os.stat(buyers_csv).st_mtime_ns, os.stat(buyers_csv).st_size)
+
+
+def test_add_buyer_to_a_snapshot_database(buyers_csv, snapshot_path):
+    db = BuyerDatabase(snapshot_path)
+    size = db.snapshot.size
+    buyer = pd.read_csv(BUYERS_CSV).iloc[0].to_dict()
+    stored = db.add_buyer(dict(buyer, buyer_id='B999', lat=buyer['lat'] + 0.5))
+
+    expected = BuyerDatabase(buyers_csv)
+    assert as_json(expected.add_buyer(dict(buyer, buyer_id='B999', lat=buyer['lat'] + 0.5))) == as_json(stored)
+    assert as_json(db.get_all_buyers()) == as_json(expected.get_all_buyers())
+    assert db.snapshot.size == size + 1
+    waste_type = stored['accepted_waste_types'][0]
+    assert size in db.type_index[waste_type] and size in db.snapshot.type_index[waste_type]
+    assert db.nearest_buyers(stored['lat'], stored['lng'], k=1)[0]['buyer_id'] == 'B999'
+
+    # The mapped files are left as compiled
+    assert BuyerDatabase(snapshot_path).snapshot.size == size
+
+
+def substring_compliance(certifications):
+    """GraphMatcher._score_compliance for hazardous waste before certification bitmasks"""
+
+    required_certs = ['CPCB', 'SPCB', 'MoEFCC', 'Hazardous_Waste_Authorization']
+    certs_str = ' '.join(certifications).upper()
+    has_hazmat_cert = any(
+        cert.upper().replace('_', '') in certs_str.replace('_', '')
+        for cert in required_certs
+    )
+    return 1.0 if has_hazmat_cert else 0.2
+
+
+# Spellings beyond those in data/ that buyers could register with
+EXTRA_SPELLINGS = [
+    'cpcb', 'Spcb_auth', 'SPCB-Consent', 'MOEFCC_Clearance', 'Hazardous_Waste_Authorization',
+    'HazardousWasteAuthorization', 'Hazardous Waste Authorization', 'ISO_14001', 'GPCB_Consent', 'nan', ''
+]
+
+
+def test_bitmask_compliance_equals_the_substring_check(buyer_db):
+    from lib.graph_matching import GraphMatcher
+
+    matcher = GraphMatcher(buyer_db)
+    hazardous = {'hazard_class': 'Hazardous'}
+    spellings = sorted(set().union(*buyer_db.df['certifications']))
+    assert spellings == ['CPCB_Auth', 'MoEFCC', 'SPCB_Auth']
+
+    for certifications in [[s] for s in spellings + EXTRA_SPELLINGS] + list(buyer_db.df['certifications']):
+        expected = substring_compliance(certifications)
+        assert matcher._score_compliance(hazardous, {'certifications': certifications}) == expected, certifications
+        assert (certification_mask(certifications) & HAZMAT_MASK != 0) == (expected == 1.0), certifications
+
+    # Masks stored per buyer give the same scores, also in the columnar table
+    for buyer, certified in zip(buyer_db.get_all_buyers(), buyer_db.snapshot.hazmat_certified):
+        expected = substring_compliance(buyer['certifications'])
+        assert matcher._score_compliance(hazardous, buyer) == expected
+        assert certified == (expected == 1.0)
+
+
+def test_unrecognized_certifications_are_reported(buyers_csv, capsys):
+    df = pd.read_csv(buyers_csv)
+    df.loc[0, 'certifications'] = 'ISO_14001, SPCB_Auth'
+    df.loc[1, 'certifications'] = 'GPCB_Consent'
+    df.to_csv(buyers_csv, index=False)
+
+    db = BuyerDatabase(buyers_csv)
+    assert db.certification_errors == [
+        {'buyer_id': df.loc[0, 'buyer_id'], 'certification': 'ISO_14001'},
+        {'buyer_id': df.loc[1, 'buyer_id'], 'certification': 'GPCB_Consent'}
+    ]
+    assert "['GPCB_Consent', 'ISO_14001']" in capsys.readouterr().out
+    assert db.snapshot.hazmat_certified[:2].tolist() == [True, False]
+
+    db.add_buyer(dict(df.iloc[2].to_dict(), buyer_id='B999', certifications='cpcb, Fire_NOC'))
+    assert db.certification_errors[-1] == {'buyer_id': 'B999', 'certification': 'Fire_NOC'}
+    assert db.snapshot.certification_mask[-1] == CERTIFICATION_BITS['CPCB']
+
+
+@pytest.mark.parametrize('pricing, expected', [
+    ('₹11000-13000/ton', (11000, 13000, False, True)),
+    ('₹24-29/kg', (24, 29, False, True)),
+    ('₹1,200 - ₹1,500 / ton', (1200, 1500, False, True)),
+    ('₹8000/ton', (8000, 8000, False, True)),
+    ('Market_Rate', (12000, 12000, False, True)),
+    ('Negotiable', (10000, 10000, False, True)),
+    ('Collection_Fee: ₹700-1200/ton', (700, 1200, True, True)),
+    (None, (10000, 12000, False, True)),
+    ('Call for quote', (FALLBACK_PRICE, FALLBACK_PRICE, False, False)),
+    ('₹abc/ton', (FALLBACK_PRICE, FALLBACK_PRICE, False, False)),
+    ('Collection_Fee: on request', (FALLBACK_COLLECTION_FEE, FALLBACK_COLLECTION_FEE, True, False)),
+])
+def test_parse_pricing(pricing, expected):
+    price_min, price_max, is_cost, parsed = expected
+    assert parse_pricing(pricing) == {
+        'price_min': price_min, 'price_max': price_max, 'price_avg': (price_min + price_max) / 2,
+        'price_is_cost': is_cost, 'price_parsed': parsed
+    }
+    assert price_per_ton({'pricing_model': pricing}) == (-price_min if is_cost else (price_min + price_max) / 2)
+
+
+def test_unparsed_pricing_is_reported(buyers_csv, capsys):
+    df = pd.read_csv(buyers_csv)
+    df.loc[3, 'pricing_model'] = 'Call for quote'
+    df.to_csv(buyers_csv, index=False)
+
+    db = BuyerDatabase(buyers_csv)
+    assert db.pricing_errors == [{'buyer_id': df.loc[3, 'buyer_id'], 'pricing_model': 'Call for quote'}]
+    assert 'Call for quote' in capsys.readouterr().out
+    assert db.snapshot.price_per_ton[3] == FALLBACK_PRICE
+
+    db.add_buyer(dict(df.iloc[0].to_dict(), buyer_id='B999', pricing_model='₹abc/ton'))
+    assert db.pricing_errors[-1] == {'buyer_id': 'B999', 'pricing_model': '₹abc/ton'}
+
+
+def test_collection_fee_buyers_are_a_cost(buyer_db):
+    from lib.graph_matching import GraphMatcher
+
+    buyer = next(b for b in buyer_db.get_all_buyers() if b['pricing_model'] == 'Collection_Fee: ₹700-1200/ton')
+    waste = {'type': buyer['accepted_waste_types'][0], 'category': buyer['accepted_categories'][0],
+             'quantity_min_tons': 8, 'quantity_max_tons': 12, 'quality_grade': 'Grade A',
+             'hazard_class': 'Non-hazardous', 'contamination_pct': 1}
+
+    # 120 t/year at a ₹700/ton fee, 100 km at ₹4/km/ton, ₹6000/ton disposal avoided
+    # (before pricing was parsed at load the fee string fell back to ₹10000/ton revenue)
+    matcher = GraphMatcher(buyer_db)
+    assert matcher._calculate_economics(waste, buyer, 100) == {
+        'annual_revenue': -84000, 'annual_transport_cost': 48000, 'disposal_cost_avoided': 720000,
+        'net_annual_benefit': 588000, 'price_per_ton': -700, 'annual_quantity_tons': 120.0, 'currency': 'INR'
+    }
+
+    profile = {'waste_streams': [waste], 'location': {'name': 'Test', 'lat': buyer['lat'], 'lng': buyer['lng']}}
+    for vectorized in [True, False]:
+        matches = GraphMatcher(buyer_db, vectorized=vectorized).find_optimal_matches(profile, max_matches=100)
+        match = next(m for m in matches if m['buyer_id'] == buyer['buyer_id'])
+        assert match['distance'] == 0
+        assert match['costSaving'] == (720000 - 84000) / 1000
@@ -0,0 +1,52 @@
+import numpy as np
+import pytest
+from conftest import as_json
+from lib.candidates import CandidateGenerator, IndexCandidates, NearestCandidates
+from lib.graph_matching import GraphMatcher
+from lib.spatial_index import haversine_km
+
+
+def test_candidate_generator_is_abstract():
+    with pytest.raises(TypeError):
+        CandidateGenerator()
+
+
+def test_nearest_candidates_are_the_closest_buyers(large_buyer_db, profiles):
+    table = large_buyer_db.snapshot
+    for profile in profiles[:10]:
+        location = profile['location']
+        rows = NearestCandidates(k=200)(profile, large_buyer_db)
+        distances = haversine_km(location['lat'], location['lng'], table.lat, table.lng)
+        assert len(rows) == 200
+        assert distances[rows].max() <= np.sort(distances)[199]
+
+
+def test_index_candidates_accept_a_stream_nearby(large_buyer_db, profiles):
+    table = large_buyer_db.snapshot
+    buyers = large_buyer_db.get_all_buyers()
+    for profile in profiles[:10]:
+        location = profile['location']
+        distances = haversine_km(location['lat'], location['lng'], table.lat, table.lng)
+        expected = [
+            j for j, buyer in enumerate(buyers)
+            if distances[j] <= 500 and any(
+                waste['type'] in buyer['accepted_waste_types'] or waste['category'] in buyer['accepted_categories']
+                for waste in profile['waste_streams']
+            )
+        ]
+        assert list(IndexCandidates(max_distance_km=500)(profile, large_buyer_db)) == expected
+
+
+def test_candidate_matches_rank_like_the_full_scan(large_buyer_db, profiles):
+    full = GraphMatcher(large_buyer_db)
+    gated = GraphMatcher(large_buyer_db, candidates=NearestCandidates(k=300) | IndexCandidates(max_distance_km=300))
+    buyers = large_buyer_db.get_all_buyers()
+    for profile in profiles[:10]:
+        rows = gated.candidates(profile, large_buyer_db)
+        ids = {buyers[j]['buyer_id'] for j in rows}
+
+        # The full ranking restricted to the candidates
+        ranking = full.find_optimal_matches(profile, max_matches=large_buyer_db.snapshot.size)
+        expected = [match for match in ranking if match['buyer_id'] in ids][:10]
+        assert as_json(gated.find_optimal_matches(profile, max_matches=10)) == as_json(expected)
+        assert gated.search_stats['candidates'] == len(rows)
@@ -0,0 +1,42 @@
+import pickle
+import numpy as np
+import pytest
+from conftest import training_features
+from lib.feature_encoder import FeatureEncoder, UnknownCategoryError
+from lib.tree_export import export_encoders
+
+
+@pytest.fixture(scope='module')
+def encoders(trained_model_dir):
+    with open(trained_model_dir / 'encoders.pkl', 'rb') as f:
+        return pickle.load(f)
+
+
+def test_encoder_matches_sklearn_transform(encoders, training_df, facility_inputs):
+    encoder = FeatureEncoder(export_encoders(encoders))
+    expected = training_features(training_df, encoders)
+    assert np.array_equal(encoder.encode_batch(facility_inputs), expected)
+    for row in range(0, len(facility_inputs), 50):
+        assert np.array_equal(encoder.encode(facility_inputs[row]), expected[[row]])
+
+
+def test_encoder_ignores_case(encoders, facility_inputs):
+    encoder = FeatureEncoder(export_encoders(encoders))
+    shouted = {key: value.upper() if isinstance(value, str) else value
+               for key, value in facility_inputs[0].items()}
+    assert np.array_equal(encoder.encode(shouted), encoder.encode(facility_inputs[0]))
+
+
+def test_unknown_category_raises_unless_a_fallback_is_set(encoders, facility_inputs):
+    facility_input = dict(facility_inputs[0], machinery='teleporter')
+
+    with pytest.raises(UnknownCategoryError) as error:
+        FeatureEncoder(export_encoders(encoders)).encode_batch([facility_inputs[1], facility_input])
+    assert error.value.feature == 'machinery' and error.value.value == 'teleporter'
+
+    encoder = FeatureEncoder(export_encoders(encoders), unknown={'machinery': 0})
+    features = encoder.encode_batch([facility_input])
+    assert features[0, 3] == 0
+    assert np.array_equal(features, encoder.encode(facility_input))
+    with pytest.raises(UnknownCategoryError):
+        encoder.encode(dict(facility_input, scale='galactic'))
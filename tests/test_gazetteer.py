@@ -0,0 +1,67 @@
+import pandas as pd
+import pytest
+from conftest import BUYERS_CSV
+from lib.gazetteer import Gazetteer, load_gazetteer
+from lib.spatial_index import haversine_km
+
+
+@pytest.fixture(scope='module')
+def gazetteer():
+    return load_gazetteer()
+
+
+def name_of(place):
+    return None if place is None else place['name']
+
+
+@pytest.mark.parametrize('text, expected', [
+    ('Mumbai', 'Mumbai'),                 # exact
+    ('  mUMBAI ', 'Mumbai'),
+    ('Bombay', 'Mumbai'),                 # alias
+    ('new  delhi', 'Delhi'),
+    ('Gurgaon', 'Gurugram'),
+    ('Hyderab', 'Hyderabad'),             # unique prefix
+    ('Ahmedab', 'Ahmedabad'),
+    ('Banglore', 'Bengaluru'),            # fuzzy
+    ('Mumbay', 'Mumbai'),
+    ('Kolkatta', 'Kolkata'),
+    ('Hyderabad, Telangana', 'Hyderabad'),  # City, State
+    ('Pune, maharashtra', 'Pune'),
+    ('Pune, Gujarat', 'Pune'),            # Wrong state: the city alone
+    ('Banglore, Karnataka', 'Bengaluru'),
+])
+def test_locate(gazetteer, text, expected):
+    assert name_of(gazetteer.locate(text)) == expected
+
+
+@pytest.mark.parametrize('text', ['', '   ', None, 'Xyzzyville', 'Ma', 'Atlantis, Narnia'])
+def test_locate_returns_none(gazetteer, text):
+    # 'Ma' is the prefix of several places and close to none
+    assert gazetteer.locate(text) is None
+
+
+def test_city_state_picks_between_places_with_the_same_name():
+    gazetteer = Gazetteer([
+        {'name': 'Aurangabad', 'kind': 'city', 'state': 'Maharashtra', 'lat': 19.88, 'lng': 75.34},
+        {'name': 'Aurangabad', 'kind': 'city', 'state': 'Bihar', 'lat': 24.75, 'lng': 84.37},
+        {'name': 'Bihar', 'kind': 'state', 'state': 'Bihar', 'lat': 25.6, 'lng': 85.1},
+        {'name': 'Bihar', 'kind': 'city', 'state': 'Bihar', 'lat': 25.2, 'lng': 85.52, 'aliases': 'Bihar Sharif'},
+    ])
+    assert gazetteer.locate('Aurangabad, Bihar')['lat'] == 24.75
+    assert gazetteer.locate('aurangabad,maharashtra')['lat'] == 19.88
+    assert gazetteer.locate('Aurangabad')['state'] == 'Maharashtra'
+
+    # Cities win over a state of the same name
+    assert gazetteer.locate('Bihar')['kind'] == 'city'
+    assert gazetteer.locate('bihar sharif')['lat'] == 25.2
+
+
+def test_every_buyer_city_resolves(gazetteer):
+    buyers = pd.read_csv(BUYERS_CSV)
+    for (city, state), group in buyers.groupby(['city', 'state']):
+        for text in [city, city.upper(), f"{city}, {state}"]:
+            place = gazetteer.locate(text)
+            assert place is not None and place['name'] == city and place['state'] == state, text
+
+        # /api/find-matches uses the centroid as the facility location
+        assert haversine_km(place['lat'], place['lng'], group['lat'], group['lng']).max() < 50
@@ -0,0 +1,103 @@
+import numpy as np
+import pandas as pd
+import pytest
+from conftest import BUYERS_CSV, as_json
+import lib.graph_matching as graph_matching
+from lib.graph_matching import EDGE_THRESHOLD, GraphMatcher
+
+
+def test_vectorized_edges_match_pairwise_scores(buyer_db, profiles):
+    matcher = GraphMatcher(buyer_db)
+    buyers = buyer_db.get_all_buyers()
+    for profile in profiles:
+        G = matcher.build_graph(profile, buyers)
+        for i, waste in enumerate(profile['waste_streams']):
+            for edge in G.edges(i):
+                buyer = buyers[G.buyer_index[edge]]
+                expected = matcher._calculate_match_score(waste, buyer, profile['location'])
+                assert as_json(G.edge_data(edge)) == as_json(expected)
+
+
+def test_vectorized_matches_equal_pairwise_matches(buyer_db, profiles):
+    vectorized = GraphMatcher(buyer_db)
+    pairwise = GraphMatcher(buyer_db, vectorized=False)
+    for profile in profiles:
+        expected = pairwise.find_optimal_matches(profile, max_matches=10)
+        assert as_json(vectorized.find_optimal_matches(profile, max_matches=10)) == as_json(expected)
+
+
+def test_csr_graph_exports_every_edge_above_threshold(buyer_db, profiles):
+    matcher = GraphMatcher(buyer_db)
+    buyers = buyer_db.get_all_buyers()
+    for profile in profiles[:10]:
+        G = matcher.build_graph(profile, buyers)
+        for i in range(len(profile['waste_streams'])):
+            assert np.all(np.diff(G.buyer_index[G.edges(i)]) > 0)
+
+        exported = G.to_networkx()
+        expected = {}
+        for i, waste in enumerate(profile['waste_streams']):
+            for j, buyer in enumerate(buyers):
+                score_data = matcher._calculate_match_score(waste, buyer, profile['location'])
+                if score_data['total_score'] > EDGE_THRESHOLD:
+                    expected[G.waste_node(i), G.buyer_node(j)] = score_data
+
+        assert set(exported.edges) == set(expected)
+        for (u, v), score_data in expected.items():
+            data = dict(exported.edges[u, v])
+            assert data.pop('weight') == score_data['total_score']
+            assert as_json(data) == as_json(score_data)
+
+
+@pytest.mark.parametrize('max_matches', [1, 5, 10, 50])
+def test_top_k_search_matches_full_ranking(large_buyer_db, profiles, max_matches):
+    matcher = GraphMatcher(large_buyer_db)
+    for profile in profiles[:20]:
+        expected = matcher.find_optimal_matches(profile, max_matches)
+        assert as_json(matcher.find_top_matches(profile, max_matches)) == as_json(expected)
+    assert matcher.search_stats['pairs_pruned'] > 0
+
+
+@pytest.mark.parametrize('block_cells', [graph_matching.BATCH_BLOCK_CELLS, 20000])
+def test_batch_matches_per_facility_matching(large_buyer_db, profiles, monkeypatch, block_cells):
+    monkeypatch.setattr(graph_matching, 'BATCH_BLOCK_CELLS', block_cells)
+    matcher = GraphMatcher(large_buyer_db)
+    batch = profiles[:20] + [{'waste_streams': [], 'location': profiles[0]['location']}]
+    results = matcher.find_optimal_matches_batch(batch, max_matches=10)
+    assert len(results) == len(batch)
+    for profile, matches in zip(batch, results):
+        assert as_json(matches) == as_json(matcher.find_optimal_matches(profile, max_matches=10))
+
+
+def test_incremental_cache_matches_full_rerun(buyer_db, profiles):
+    cached = GraphMatcher(buyer_db, cache_results=True)
+    for profile in profiles[:20]:
+        cached.find_optimal_matches(profile, max_matches=10)
+
+    # Copies of existing buyers moved next to the cached facilities
+    new_buyers = pd.read_csv(BUYERS_CSV).iloc[::10].to_dict('records')
+    for i, (buyer, profile) in enumerate(zip(new_buyers, profiles)):
+        buyer.update(buyer_id=f"B{900 + i}", lat=profile['location']['lat'] + 0.1, lng=profile['location']['lng'])
+        buyer_db.add_buyer(buyer)
+
+    assert len(cached.result_cache) == 20
+    rerun = GraphMatcher(buyer_db)
+    added = 0
+    for profile in profiles[:20]:
+        expected = rerun.find_optimal_matches(profile, max_matches=10)
+        assert as_json(cached.find_optimal_matches(profile, max_matches=10)) == as_json(expected)
+        added += sum(match['id'] >= 900 for match in expected)
+    assert added > 0
+
+
+@pytest.mark.parametrize('workers', [1, 4])
+def test_sharded_search_matches_full_ranking(large_buyer_db, profiles, monkeypatch, workers):
+    # Small tasks, so searches stop before reaching every shard
+    monkeypatch.setattr(graph_matching, 'SHARD_TASK_ROWS', 100)
+    matcher = GraphMatcher(large_buyer_db)
+    for profile in profiles[:20]:
+        for max_matches in [1, 10]:
+            expected = matcher.find_optimal_matches(profile, max_matches)
+            assert as_json(matcher.find_sharded_matches(profile, max_matches, workers=workers)) == as_json(expected)
+    assert matcher.search_stats['shards_scored'] < matcher.search_stats['shards_total']
+    assert matcher.find_sharded_matches({'waste_streams': [], 'location': profiles[0]['location']}) == []
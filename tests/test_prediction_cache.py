@@ -0,0 +1,71 @@
+from conftest import as_json
+import lib.prediction_cache as prediction_cache
+from lib.ml_inference import WastePredictor
+from lib.prediction_cache import PredictionCache
+
+FACILITY = {'industry': 'Automotive', 'product': 'engine_components', 'process': 'cnc_machining',
+            'machinery': 'cnc_lathe', 'scale': 'medium', 'units_per_month': 5000}
+
+
+class CountingPredictor:
+    """Stand-in for WastePredictor.predict / predict_batch that counts calls"""
+
+    def __init__(self):
+        self.inputs = []
+
+    def predict(self, facility_input):
+        self.inputs.append(facility_input)
+        return {'units': facility_input['units_per_month'], 'waste_streams': []}
+
+    def predict_batch(self, facility_inputs):
+        return [self.predict(facility_input) for facility_input in facility_inputs]
+
+
+def test_hits_are_copies_keyed_on_normalized_input():
+    cache, model = PredictionCache(), CountingPredictor()
+    first = cache.lookup('v1', FACILITY, model.predict)
+    first['waste_streams'].append('added by a caller')
+
+    again = cache.lookup('v1', dict(FACILITY, industry='automotive'), model.predict)
+    assert again == {'units': 5000, 'waste_streams': []}
+    assert len(model.inputs) == 1
+
+    cache.lookup('v2', FACILITY, model.predict)
+    assert len(model.inputs) == 2
+    assert cache.stats()['hits'] == 1 and cache.stats()['misses'] == 2
+
+
+def test_entries_expire_and_least_recently_used_are_evicted(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(prediction_cache.time, 'monotonic', lambda: now[0])
+    cache, model = PredictionCache(max_size=2, ttl_seconds=60), CountingPredictor()
+
+    for units in [1, 2, 1, 3]:
+        cache.lookup('v1', dict(FACILITY, units_per_month=units), model.predict)
+    assert [f['units_per_month'] for f in model.inputs] == [1, 2, 3]
+    assert cache.stats()['evictions'] == 1
+
+    now[0] += 61
+    cache.lookup('v1', dict(FACILITY, units_per_month=3), model.predict)
+    assert len(model.inputs) == 4 and cache.stats()['expirations'] == 1
+
+
+def test_units_bucketing_predicts_for_the_rounded_value():
+    cache, model = PredictionCache(units_digits=2), CountingPredictor()
+    results = cache.lookup_batch('v1', [dict(FACILITY, units_per_month=units) for units in [5012, 4960, 5012, 730]],
+                                 model.predict_batch)
+    assert [f['units_per_month'] for f in model.inputs] == [5000.0, 730.0]
+    assert [r['units'] for r in results] == [5000.0, 5000.0, 5000.0, 730.0]
+    results[0]['waste_streams'].append('added by a caller')
+    assert results[1]['waste_streams'] == []
+
+
+def test_cached_predictor_matches_uncached(model_dir, facility_inputs):
+    uncached = WastePredictor(cascade_mode='off')
+    cached = WastePredictor(cascade_mode='off', cache=PredictionCache())
+    inputs = facility_inputs[:50] * 2
+    expected = [uncached.predict(facility_input) for facility_input in inputs]
+
+    assert as_json(cached.predict_batch(inputs[:50])) == as_json(expected[:50])
+    assert as_json([cached.predict(facility_input) for facility_input in inputs]) == as_json(expected)
+    assert cached.cache.stats()['misses'] == len({as_json(f) for f in inputs[:50]})
@@ -0,0 +1,104 @@
+import numpy as np
+import pytest
+from lib.buyer_database import BuyerDatabase
+from lib.spatial_index import GridIndex, haversine_km
+
+
+def scan_within(lat, lng, points_lat, points_lng, radius_km):
+    with np.errstate(invalid='ignore'):
+        return np.flatnonzero(haversine_km(lat, lng, points_lat, points_lng) <= radius_km)
+
+
+def scan_nearest(lat, lng, points_lat, points_lng, k):
+    distances = haversine_km(lat, lng, points_lat, points_lng)
+    valid = np.flatnonzero(np.isfinite(distances))
+    order = valid[np.lexsort((valid, distances[valid]))][:k]
+    return order, distances[order]
+
+
+@pytest.fixture(scope='module')
+def world_points():
+    """Points over the whole globe, crowded near the poles and the antimeridian, some missing"""
+
+    rng = np.random.default_rng(0)
+    lat = np.concatenate([rng.uniform(-90, 90, 2000), rng.uniform(85, 90, 200), rng.uniform(-90, -85, 200),
+                          rng.uniform(-60, 60, 400), [90.0, -90.0, 0.0, 0.0, np.nan, 10.0]])
+    lng = np.concatenate([rng.uniform(-180, 180, 2000), rng.uniform(-180, 180, 400),
+                          np.where(rng.random(400) < 0.5, rng.uniform(179, 180, 400), rng.uniform(-180, -179, 400)),
+                          [0.0, 45.0, 180.0, -180.0, 10.0, np.nan]])
+    return lat, lng
+
+
+QUERIES = [
+    (20.0, 78.0), (0.0, 179.9), (0.0, -179.9), (-45.0, 180.0), (89.9, 0.0), (-89.9, 120.0),
+    (90.0, 0.0), (-90.0, 0.0), (60.0, -179.5), (0.0, 0.0)
+]
+
+
+@pytest.mark.parametrize('lat, lng', QUERIES)
+@pytest.mark.parametrize('radius_km', [1, 50, 300, 2000, 12000, 25000])
+def test_within_radius_matches_scan(world_points, lat, lng, radius_km):
+    index = GridIndex(*world_points)
+    assert np.array_equal(index.within_radius(lat, lng, radius_km), scan_within(lat, lng, *world_points, radius_km))
+    assert index.candidate_count(lat, lng, radius_km) >= len(index.within_radius(lat, lng, radius_km))
+
+
+@pytest.mark.parametrize('lat, lng', QUERIES)
+@pytest.mark.parametrize('k', [1, 10, 500])
+def test_nearest_matches_scan(world_points, lat, lng, k):
+    rows, distances = GridIndex(*world_points).nearest(lat, lng, k)
+    expected_rows, expected_distances = scan_nearest(lat, lng, *world_points, k)
+    assert np.array_equal(rows, expected_rows)
+    assert np.array_equal(distances, expected_distances)
+
+
+def test_radius_boundary_is_included():
+    lat = np.array([20.0, 20.5, 21.0, 19.0])
+    lng = np.array([78.0, 78.5, 77.0, 79.0])
+    index = GridIndex(lat, lng)
+    for row in range(len(lat)):
+        radius = haversine_km(20.1, 78.1, lat[row], lng[row])
+        assert row in index.within_radius(20.1, 78.1, radius)
+        assert row not in index.within_radius(20.1, 78.1, np.nextafter(radius, 0))
+
+
+def test_nearest_with_k_above_size_returns_every_point():
+    lat = np.array([10.0, np.nan, 12.0, 10.0, 11.0])
+    lng = np.array([70.0, 71.0, 72.0, 70.0, 70.0])
+    rows, distances = GridIndex(lat, lng).nearest(10.0, 70.0, 50)
+
+    # Missing coordinates are skipped; equal distances keep row order
+    assert rows.tolist() == [0, 3, 4, 2]
+    assert distances[0] == distances[1] == 0
+    assert np.all(np.diff(distances) >= 0)
+    assert len(GridIndex(lat[:0], lng[:0]).nearest(10.0, 70.0, 5)[0]) == 0
+
+
+def test_search_by_location_matches_the_scan(buyer_db):
+    df = buyer_db.df
+    cities = set(df['city'].str.lower())
+    places = [place['name'] for place in buyer_db.gazetteer.places if place['name'].lower() not in cities]
+    assert places
+
+    for name in places:
+        place = buyer_db.gazetteer.locate(name)
+        for max_distance_km in [50, 300, 1000]:
+            distances = df.apply(
+                lambda row: BuyerDatabase._haversine_distance(place['lat'], place['lng'], row['lat'], row['lng']),
+                axis=1
+            )
+            nearby = df[distances <= max_distance_km]
+            expected = (nearby if len(nearby) else df).to_dict('records')
+            assert buyer_db.search_by_location(name, max_distance_km) == expected
+
+
+def test_nearest_buyers_order(buyer_db):
+    df = buyer_db.df
+    for lat, lng in [(28.6, 77.2), (12.9, 77.6), (0.0, 0.0), (22.5, 88.3)]:
+        rows, distances = scan_nearest(lat, lng, df['lat'].to_numpy(), df['lng'].to_numpy(), 15)
+        buyers = buyer_db.nearest_buyers(lat, lng, k=15)
+        assert [buyer['buyer_id'] for buyer in buyers] == df['buyer_id'].iloc[rows].tolist()
+        assert [buyer['distance_km'] for buyer in buyers] == [round(float(d), 1) for d in distances]
+
+    everyone = buyer_db.nearest_buyers(20.0, 78.0, k=len(df) + 50)
+    assert len(everyone) == len(df)
@@ -0,0 +1,71 @@
+import pickle
+import numpy as np
+from conftest import as_json, training_features
+from lib.ml_inference import WastePredictor
+from lib.tree_ensemble import load_compiled_models, save_compiled_models, source_digests
+from lib.tree_export import compile_ensembles, export_encoders
+
+# Same bound as scripts/compile_models.py; XGBoost's float32 sums and
+# sigmoid are reproduced to within an ulp or two, not bit for bit
+TOLERANCE = 1e-5
+
+MODEL_NAMES = ['encoders', 'waste_type_classifiers', 'quantity_models', 'quality_models', 'contamination_models']
+
+
+def load_pickles(path):
+    models = {}
+    for name in MODEL_NAMES:
+        with open(path / f'{name}.pkl', 'rb') as f:
+            models[name] = pickle.load(f)
+    return models
+
+
+def compile_into(path, models):
+    ensembles = compile_ensembles(models['waste_type_classifiers'], models['quantity_models'],
+                                  models['quality_models'], models['contamination_models'])
+    save_compiled_models(str(path / 'compiled'), ensembles, export_encoders(models['encoders']),
+                         source_digests(str(path)))
+
+
+def test_compiled_ensembles_match_pickled_models(model_dir, training_df):
+    models = load_pickles(model_dir)
+    compile_into(model_dir, models)
+    ensembles = load_compiled_models(str(model_dir / 'compiled'))['ensembles']
+    X = training_features(training_df, models['encoders'])
+
+    classifiers = ensembles['classifiers']
+    expected = np.column_stack([models['waste_type_classifiers'][name].predict_proba(X)[:, 1]
+                                for name in classifiers.names])
+    np.testing.assert_allclose(classifiers.predict(X), expected, rtol=0, atol=TOLERANCE)
+
+    for group in ['quantity', 'contamination']:
+        ensemble = ensembles[group]
+        expected = np.column_stack([models[f'{group}_models'][name].predict(X) for name in ensemble.names])
+        assert np.array_equal(ensemble.predict(X), expected)
+
+    quality = ensembles['quality']
+    expected = np.column_stack([
+        models['quality_models'][name]['encoder'].inverse_transform(models['quality_models'][name]['model'].predict(X))
+        for name in quality.names
+    ])
+    assert np.array_equal(quality.predict(X), expected)
+
+
+def test_compiled_predictor_matches_pickled_predictor(model_dir, facility_inputs):
+    pickled = WastePredictor(cascade_mode='off')
+    compile_into(model_dir, load_pickles(model_dir))
+    compiled = WastePredictor(cascade_mode='off')
+    assert compiled.ensembles is not None and pickled.ensembles is None
+
+    expected = [pickled.predict(facility_input) for facility_input in facility_inputs[:100]]
+    assert as_json(compiled.predict_batch(facility_inputs[:100])) == as_json(expected)
+    assert compiled.model_version == pickled.model_version
+
+
+def test_stale_compiled_models_are_ignored(model_dir, facility_inputs):
+    models = load_pickles(model_dir)
+    compile_into(model_dir, models)
+    models['contamination_models'].popitem()
+    with open(model_dir / 'contamination_models.pkl', 'wb') as f:
+        pickle.dump(models['contamination_models'], f)
+    assert WastePredictor(cascade_mode='off').ensembles is None
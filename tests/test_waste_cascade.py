@@ -0,0 +1,43 @@
+import pytest
+from conftest import as_json
+from lib.ml_inference import WastePredictor
+from lib.waste_cascade import CASCADE_FILE, WasteTypeCascade
+
+
+@pytest.fixture
+def cascade(model_dir, training_df):
+    cascade = WasteTypeCascade.learn(training_df)
+    cascade.save(str(model_dir / CASCADE_FILE))
+    return cascade
+
+
+def test_cascade_is_off_by_default(model_dir, cascade):
+    predictor = WastePredictor()
+    assert predictor.cascade_mode == 'off' and predictor.cascade is None
+
+
+def test_gated_predictions_match_ungated(cascade, facility_inputs):
+    off = WastePredictor(cascade_mode='off').predict_batch(facility_inputs)
+    safety = WastePredictor(cascade_mode='safety')
+    gated = WastePredictor(cascade_mode='gated')
+    assert as_json(safety.predict_batch(facility_inputs)) == as_json(off)
+
+    # Gating can only drop waste types outside a facility's candidates
+    matched = 0
+    for facility_input, expected, result in zip(facility_inputs, off, gated.predict_batch(facility_inputs)):
+        candidates = cascade.candidates(facility_input['industry'].lower(), facility_input['process'].lower())
+        if candidates is None or {w['type'] for w in expected['waste_streams']} <= set(candidates):
+            assert as_json(result) == as_json(expected)
+            matched += 1
+    assert matched >= 0.99 * len(facility_inputs)
+
+    missed = sum(safety.cascade.stats()['missed_types'].values())
+    assert len(facility_inputs) - matched <= missed
+    stats = gated.cascade.stats()
+    assert stats['classifier_calls'] == stats['candidate_calls'] < stats['full_calls']
+
+
+def test_gated_predict_matches_gated_batch(cascade, facility_inputs):
+    gated = WastePredictor(cascade_mode='gated')
+    expected = gated.predict_batch(facility_inputs[:50])
+    assert as_json([gated.predict(facility_input) for facility_input in facility_inputs[:50]]) == as_json(expected)